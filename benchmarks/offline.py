@@ -0,0 +1,309 @@
+# This script benchmarks imfp without network access. It replays the API
+# responses recorded in tests/responses through _download_parse,
+# imf_parameters and imf_dataset, then builds data frames from synthetic
+# CompactData responses with many series, and reports wall time, memory
+# allocated and peak memory for each stage. Recorded and synthetic responses
+# are also decoded with each installed JSON backend (see set_imf_json_backend).
+#
+# Usage:
+#     python benchmarks/offline.py
+#     python benchmarks/offline.py --sizes 10000 --output results.json
+#     python benchmarks/offline.py --baseline results.json
+#
+# Wall time is the best of --repeat runs. Allocations are measured in a
+# separate run with tracemalloc, which slows Python code down: 'allocated' is
+# the memory still held when the stage returns and 'peak' the most held at
+# once while it ran. tracemalloc does not see memory allocated by pyarrow,
+# which backs pandas' string columns, so the deep memory use of the data
+# frames a stage returns is reported separately as 'result'. With
+# --baseline, stages slower than the baseline by more than --tolerance are
+# reported, and the script exits with status 1.
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+from pandas import DataFrame
+
+# Recorded responses are looked up relative to the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from imfp import (  # noqa: E402
+    imf_databases,
+    imf_parameters,
+    imf_dataset,
+    set_imf_wait_time,
+    set_imf_cache,
+    clear_imf_memo,
+)
+from imfp import utils  # noqa: E402
+from imfp.utils import _download_parse  # noqa: E402
+from imfp.decode import _json_decoders  # noqa: E402
+from imfp.data import (  # noqa: E402
+    _dataset_series,
+    _series_to_frame,
+    _series_to_wide,
+)
+from imfp.stream import _JSONStreamReader, _iter_json_path, _text_chunks  # noqa: E402
+
+# Databases and queries with recorded responses
+PARAMETER_DATABASES = [
+    "BOP",
+    "FISCALDECENTRALIZATION",
+    "GFSR2019",
+    "WHDREO201910",
+    "APDREO201904",
+    "AFRREO",
+]
+DATASET_QUERIES = [
+    dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    ),
+    dict(
+        database_id="AFRREO",
+        indicator=["TTT_IX", "GGX_G01_GDP_PT"],
+        ref_area="7A",
+        start_year=2021,
+    ),
+    dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["NGDPD"],
+        start_year=2011,
+        end_year=2012,
+    ),
+]
+DIMENSIONS = ["freq", "ref_area", "indicator"]
+
+
+def offline_get(*args, **kwargs):
+    raise RuntimeError(
+        "The benchmark requested a response that is not recorded in "
+        "tests/responses. Benchmarks must run offline."
+    )
+
+
+def recorded_urls():
+    # Find the URLs of the recorded responses the replay stages use
+    urls = []
+    load_cached_response = utils._load_cached_response
+
+    def record(URL, stream=False):
+        status, content = load_cached_response(URL, stream)
+        if status is not None and URL not in urls:
+            urls.append(URL)
+        return status, content
+
+    utils._load_cached_response = record
+    try:
+        replay_parameters()
+        replay_datasets()
+    finally:
+        utils._load_cached_response = load_cached_response
+    return urls
+
+
+def replay_download_parse(urls):
+    for url in urls:
+        _download_parse(url)
+
+
+def recorded_bodies(urls):
+    bodies = []
+    for url in urls:
+        status, content = utils._load_cached_response(url)
+        if status == 200 and not (b"<" in content and b">" in content):
+            bodies.append(content)
+    return bodies
+
+
+def decode_stages(label, bodies):
+    # Decode the same UTF-8 bytes with every installed JSON backend
+    return [
+        (
+            f"{label}: decode {name}",
+            lambda decoder=decoder: [decoder(body) for body in bodies],
+        )
+        for name, decoder in _json_decoders.items()
+    ]
+
+
+def replay_parameters():
+    clear_imf_memo()
+    imf_databases()
+    for database_id in PARAMETER_DATABASES:
+        imf_parameters(database_id)
+
+
+def replay_datasets():
+    for query in DATASET_QUERIES:
+        imf_dataset(**query)
+
+
+def synthetic_response(n_series, n_obs):
+    # A CompactData response with n_series annual series of n_obs observations
+    series = [
+        {
+            "@FREQ": "A",
+            "@REF_AREA": f"R{i % 200}",
+            "@INDICATOR": f"I{i // 200}",
+            "@UNIT_MULT": "6",
+            "@TIME_FORMAT": "P1Y",
+            "Obs": [
+                {"@TIME_PERIOD": str(2000 + t), "@OBS_VALUE": f"{i + t / 8:.3f}"}
+                for t in range(n_obs)
+            ],
+        }
+        for i in range(n_series)
+    ]
+    return json.dumps({"CompactData": {"DataSet": {"Series": series}}})
+
+
+def synthetic_stages(n_series, n_obs):
+    text = synthetic_response(n_series, n_obs)
+    series = _dataset_series(json.loads(text))
+    label = f"synthetic {n_series} series"
+    return [
+        (f"{label}: parse", lambda: _dataset_series(json.loads(text))),
+        # Series are built into the frame as they are parsed, without a list
+        # of all of them, as by imf_dataset with stream=True
+        (
+            f"{label}: stream frame",
+            lambda: _series_to_frame(
+                _iter_json_path(
+                    _JSONStreamReader(_text_chunks(text)),
+                    ["CompactData", "DataSet", "Series"],
+                )
+            ),
+        ),
+        (f"{label}: long frame", lambda: _series_to_frame(series)),
+        (f"{label}: compact frame", lambda: _series_to_frame(series, compact=True)),
+        (f"{label}: wide frame", lambda: _series_to_wide(series, DIMENSIONS)),
+    ]
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    allocated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": min(times),
+        "allocated_mb": allocated / 1e6,
+        "peak_mb": peak / 1e6,
+        "result_mb": result_size(result) / 1e6,
+    }
+
+
+def result_size(result):
+    # Data frames may hold arrays allocated outside tracemalloc's view
+    if isinstance(result, tuple):
+        return sum(result_size(item) for item in result)
+    if isinstance(result, DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark imfp offline with recorded and synthetic responses."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[10000, 100000],
+        help="numbers of series in the synthetic responses",
+    )
+    parser.add_argument(
+        "--observations",
+        type=int,
+        default=10,
+        help="observations per synthetic series",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved by --output")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="slowdown relative to the baseline reported as a regression",
+    )
+    args = parser.parse_args()
+
+    # Replay recorded responses only, with no rate limit and no disk cache
+    utils._imf_use_cache = True
+    utils._imf_save_response = False
+    utils._imf_get = offline_get
+    set_imf_wait_time(0)
+    set_imf_cache(None)
+
+    urls = recorded_urls()
+    stages = [
+        ("replay: _download_parse", lambda: replay_download_parse(urls)),
+        ("replay: imf_parameters", replay_parameters),
+        ("replay: imf_dataset", replay_datasets),
+    ]
+    stages += decode_stages("replay", recorded_bodies(urls))
+    for n_series in args.sizes:
+        stages += synthetic_stages(n_series, args.observations)
+        body = synthetic_response(n_series, args.observations).encode()
+        stages += decode_stages(f"synthetic {n_series} series", [body])
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+    results = {}
+    regressions = []
+    print(
+        f"{'stage':<40}{'seconds':>10}{'allocated MB':>14}{'peak MB':>10}"
+        f"{'result MB':>11}"
+    )
+    for name, function in stages:
+        results[name] = measure(function, args.repeat)
+        line = (
+            f"{name:<40}{results[name]['seconds']:>10.3f}"
+            f"{results[name]['allocated_mb']:>14.2f}{results[name]['peak_mb']:>10.2f}"
+            f"{results[name]['result_mb']:>11.2f}"
+        )
+        if name in baseline:
+            ratio = results[name]["seconds"] / baseline[name]["seconds"]
+            line += f"  x{ratio:.2f} of baseline"
+            if ratio > args.tolerance:
+                regressions.append(name)
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,14 @@
-# This script tries (and mostly fails) to download full databases in sequence. I don't
-# recommend trying this.
+# This script downloads every database with imf_bulk_download. Re-running it
+# resumes each database where the previous run stopped. Expect this to take a
+# very long time.
 
 import imfp
 
-# Set a custom wait time
-_imf_wait_time = 10
-
-# Attempt to download databases sequentially
 databases = imfp.imf_databases()
-datasets = {"database_names": [], "dataframes": []}
 for database_id in databases["database_id"]:
-    datasets["database_names"].append(database_id)
     try:
-        datasets["dataframes"].append(imfp.imf_dataset(database_id))
-    except Exception as e:
-        datasets["dataframes"].append(None)
-        print("An error occurred when downloading", database_id, ": ", e)
+        status = imfp.imf_bulk_download(database_id, "imf_downloads")
+    except ValueError as e:
+        print("An error occurred when planning", database_id, ": ", e)
+        continue
+    print(database_id, status["status"].value_counts().to_dict())
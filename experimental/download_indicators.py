@@ -1,24 +1,15 @@
-# This script tries to download whole databases indicator by indicator
+# This script downloads a whole database indicator by indicator with
+# imf_bulk_download. Each indicator is written to its own file as soon as it
+# completes, so the script can be re-run to resume an interrupted download.
 
 import imfp
 
-# Examine database list
-databases = imfp.imf_databases()
+# Download the database into imf_downloads/IFS, with up to four requests in
+# flight under the shared rate limit
+status = imfp.imf_bulk_download(
+    "IFS", "imf_downloads", split_by="indicator", max_workers=4
+)
 
-# Set a custom wait time and a database to query
-_imf_wait_time = 10
-database_to_download = "IFS"
-
-# Try to download the database indicator by indicator (Note that some databases don't
-# use the 'indicator' parameter, so this won't work with every database)
-indicators = imfp.imf_parameters("IFS")["indicator"]
-datasets = {"indicator_names": [], "dataframes": []}
-for indicator in indicators["input_code"]:
-    datasets["indicator_names"].append(indicator)
-    try:
-        datasets["dataframes"].append(
-            imfp.imf_dataset(database_id=database_to_download, indicator=indicator)
-        )
-    except Exception as e:
-        datasets["dataframes"].append(None)
-        print("An error occurred when downloading", indicator, ": ", e)
+# Summarize the outcome and list the indicators that failed
+print(status["status"].value_counts())
+print(status[status["status"] == "failed"])
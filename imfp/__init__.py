@@ -1,12 +1,94 @@
-from .utils import (
-    _imf_get,
-    _min_wait_time_limited,
-    _download_parse,
-    _imf_metadata,
-    _imf_dimensions,
-)
-from .data import imf_databases, imf_parameters, imf_parameter_defs, imf_dataset
-from .admin import set_imf_app_name, set_imf_wait_time
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .utils import (
+        _imf_get,
+        _min_wait_time_limited,
+        _download_parse,
+        _imf_metadata,
+        _imf_dimensions,
+    )
+    from .data import (
+        imf_databases,
+        imf_parameters,
+        imf_parameter_defs,
+        imf_dataset,
+        imf_datasets,
+        imf_dataset_refresh,
+    )
+    from .store import imf_store_write, imf_store_read
+    from .bulk import imf_bulk_download
+    from .search import imf_search_index_update, imf_search_indicators
+    from .aio import imf_databases_async, imf_parameters_async, imf_dataset_async
+    from .admin import (
+        set_imf_app_name,
+        set_imf_wait_time,
+        set_imf_shared_rate_limit,
+        get_imf_rate_limit_stats,
+        set_imf_request_hook,
+        set_imf_retry_policy,
+        set_imf_connection_pool,
+        set_imf_json_backend,
+        set_imf_cache,
+        clear_imf_cache,
+        set_imf_memo_size,
+        clear_imf_memo,
+    )
+
+# The submodule defining each name exported by the package. Submodules are
+# imported when one of their names is first used, so that "import imfp" does
+# not import pandas or requests until they are needed.
+_lazy_attributes = {
+    "_imf_get": "utils",
+    "_min_wait_time_limited": "utils",
+    "_download_parse": "utils",
+    "_imf_metadata": "utils",
+    "_imf_dimensions": "utils",
+    "imf_databases": "data",
+    "imf_parameters": "data",
+    "imf_parameter_defs": "data",
+    "imf_dataset": "data",
+    "imf_datasets": "data",
+    "imf_dataset_refresh": "data",
+    "imf_store_write": "store",
+    "imf_store_read": "store",
+    "imf_bulk_download": "bulk",
+    "imf_search_index_update": "search",
+    "imf_search_indicators": "search",
+    "imf_databases_async": "aio",
+    "imf_parameters_async": "aio",
+    "imf_dataset_async": "aio",
+    "set_imf_app_name": "admin",
+    "set_imf_wait_time": "admin",
+    "set_imf_shared_rate_limit": "admin",
+    "get_imf_rate_limit_stats": "admin",
+    "set_imf_request_hook": "admin",
+    "set_imf_retry_policy": "admin",
+    "set_imf_connection_pool": "admin",
+    "set_imf_json_backend": "admin",
+    "set_imf_cache": "admin",
+    "clear_imf_cache": "admin",
+    "set_imf_memo_size": "admin",
+    "clear_imf_memo": "admin",
+}
+
+
+def __getattr__(name):
+    """
+    (Internal) Import the submodule defining a name exported by the package
+    on first access.
+    """
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_lazy_attributes[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
 
 __all__ = [
     "_imf_get",
@@ -20,6 +102,26 @@ __all__ = [
     "imf_parameters",
     "imf_parameter_defs",
     "imf_dataset",
+    "imf_datasets",
+    "imf_dataset_refresh",
+    "imf_store_write",
+    "imf_store_read",
+    "imf_bulk_download",
+    "imf_search_index_update",
+    "imf_search_indicators",
+    "imf_databases_async",
+    "imf_parameters_async",
+    "imf_dataset_async",
     "set_imf_app_name",
     "set_imf_wait_time",
+    "set_imf_shared_rate_limit",
+    "get_imf_rate_limit_stats",
+    "set_imf_request_hook",
+    "set_imf_retry_policy",
+    "set_imf_connection_pool",
+    "set_imf_json_backend",
+    "set_imf_cache",
+    "clear_imf_cache",
+    "set_imf_memo_size",
+    "clear_imf_memo",
 ]
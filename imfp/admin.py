@@ -1,6 +1,10 @@
-from os import environ
+from os import environ, path, fspath, PathLike
 from warnings import warn
-from typing import Union
+from typing import Union, Callable
+from .cache import _cache_clear
+from .decode import _json_backend_names, _json_decoders
+from . import utils
+from .utils import _memo_clear, _imf_rate_limiter, _imf_circuit_breaker
 
 
 def set_imf_app_name(name: str = "imfp"):
@@ -52,21 +56,437 @@ def set_imf_app_name(name: str = "imfp"):
     return None
 
 
-def set_imf_wait_time(wait_time: Union[int, float] = 1.5):
+def set_imf_wait_time(wait_time: Union[int, float] = 1.5, burst: int = 1):
     """
     Set the IMF wait time as an environment variable.
 
+    Requests are limited to one every wait_time seconds on average. With a
+    burst greater than 1, up to that many requests may start at once after a
+    pause, without raising the average rate.
+
     Args:
         wait_time (Union[int, float], optional): The wait time in seconds to be set as an environment variable. Defaults to 1.5.
+        burst (int, optional): The maximum number of requests that may start without waiting. Defaults to 1.
 
     Raises:
-        TypeError: If the provided wait_time is not a numeric value (int or float).
-        ValueError: If the provided wait_time is not greater than 0.
+        TypeError: If the provided wait_time is not a numeric value (int or float), or burst is not an integer.
+        ValueError: If the provided wait_time is not greater than 0, or burst is less than 1.
     """
     if not isinstance(wait_time, (int, float)):
         raise TypeError("Rate limit wait time must be a numeric value (int or float).")
 
+    if isinstance(burst, bool) or not isinstance(burst, int):
+        raise TypeError("Rate limit burst must be an integer.")
+
+    if burst < 1:
+        raise ValueError("Rate limit burst must be greater than or equal to 1.")
+
     if wait_time >= 0:
         environ["IMF_WAIT_TIME"] = str(wait_time)
+        environ["IMF_BURST"] = str(burst)
     else:
         raise ValueError("Rate limit wait time must be greater than or equal to 0.")
+
+
+def set_imf_shared_rate_limit(state_file: Union[str, PathLike, None] = None):
+    """
+    Share the rate limit between processes on the same machine.
+
+    By default each Python process enforces the rate limit on its own, so
+    several worker processes together send requests several times faster
+    than the configured rate. When a state file is set, every process using
+    the same file draws from a single token bucket, kept in the file under an
+    exclusive lock, so their combined rate stays within the limit set with
+    set_imf_wait_time. The setting is stored as an environment variable, so
+    it is inherited by child processes started afterwards.
+
+    Args:
+        state_file (Union[str, PathLike, None], optional): Path of the file
+        holding the shared rate limit state. It is created if it does not
+        exist, and should be on a local file system. If None, each process
+        is limited separately. Defaults to None.
+
+    Raises:
+        TypeError: If state_file is not a string or path-like object.
+
+    Examples:
+        set_imf_shared_rate_limit("/tmp/imfp-rate-limit")
+    """
+    if state_file is None:
+        environ.pop("IMF_RATE_LIMIT_FILE", None)
+        return None
+
+    if not isinstance(state_file, (str, PathLike)):
+        raise TypeError("Rate limit state file must be a string or path-like object.")
+
+    environ["IMF_RATE_LIMIT_FILE"] = path.abspath(path.expanduser(fspath(state_file)))
+
+    return None
+
+
+def get_imf_rate_limit_stats(reset: bool = False):
+    """
+    Get statistics on the waits imposed by the rate limit in this process.
+
+    Args:
+        reset (bool, optional): Whether to reset the statistics after reading
+        them. Defaults to False.
+
+    Returns:
+        dict: The number of 'requests' made, the number that were 'delayed'
+        by the rate limit, and the 'total_wait' and 'max_wait' in seconds.
+
+    Examples:
+        stats = get_imf_rate_limit_stats()
+        print(stats["total_wait"] / max(stats["requests"], 1))
+    """
+    stats = _imf_rate_limiter.stats()
+    if reset:
+        _imf_rate_limiter.reset_stats()
+    return stats
+
+
+def set_imf_request_hook(hook: Union[Callable, None] = None):
+    """
+    Set a function to be called with timings and outcome of every IMF API
+    request made in this process, to find where slow calls spend their time.
+
+    The hook is called with a dictionary for each event. After each request,
+    it is called with an event whose 'event' is 'request', holding the
+    'url', the HTTP 'status', the size of the response body in 'bytes'
+    (characters when streamed), 'cache' ('hit', 'miss', 'revalidated' if an
+    expired response was confirmed unchanged, or 'off' if the on-disk cache
+    is disabled), and the seconds spent in the rate-limit
+    'wait', on the 'network', and parsing JSON ('parse'), the number of
+    'retries' and the 'retry_wait' before them, the JSON 'decoder' used (see
+    set_imf_json_backend; None when streamed), the 'total' seconds, and the
+    'error' message if the request failed. imf_dataset then calls it with a
+    'build' event holding the 'url' and the seconds spent building the data
+    frame ('build'). With stream=True, parsing and building are interleaved
+    with the download: network and parse times exclude each other, but the
+    build time includes both.
+
+    The hook is stored in process (not as an environment variable), and may
+    be called from several threads at once. Exceptions it raises are turned
+    into warnings. When no hook is set, requests only keep a few timings.
+
+    Args:
+        hook (callable, optional): Function taking one dictionary argument, or
+        None to remove the hook. Defaults to None.
+
+    Returns:
+        None
+
+    Raises:
+        TypeError: If hook is neither callable nor None.
+
+    Examples:
+        events = []
+        set_imf_request_hook(events.append)
+        imf_dataset("IFS", freq="A", ref_area="US", indicator="PMP_IX")
+        set_imf_request_hook()
+        print(events)
+    """
+    if hook is not None and not callable(hook):
+        raise TypeError("hook must be a callable or None.")
+    utils._imf_request_hook = hook
+    return None
+
+
+def set_imf_retry_policy(
+    base_delay: Union[int, float] = 5,
+    max_delay: Union[int, float] = 60,
+    jitter: bool = True,
+    breaker_threshold: int = 5,
+    breaker_cooldown: Union[int, float] = 60,
+):
+    """
+    Configure how failed IMF API requests are retried, as environment
+    variables.
+
+    Failures that may be transient (rate limit rejections, server and network
+    errors) are retried up to the times argument of each function, waiting
+    base_delay * 2 ** n seconds before retry n, up to max_delay. With jitter,
+    a random delay between 0 and that value is used instead, so that
+    requests that failed together do not retry together. A longer wait
+    requested by the API's Retry-After header is always respected. Requests
+    that are too large, have too many parameters or are malformed are not
+    retried.
+
+    If the API rejects breaker_threshold consecutive requests as overwhelmed,
+    all requests in the process fail immediately for breaker_cooldown
+    seconds, rather than adding to the load or waiting through retries.
+
+    Args:
+        base_delay (Union[int, float], optional): Delay before the first
+        retry in seconds. Defaults to 5.
+        max_delay (Union[int, float], optional): Maximum delay between retries
+        in seconds. Defaults to 60.
+        jitter (bool, optional): Whether to randomize delays. Defaults to
+        True.
+        breaker_threshold (int, optional): Number of consecutive rejections
+        after which requests are suspended. Set to 0 to disable. Defaults to
+        5.
+        breaker_cooldown (Union[int, float], optional): Seconds for which
+        requests are suspended. Defaults to 60.
+
+    Raises:
+        TypeError: If an argument is not of the expected type.
+        ValueError: If an argument is negative.
+
+    Examples:
+        set_imf_retry_policy(base_delay=1, max_delay=30)
+    """
+    for name, value in [
+        ("base_delay", base_delay),
+        ("max_delay", max_delay),
+        ("breaker_cooldown", breaker_cooldown),
+    ]:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"{name} must be a numeric value (int or float).")
+        if value < 0:
+            raise ValueError(f"{name} must be greater than or equal to 0.")
+
+    if not isinstance(jitter, bool):
+        raise TypeError("jitter must be True or False.")
+
+    if isinstance(breaker_threshold, bool) or not isinstance(breaker_threshold, int):
+        raise TypeError("breaker_threshold must be an integer.")
+    if breaker_threshold < 0:
+        raise ValueError("breaker_threshold must be greater than or equal to 0.")
+
+    environ["IMF_RETRY_BASE_DELAY"] = str(base_delay)
+    environ["IMF_RETRY_MAX_DELAY"] = str(max_delay)
+    environ["IMF_RETRY_JITTER"] = "1" if jitter else "0"
+    environ["IMF_BREAKER_THRESHOLD"] = str(breaker_threshold)
+    environ["IMF_BREAKER_COOLDOWN"] = str(breaker_cooldown)
+    _imf_circuit_breaker.reset()
+
+    return None
+
+
+def set_imf_connection_pool(
+    pool_size: int = 10,
+    connect_timeout: Union[int, float] = 10.0,
+    read_timeout: Union[int, float] = 300.0,
+):
+    """
+    Configure the pooled HTTP session used for IMF API requests as
+    environment variables.
+
+    All requests are sent through one keep-alive session that is shared by
+    every thread, so consecutive and concurrent requests reuse open
+    connections instead of connecting anew each time. Responses are requested
+    with gzip or deflate compression.
+
+    Args:
+        pool_size (int, optional): The maximum number of connections kept
+        open to the API. Should be at least the number of threads making
+        requests at once, e.g. the max_workers of imf_datasets. Defaults to
+        10.
+        connect_timeout (Union[int, float], optional): Seconds to wait for a
+        connection to the API to be established. Defaults to 10.
+        read_timeout (Union[int, float], optional): Seconds to wait for the API
+        to send data before a request fails. Defaults to 300.
+
+    Raises:
+        TypeError: If an argument is not of the expected type.
+        ValueError: If pool_size or a timeout is not greater than 0.
+
+    Examples:
+        set_imf_connection_pool(pool_size=16, read_timeout=600)
+    """
+    if isinstance(pool_size, bool) or not isinstance(pool_size, int):
+        raise TypeError("Connection pool size must be an integer.")
+    if pool_size < 1:
+        raise ValueError("Connection pool size must be greater than 0.")
+
+    for timeout in (connect_timeout, read_timeout):
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)):
+            raise TypeError("Timeouts must be numeric values (int or float).")
+        if timeout <= 0:
+            raise ValueError("Timeouts must be greater than 0.")
+
+    environ["IMF_POOL_SIZE"] = str(pool_size)
+    environ["IMF_CONNECT_TIMEOUT"] = str(connect_timeout)
+    environ["IMF_READ_TIMEOUT"] = str(read_timeout)
+
+    return None
+
+
+def set_imf_json_backend(backend: str = "auto"):
+    """
+    Choose the library used to decode JSON responses from the IMF API as an
+    environment variable.
+
+    Responses are decoded straight from the bytes received, without first
+    being converted to a string. By default, the fastest installed library
+    among orjson, simdjson and ujson is used, falling back to the standard
+    library's json module. Responses read with stream=True are always decoded
+    incrementally with the json module.
+
+    Args:
+        backend (str, optional): One of 'auto', 'orjson', 'simdjson', 'ujson'
+        or 'json'. Defaults to 'auto'.
+
+    Raises:
+        TypeError: If backend is not a string.
+        ValueError: If backend is not one of the supported libraries.
+        ImportError: If the chosen library is not installed.
+
+    Examples:
+        set_imf_json_backend("json")
+    """
+    if not isinstance(backend, str):
+        raise TypeError("JSON backend must be a string.")
+    if backend not in _json_backend_names:
+        raise ValueError(
+            f"JSON backend must be one of {', '.join(_json_backend_names)}."
+        )
+    if backend != "auto" and backend not in _json_decoders:
+        raise ImportError(
+            f"JSON backend '{backend}' is not installed. "
+            f"Install it with 'pip install {backend}'."
+        )
+
+    environ["IMF_JSON_BACKEND"] = backend
+
+    return None
+
+
+def set_imf_cache(
+    cache_dir: Union[str, PathLike, None] = None,
+    ttl: Union[int, float, dict, None] = None,
+    max_size: Union[int, None] = None,
+):
+    """
+    Configure the on-disk cache for IMF API responses.
+
+    When a cache directory is set, successful responses from every API call
+    (imf_databases, imf_parameters, imf_parameter_defs, imf_dataset) are
+    saved to disk and reused until they expire, skipping both the request and
+    the rate-limit wait. Expired responses that the API served with an ETag or
+    Last-Modified header are revalidated with a conditional request, and
+    reused without being downloaded again if the API reports that they have
+    not changed. Settings are stored as environment variables, so they are
+    inherited by child processes.
+
+    Args:
+        cache_dir (Union[str, PathLike, None], optional): Directory in which to
+        store cached responses. If None, the cache is disabled. Defaults to
+        None.
+        ttl (Union[int, float, dict, None], optional): Time-to-live of cached
+        responses in seconds. Either a single number applied to every
+        endpoint, or a dictionary mapping endpoint names ('Dataflow',
+        'DataStructure', 'CodeList', 'GenericMetadata', 'CompactData') to
+        seconds. Endpoints not given keep their defaults (one day for
+        catalog and metadata endpoints, one hour for CompactData). Defaults
+        to None.
+        max_size (Union[int, None], optional): Maximum total size of the cache
+        directory in bytes. Least recently used responses are evicted once it
+        is exceeded. If None, a 512 MB limit is used. Defaults to None.
+
+    Raises:
+        TypeError: If an argument is not of the expected type.
+        ValueError: If ttl or max_size is negative.
+
+    Examples:
+        set_imf_cache("~/.cache/imfp", ttl={"CompactData": 600})
+    """
+    if cache_dir is not None and not isinstance(cache_dir, (str, PathLike)):
+        raise TypeError("Cache directory must be a string or path-like object.")
+
+    if ttl is None:
+        ttls = {}
+    elif isinstance(ttl, dict):
+        ttls = ttl
+    else:
+        ttls = {None: ttl}
+    for endpoint, seconds in ttls.items():
+        if endpoint is not None and not isinstance(endpoint, str):
+            raise TypeError("Cache TTL endpoint names must be strings.")
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)):
+            raise TypeError("Cache TTL must be a numeric value (int or float).")
+        if seconds < 0:
+            raise ValueError("Cache TTL must be greater than or equal to 0.")
+
+    if max_size is not None:
+        if isinstance(max_size, bool) or not isinstance(max_size, int):
+            raise TypeError("Cache max_size must be an integer number of bytes.")
+        if max_size < 0:
+            raise ValueError("Cache max_size must be greater than or equal to 0.")
+
+    for key in [key for key in environ if key.startswith("IMF_CACHE_")]:
+        environ.pop(key)
+
+    if cache_dir is None:
+        return None
+
+    environ["IMF_CACHE_DIR"] = path.abspath(path.expanduser(fspath(cache_dir)))
+    for endpoint, seconds in ttls.items():
+        if endpoint is None:
+            environ["IMF_CACHE_TTL"] = str(seconds)
+        else:
+            environ[f"IMF_CACHE_TTL_{endpoint.upper()}"] = str(seconds)
+    if max_size is not None:
+        environ["IMF_CACHE_MAX_SIZE"] = str(max_size)
+
+    return None
+
+
+def clear_imf_cache():
+    """
+    Delete all responses stored in the on-disk cache configured with
+    set_imf_cache.
+
+    Returns:
+        None
+    """
+    _cache_clear()
+    return None
+
+
+def set_imf_memo_size(max_entries: int = 128):
+    """
+    Set the maximum number of memoized metadata lookups as an environment
+    variable.
+
+    Results of imf_parameters and of the dimension lookups used by
+    imf_parameter_defs and imf_dataset are kept in memory so that repeated
+    calls against the same database only make API requests once. The least
+    recently used results are discarded once the limit is reached.
+
+    Args:
+        max_entries (int, optional): The maximum number of results to keep.
+        Set to 0 to disable memoization. Defaults to 128.
+
+    Raises:
+        TypeError: If the provided max_entries is not an integer.
+        ValueError: If the provided max_entries is negative.
+    """
+    if isinstance(max_entries, bool) or not isinstance(max_entries, int):
+        raise TypeError("Memo size must be an integer.")
+
+    if max_entries >= 0:
+        environ["IMF_MEMO_MAX_ENTRIES"] = str(max_entries)
+    else:
+        raise ValueError("Memo size must be greater than or equal to 0.")
+
+    if max_entries == 0:
+        _memo_clear()
+
+
+def clear_imf_memo(database_id: Union[str, None] = None):
+    """
+    Discard memoized metadata lookups.
+
+    Args:
+        database_id (Union[str, None], optional): If supplied, only discard
+        results for this database. Defaults to None, which discards all
+        results.
+
+    Returns:
+        None
+    """
+    _memo_clear(database_id)
+    return None
@@ -0,0 +1,519 @@
+import asyncio
+from os import environ
+from threading import Lock
+from weakref import WeakKeyDictionary
+from time import perf_counter
+from requests import RequestException
+from . import utils
+from .decode import _response_body
+from .utils import (
+    _imf_headers,
+    _imf_rate_limiter,
+    _imf_session,
+    _imf_timeout,
+    _default_pool_size,
+    _imf_circuit_breaker,
+    _imf_request_wait,
+    _RequestTrace,
+    _attempt_cached,
+    _attempt_response,
+    _attempt_parse,
+    _attempt_network_error,
+    _revalidation_headers,
+    _parse_dimensions,
+    _parse_metadata,
+    _metadata_database_id,
+    _imf_memo_lock,
+    _memo_get,
+    _memo_put,
+    _memo_max_entries,
+)
+from .data import (
+    _parse_databases,
+    _parse_codelist,
+    _freq_codes,
+    _database_id_error,
+    _dataset_years,
+    _dataset_filter,
+    _dataset_url,
+    _dataset_series,
+    _series_to_frame,
+    _series_to_wide,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_network_errors = (RequestException, OSError, asyncio.TimeoutError)
+if aiohttp is not None:
+    _network_errors += (aiohttp.ClientError,)
+
+
+# One aiohttp session per running event loop, with the settings it was
+# created with and the task that closes it when the loop shuts down
+_aiohttp_sessions = WeakKeyDictionary()
+_aiohttp_sessions_lock = Lock()
+
+
+def _aiohttp_session():
+    """
+    (Internal) Get the aiohttp session used for API requests on the running
+    event loop.
+
+    Sessions cannot be shared between event loops, so each loop gets its own,
+    which keeps up to IMF_POOL_SIZE connections alive between requests. It is
+    recreated when the pool size or timeouts change, and closed when the
+    loop's remaining tasks are cancelled as it shuts down (as asyncio.run
+    does).
+
+    Returns:
+        aiohttp.ClientSession: The session of the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    pool_size = int(environ.get("IMF_POOL_SIZE", _default_pool_size))
+    connect_timeout, read_timeout = _imf_timeout()
+    session_key = (pool_size, connect_timeout, read_timeout)
+
+    with _aiohttp_sessions_lock:
+        found = _aiohttp_sessions.get(loop)
+        if found is not None:
+            key, session, closer = found
+            if key == session_key and not session.closed:
+                return session
+            closer.cancel()
+
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=connect_timeout, sock_read=read_timeout
+            ),
+        )
+        closer = loop.create_task(_aiohttp_session_closer(session))
+        _aiohttp_sessions[loop] = (session_key, session, closer)
+        return session
+
+
+async def _aiohttp_session_closer(session):
+    """
+    (Internal) Wait until cancelled, then close an aiohttp session.
+    """
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await session.close()
+
+
+async def _imf_get_async(url, headers):
+    """
+    (Internal) A rate-limited asynchronous GET request.
+
+    Shares its rate limit with _imf_get, but awaits instead of sleeping until
+    the request may start. Uses aiohttp if it is installed, through a pooled
+    session kept for the running event loop. Otherwise, the
+    request is sent through the shared session of _imf_get in a worker thread
+    so that the event loop is not blocked. Both use the timeouts set with
+    set_imf_connection_pool.
+
+    Args:
+        url (str): The URL to send a GET request to.
+        headers (dict): The headers to use in the API request.
+
+    Returns:
+        tuple: The (status_code, body, headers) of the response, with the body
+        as UTF-8 bytes.
+    """
+    left_to_wait = _imf_rate_limiter.reserve()
+    _imf_request_wait.set(max(left_to_wait, 0.0))
+    if left_to_wait > 0:
+        await asyncio.sleep(left_to_wait)
+
+    if aiohttp is None:
+        connect_timeout, read_timeout = _imf_timeout()
+        response = await asyncio.to_thread(
+            _imf_session().get,
+            url,
+            headers=headers,
+            timeout=(connect_timeout, read_timeout),
+        )
+        return (
+            response.status_code,
+            _response_body(response.content, response.encoding),
+            response.headers,
+        )
+
+    async with _aiohttp_session().get(url, headers=headers) as response:
+        return (
+            response.status,
+            _response_body(await response.read(), response.charset),
+            response.headers,
+        )
+
+
+async def _download_parse_async(URL, times=3):
+    """
+    (Internal) Asynchronously download and parse JSON content from a URL with
+    rate limiting and retries.
+
+    Behaves like _download_parse, including use of the on-disk cache, the
+    retry policy and the circuit breaker, but awaits between retries instead
+    of sleeping.
+
+    Args:
+        URL (str): The URL to download and parse the JSON content from.
+        times (int, optional): The number of times to retry the request in case
+        of failure. Defaults to 3.
+
+    Returns:
+        dict: The parsed JSON content as a Python dictionary.
+
+    Raises:
+        ValueError: If the content cannot be parsed as JSON after the specified
+        number of retries.
+    """
+    use_cache = utils._imf_use_cache
+    save_response = utils._imf_save_response
+
+    trace = _RequestTrace(URL)
+    try:
+        json_parsed = await _download_parse_attempts_async(
+            URL, times, use_cache, save_response, trace
+        )
+    except ValueError as e:
+        trace.report(str(e))
+        raise
+    trace.report()
+    return json_parsed
+
+
+async def _download_parse_attempts_async(URL, times, use_cache, save_response, trace):
+    """
+    (Internal) Make the attempts of _download_parse_async, recording their
+    timings in trace.
+    """
+    headers = _imf_headers()
+    for attempt in range(times):
+        status, content, from_cache = _attempt_cached(URL, use_cache)
+        retry_after = validators = None
+        if not from_cache:
+            _imf_circuit_breaker.check(URL)
+            request_headers, entry = _revalidation_headers(URL, headers)
+            _imf_request_wait.set(0.0)
+            start = perf_counter()
+            try:
+                status, content, response_headers = await _imf_get_async(
+                    URL, request_headers
+                )
+            except _network_errors as e:
+                await asyncio.sleep(
+                    _attempt_network_error(URL, attempt, times, e, trace)
+                )
+                continue
+            finally:
+                trace.fetched(start)
+            status, content, retry_after, validators = _attempt_response(
+                status, content, response_headers, entry, trace
+            )
+
+        json_parsed, delay = _attempt_parse(
+            URL,
+            attempt,
+            times,
+            status,
+            content,
+            from_cache,
+            validators,
+            retry_after,
+            save_response,
+            trace,
+        )
+        if delay is None:
+            return json_parsed
+        await asyncio.sleep(delay)
+
+
+_async_inflight = {}
+
+
+async def _memoize_async(memo_key, copy, coroutine_function):
+    """
+    (Internal) Asynchronous counterpart of utils._memoize, sharing the same
+    memo store.
+
+    Concurrent calls with the same key on one event loop await a single
+    evaluation of coroutine_function.
+
+    Args:
+        memo_key (tuple): The memo key, as built by the synchronous function's
+        key function.
+        copy (callable): Function returning a copy of a memoized result.
+        coroutine_function (callable): Function returning a coroutine that
+        computes the result.
+
+    Returns:
+        A copy of the memoized or newly computed result.
+    """
+    max_entries = _memo_max_entries()
+    if max_entries <= 0:
+        return await coroutine_function()
+
+    with _imf_memo_lock:
+        found, result = _memo_get(memo_key)
+    if found:
+        return copy(result)
+
+    loop = asyncio.get_running_loop()
+    task = _async_inflight.get(memo_key)
+    if task is None or task.get_loop() is not loop:
+        task = loop.create_task(coroutine_function())
+        _async_inflight[memo_key] = task
+
+        def forget(done_task):
+            if _async_inflight.get(memo_key) is done_task:
+                del _async_inflight[memo_key]
+
+        task.add_done_callback(forget)
+
+    result = await asyncio.shield(task)
+    with _imf_memo_lock:
+        _memo_put(memo_key, result, max_entries)
+    return copy(result)
+
+
+async def _imf_dimensions_async(database_id, times=3, inputs_only=True):
+    """
+    (Internal) Asynchronous counterpart of _imf_dimensions.
+    """
+
+    async def fetch():
+        URL = (
+            f"http://dataservices.imf.org/REST/SDMX_JSON.svc/DataStructure/"
+            f"{database_id}"
+        )
+        raw_dl = await _download_parse_async(URL, times)
+        return _parse_dimensions(raw_dl, inputs_only)
+
+    return await _memoize_async(
+        ("dimensions", database_id, inputs_only), lambda result: result.copy(), fetch
+    )
+
+
+async def _imf_metadata_async(URL, times=3):
+    """
+    (Internal) Asynchronous counterpart of _imf_metadata.
+    """
+    if not URL:
+        raise ValueError("Must supply URL.")
+
+    async def fetch():
+        raw_dl = await _download_parse_async(
+            URL.replace("CompactData", "GenericMetadata"), times=times
+        )
+        return _parse_metadata(raw_dl)
+
+    return await _memoize_async(
+        ("metadata", _metadata_database_id(URL)), lambda result: dict(result), fetch
+    )
+
+
+async def imf_databases_async(times=3):
+    """
+    List IMF database IDs and descriptions without blocking the event loop.
+
+    Asynchronous counterpart of imf_databases.
+
+    Parameters
+    ----------
+    times : int, optional, default 3
+        Maximum number of API requests to attempt.
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame containing database_id and description columns.
+
+    Examples
+    --------
+    databases = await imf_databases_async()
+    """
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+    raw_dl = await _download_parse_async(url, times)
+    return _parse_databases(raw_dl)
+
+
+async def imf_parameters_async(database_id, times=2):
+    """
+    List input parameters and available parameter values for a given IMF
+    database without blocking the event loop.
+
+    Asynchronous counterpart of imf_parameters. The code lists of all
+    parameters are requested concurrently, subject to the shared rate limit,
+    and results are memoized together with those of imf_parameters.
+
+    Parameters
+    ----------
+    database_id : str
+        A database_id from imf_databases().
+    times : int, optional, default 2
+        Maximum number of API requests to attempt.
+
+    Returns
+    -------
+    dict
+        A dictionary of DataFrames with 'input_code' and 'description'
+        columns, keyed by parameter, as returned by imf_parameters.
+
+    Examples
+    --------
+    params = await imf_parameters_async(database_id='PCPS')
+    """
+    if not database_id:
+        raise ValueError("Must supply database_id. Use imf_databases to find.")
+
+    async def fetch():
+        url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/CodeList/"
+        try:
+            codelist = await _imf_dimensions_async(database_id, times)
+        except ValueError as e:
+            raise _database_id_error(e)
+
+        async def fetch_parameter_data(k):
+            if codelist.loc[k, "parameter"] == "freq":
+                return _freq_codes()
+            else:
+                return _parse_codelist(
+                    await _download_parse_async(url + codelist.loc[k, "code"], times)
+                )
+
+        parameter_data = await asyncio.gather(
+            *[fetch_parameter_data(k) for k in range(codelist.shape[0])]
+        )
+        return dict(zip(codelist["parameter"], parameter_data))
+
+    return await _memoize_async(
+        ("parameters", database_id),
+        lambda result: {key: value.copy() for key, value in result.items()},
+        fetch,
+    )
+
+
+async def imf_dataset_async(
+    database_id: str,
+    parameters: dict = None,
+    start_year: int = None,
+    end_year: int = None,
+    return_raw: bool = False,
+    print_url: bool = False,
+    times: int = 3,
+    include_metadata: bool = False,
+    compact: bool = False,
+    shape: str = "long",
+    **kwargs,
+):
+    """
+    Download a data series from the IMF without blocking the event loop.
+
+    Asynchronous counterpart of imf_dataset, taking the same arguments
+    except stream, auto_split and store_dir, and returning the same results.
+    Many calls can be in flight at once, for instance with asyncio.gather;
+    their requests share a single rate limiter that awaits instead of
+    sleeping.
+
+    Args:
+        database_id (str): Database ID for the database from which you would
+                           like to request data. Can be found using
+                           imf_databases().
+        parameters (dict): Dictionary of data frames providing input parameters
+                           for your API request, as for imf_dataset.
+        start_year (int, optional): Four-digit year. Earliest year for which
+                                    you would like to request data.
+        end_year (int, optional): Four-digit year. Latest year for which you
+                                  would like to request data.
+        return_raw (bool, optional): Whether to return the raw list returned by
+                                     the API instead of a cleaned-up data
+                                     frame.
+        print_url (bool, optional): Whether to print the URL used in the API
+                                    call.
+        times (int, optional): Maximum number of requests to attempt.
+        include_metadata (bool, optional): Whether to return the database
+                                           metadata header along with the data
+                                           series. As for imf_dataset, the
+                                           header is requested at the same
+                                           time as the data, and is no longer
+                                           awaited if the data request fails.
+        compact (bool, optional): Whether to return columns with compact
+                                  dtypes instead of strings, as for
+                                  imf_dataset.
+        shape (str, optional): Either "long" (the default) or "wide", as for
+                               imf_dataset.
+        **kwargs: Additional keyword arguments for specifying parameters as
+                  separate arguments.
+
+    Returns:
+        The same results as imf_dataset.
+
+    Raises:
+        ValueError: If stream, auto_split or store_dir is given; use
+        imf_dataset for these.
+
+    Examples:
+        df1, df2 = await asyncio.gather(
+            imf_dataset_async("PCPS", freq="A", ref_area="W00"),
+            imf_dataset_async("PCPS", freq="M", ref_area="W00"),
+        )
+    """
+    if database_id is None:
+        raise ValueError("Missing required database_id argument.")
+
+    if not isinstance(database_id, str):
+        raise ValueError("database_id must be a string.")
+
+    unsupported = [
+        key for key in ("stream", "auto_split", "store_dir") if key in kwargs
+    ]
+    if unsupported:
+        raise ValueError(
+            f"imf_dataset_async does not support {', '.join(unsupported)}. "
+            "Use imf_dataset instead."
+        )
+
+    if shape not in ("long", "wide"):
+        raise ValueError('shape must be "long" or "wide".')
+
+    years = _dataset_years(start_year, end_year)
+    data_dimensions = await imf_parameters_async(database_id, times)
+    data_dimensions = _dataset_filter(database_id, data_dimensions, parameters, kwargs)
+    url = _dataset_url(database_id, data_dimensions, years)
+
+    if print_url:
+        print(url)
+
+    if include_metadata:
+        # Request the metadata alongside the data rather than after it, and
+        # stop waiting on it if the query fails
+        metadata = asyncio.ensure_future(_imf_metadata_async(url, times))
+        try:
+            raw_dl = _dataset_series(await _download_parse_async(url, times))
+        except BaseException:
+            metadata.cancel()
+            raise
+        metadata = await metadata
+    else:
+        raw_dl = _dataset_series(await _download_parse_async(url, times))
+
+    if return_raw:
+        if include_metadata:
+            return metadata, raw_dl
+        else:
+            return raw_dl
+
+    if shape == "wide":
+        result = _series_to_wide(raw_dl, list(data_dimensions), compact)
+    else:
+        result = _series_to_frame(raw_dl, compact)
+
+    if not include_metadata:
+        return result
+    else:
+        return metadata, result
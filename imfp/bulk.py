@@ -0,0 +1,236 @@
+from os import path, makedirs, replace, remove, fspath, PathLike
+from json import load, dumps
+from tempfile import mkstemp
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+from urllib.parse import quote
+from pandas import DataFrame
+from .data import imf_parameters, imf_dataset
+from .store import _require_pyarrow
+
+
+_manifest_file = "manifest.json"
+
+
+def imf_bulk_download(
+    database_id: str,
+    output_dir: Union[str, PathLike],
+    split_by: str = None,
+    start_year: int = None,
+    end_year: int = None,
+    max_workers: int = 4,
+    file_format: str = "csv",
+    times: int = 3,
+    **kwargs,
+):
+    """
+    Download a whole database (or a large part of one) to disk in resumable
+    chunks.
+
+    The download is split into one imf_dataset request per code of the
+    split_by parameter. Each chunk is written to its own file in
+    output_dir/database_id as soon as it completes, and its outcome is
+    recorded in a manifest.json file alongside. If the download is
+    interrupted, or some chunks fail, calling imf_bulk_download again with the
+    same arguments only requests the chunks that have not completed.
+
+    Chunks are requested by a pool of worker threads that share the rate
+    limit set with set_imf_wait_time (and set_imf_shared_rate_limit), so
+    max_workers bounds the number of requests in flight without raising the
+    request rate. Chunks that are too large are split further, as with
+    imf_dataset's auto_split.
+
+    Args:
+        database_id (str): Database ID of the database to download. Can be
+                           found using imf_databases().
+        output_dir (Union[str, PathLike]): Directory in which to create the
+                                           database's download directory.
+        split_by (str, optional): Parameter whose codes define the chunks.
+                                  Defaults to 'indicator' if the database has
+                                  that parameter, and otherwise to the
+                                  parameter with the most codes.
+        start_year (int, optional): Four-digit year. Earliest year for which
+                                    to request data.
+        end_year (int, optional): Four-digit year. Latest year for which to
+                                  request data.
+        max_workers (int, optional): Maximum number of requests in flight at
+                                     once. Defaults to 4.
+        file_format (str, optional): Either "csv" or "parquet" (which requires
+                                     pyarrow). Defaults to "csv".
+        times (int, optional): Maximum number of requests to attempt for each
+                               chunk.
+        **kwargs: Parameter codes to restrict the download to, as for
+                  imf_dataset. Codes given for split_by are used as the
+                  chunks instead of all of its codes.
+
+    Returns:
+        pandas.DataFrame: One row per chunk, with its 'chunk' code, 'status'
+        ('done', 'empty' if the API had no data for it, or 'failed'), the
+        number of 'rows' written, the 'file' name and any 'error' message.
+
+    Raises:
+        ImportError: If file_format is "parquet" and pyarrow is not
+        installed.
+        ValueError: If an argument is invalid, or output_dir holds a download
+        of the same database started with different arguments.
+
+    Examples:
+        status = imf_bulk_download("IFS", "~/imf_downloads", freq="A")
+        status[status["status"] == "failed"]
+    """
+    if not isinstance(database_id, str) or not database_id:
+        raise ValueError("database_id must be a non-empty string.")
+    if file_format not in ("csv", "parquet"):
+        raise ValueError('file_format must be "csv" or "parquet".')
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("max_workers must be a positive integer.")
+    if file_format == "parquet":
+        _require_pyarrow()
+
+    parameters = imf_parameters(database_id, times)
+    if split_by is None:
+        split_by = (
+            "indicator"
+            if "indicator" in parameters
+            else max(parameters, key=lambda key: len(parameters[key]))
+        )
+    if split_by not in parameters:
+        raise ValueError(
+            f"{split_by} is not a parameter of the {database_id} database. "
+            f"Use imf_parameters('{database_id}') to get valid parameters."
+        )
+
+    if split_by in kwargs:
+        codes = kwargs.pop(split_by)
+        codes = codes if isinstance(codes, list) else [codes]
+    else:
+        codes = parameters[split_by]["input_code"].tolist()
+
+    download_dir = path.join(
+        path.expanduser(fspath(output_dir)), quote(database_id, safe="")
+    )
+    plan = {
+        "database_id": database_id,
+        "split_by": split_by,
+        "start_year": start_year,
+        "end_year": end_year,
+        "parameters": {key: kwargs[key] for key in sorted(kwargs)},
+        "file_format": file_format,
+    }
+    manifest = _bulk_manifest(download_dir, plan)
+    for code in codes:
+        manifest["chunks"].setdefault(code, {"status": "pending"})
+
+    pending = [
+        code
+        for code in codes
+        if manifest["chunks"][code]["status"] not in ("done", "empty")
+    ]
+    manifest_lock = Lock()
+
+    def download_chunk(code):
+        file_name = f"{split_by}={quote(str(code), safe='')}.{file_format}"
+        try:
+            data = imf_dataset(
+                database_id,
+                start_year=start_year,
+                end_year=end_year,
+                times=times,
+                stream=True,
+                auto_split=True,
+                **{**kwargs, split_by: code},
+            )
+        except ValueError as e:
+            if "No data found" in str(e) or "No observations found" in str(e):
+                entry = {"status": "empty"}
+            else:
+                entry = {"status": "failed", "error": str(e)}
+        else:
+            _bulk_write_chunk(data, download_dir, file_name, file_format)
+            entry = {"status": "done", "file": file_name, "rows": len(data)}
+        with manifest_lock:
+            manifest["chunks"][code] = entry
+            _bulk_save_manifest(download_dir, manifest)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(download_chunk, code) for code in pending]:
+            future.result()
+
+    return DataFrame(
+        [
+            {
+                "chunk": code,
+                "status": manifest["chunks"][code]["status"],
+                "rows": manifest["chunks"][code].get("rows", 0),
+                "file": manifest["chunks"][code].get("file"),
+                "error": manifest["chunks"][code].get("error"),
+            }
+            for code in codes
+        ]
+    )
+
+
+def _bulk_manifest(download_dir, plan):
+    """
+    (Internal) Load the manifest of a download directory, or create a new one.
+
+    Raises:
+        ValueError: If the directory holds a download with a different plan.
+    """
+    makedirs(download_dir, exist_ok=True)
+    try:
+        with open(path.join(download_dir, _manifest_file), "r") as file:
+            manifest = load(file)
+    except FileNotFoundError:
+        manifest = {"plan": plan, "chunks": {}}
+        _bulk_save_manifest(download_dir, manifest)
+        return manifest
+
+    if manifest.get("plan") != plan:
+        raise ValueError(
+            f"{download_dir} holds a download started with different arguments "
+            f"({manifest.get('plan')}). Use another output_dir or delete it."
+        )
+    return manifest
+
+
+def _bulk_save_manifest(download_dir, manifest):
+    """
+    (Internal) Atomically write the manifest of a download directory.
+    """
+    content = dumps(manifest, indent=1).encode()
+    _bulk_write_file(download_dir, _manifest_file, lambda file: file.write(content))
+
+
+def _bulk_write_chunk(data, download_dir, file_name, file_format):
+    """
+    (Internal) Atomically write one downloaded chunk.
+    """
+    if file_format == "parquet":
+        _bulk_write_file(
+            download_dir, file_name, lambda file: data.to_parquet(file, index=False)
+        )
+    else:
+        _bulk_write_file(
+            download_dir, file_name, lambda file: data.to_csv(file, index=False)
+        )
+
+
+def _bulk_write_file(directory, file_name, write):
+    """
+    (Internal) Write a file through a temporary file that is moved into place
+    once complete, so that an interrupted download never leaves a partial
+    file.
+    """
+    file_descriptor, temp_path = mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with open(file_descriptor, "wb") as file:
+            write(file)
+        replace(temp_path, path.join(directory, file_name))
+    except BaseException:
+        try:
+            remove(temp_path)
+        except OSError:
+            pass
+        raise
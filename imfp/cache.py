@@ -0,0 +1,635 @@
+from os import environ, path, makedirs, replace, remove, scandir, utime
+from shutil import rmtree
+import gzip
+import re
+from json import load, dump, JSONDecodeError
+from tempfile import mkstemp
+from time import time
+
+
+# Default time-to-live, in seconds, for cached responses from each API endpoint.
+# Catalog endpoints change rarely; data endpoints are refreshed more often.
+_default_ttls = {
+    "Dataflow": 86400,
+    "DataStructure": 86400,
+    "CodeList": 86400,
+    "GenericMetadata": 86400,
+    "CompactData": 3600,
+}
+_default_ttl = 3600
+_default_max_size = 512 * 1024**2
+_objects_dir = "objects"
+# Seconds during which a payload no entry refers to is kept, as it may belong
+# to an entry that is being committed
+_orphan_grace = 60
+
+
+def _cache_dir():
+    """
+    (Internal) Get the directory of the on-disk response cache.
+
+    Returns:
+        str: The cache directory, or None if the cache is disabled.
+    """
+    cache_dir = environ.get("IMF_CACHE_DIR")
+    return cache_dir if cache_dir else None
+
+
+def _cache_endpoint(URL):
+    """
+    (Internal) Extract the API endpoint name (e.g. 'CompactData') from a URL.
+
+    Args:
+        URL (str): The API request URL.
+
+    Returns:
+        str: The endpoint name, or None if the URL has no recognizable
+        endpoint.
+    """
+    matches = re.search("SDMX_JSON\\.svc/([^/?]+)", URL)
+    return matches.group(1) if matches else None
+
+
+def _cache_ttl(URL):
+    """
+    (Internal) Get the time-to-live, in seconds, for a cached response.
+
+    Per-endpoint values set with set_imf_cache take precedence over the
+    defaults.
+
+    Args:
+        URL (str): The API request URL.
+
+    Returns:
+        float: The number of seconds a response stays fresh.
+    """
+    endpoint = _cache_endpoint(URL)
+    if endpoint:
+        ttl = environ.get(f"IMF_CACHE_TTL_{endpoint.upper()}")
+        if ttl is not None:
+            return float(ttl)
+    ttl = environ.get("IMF_CACHE_TTL")
+    if ttl is not None:
+        return float(ttl)
+    return float(_default_ttls.get(endpoint, _default_ttl))
+
+
+def _cache_max_size():
+    """
+    (Internal) Get the maximum total size of the cache directory in bytes.
+    """
+    return int(environ.get("IMF_CACHE_MAX_SIZE", _default_max_size))
+
+
+def _cache_path(URL, cache_dir):
+    from hashlib import sha256
+
+    file_name = sha256(URL.encode()).hexdigest()
+    return path.join(cache_dir, f"{file_name}.json")
+
+
+def _cache_object_path(cache_dir, content_hash):
+    return path.join(cache_dir, _objects_dir, f"{content_hash}.gz")
+
+
+def _cache_load(URL, stream=False):
+    """
+    (Internal) Load a fresh response for a URL from the on-disk cache.
+
+    Expired entries are treated as misses, but may still be revalidated (see
+    _cache_stale). Each hit refreshes the modification time of the entry's
+    sidecar file, which is used as its last-access time for LRU eviction.
+
+    Args:
+        URL (str): The API request URL.
+        stream (bool, optional): Whether to return the content as an iterator
+        over chunks of UTF-8 bytes, decompressed as they are consumed.
+        Defaults to False.
+
+    Returns:
+        tuple: The cached (status_code, content), with content as UTF-8
+        bytes, or (None, None) on a miss.
+    """
+    file_path, data = _cache_entry(URL, "chunks" if stream else "bytes")
+    if data is None or time() - data.get("timestamp", 0) > _cache_ttl(URL):
+        return None, None
+
+    try:
+        utime(file_path)
+    except OSError:
+        pass
+    return data.get("status_code"), data.get("content")
+
+
+def _cache_stale(URL):
+    """
+    (Internal) Load an expired on-disk cache entry that can be revalidated
+    with a conditional request.
+
+    The response body is not read until the entry is known to be unchanged
+    (see _cache_content).
+
+    Args:
+        URL (str): The API request URL.
+
+    Returns:
+        dict: The entry, with its 'status_code' and 'validators' (the ETag
+        and Last-Modified headers it was served with), or None if there is no
+        entry or it has no validators.
+    """
+    file_path, data = _cache_entry(URL, None)
+    if data is None or not data.get("validators"):
+        return None
+    if "payload" in data:
+        object_path = _cache_object_path(path.dirname(file_path), data["payload"])
+        if not path.exists(object_path):
+            return None
+    return data
+
+
+def _cache_entry(URL, content="bytes"):
+    """
+    (Internal) Read the on-disk cache entry for a URL, fresh or not.
+
+    Args:
+        URL (str): The API request URL.
+        content (str, optional): How to read the response body (see
+        _cache_read). Defaults to 'bytes'.
+
+    Returns:
+        tuple: The entry's file path and its contents as a dictionary, or
+        None in place of the contents if there is no valid entry.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return None, None
+
+    file_path = _cache_path(URL, cache_dir)
+    data = _cache_read(cache_dir, file_path, content)
+    if data is None or data.get("url") != URL:
+        return file_path, None
+    return file_path, data
+
+
+def _cache_read(cache_dir, file_path, content="bytes"):
+    """
+    (Internal) Read a cache entry from its sidecar file and the compressed
+    payload it refers to.
+
+    Entries in the earlier format, which held the response body as an
+    escaped string in the sidecar, are read as well.
+
+    Args:
+        cache_dir (str): The directory holding the entry.
+        file_path (str): The path of the entry's sidecar file.
+        content (str, optional): How to read the response body: 'bytes' to
+        read it in full, 'chunks' for an iterator decompressing it as it is
+        consumed, or None to leave it unread. Defaults to 'bytes'.
+
+    Returns:
+        dict: The entry, with the response body as its 'content', or None if
+        it is missing or unreadable.
+    """
+    try:
+        with open(file_path, "r") as file:
+            data = load(file)
+    except (OSError, JSONDecodeError):
+        return None
+    if isinstance(data.get("content"), str):
+        data["content"] = data["content"].encode()
+    if content is not None:
+        data["content"] = _cache_content(cache_dir, data, content == "chunks")
+        if data["content"] is None:
+            return None
+    return data
+
+
+def _cache_content(cache_dir, entry, stream=False, chunk_size=65536):
+    """
+    (Internal) Read the response body of a cache entry.
+
+    Args:
+        cache_dir (str): The directory holding the entry.
+        entry (dict): The entry, as read from its sidecar file.
+        stream (bool, optional): Whether to return an iterator over chunks
+        of the body, decompressed as they are consumed, so that the body is
+        never held in memory in full. Defaults to False.
+        chunk_size (int, optional): The size of the chunks in bytes.
+
+    Returns:
+        The body as UTF-8 bytes, or an iterator over chunks of it, or None if
+        the payload is missing or unreadable.
+    """
+    if "payload" not in entry:
+        content = entry.get("content")
+        return iter([content]) if stream and content is not None else content
+
+    object_path = _cache_object_path(cache_dir, entry["payload"])
+    try:
+        file = gzip.open(object_path, "rb")
+        if stream:
+            return _cache_chunks(file, chunk_size)
+        with file:
+            return file.read()
+    except (OSError, EOFError):
+        return None
+
+
+def _cache_chunks(file, chunk_size):
+    """
+    (Internal) Yield successive chunks read from an open compressed payload,
+    closing it once it has been read.
+
+    Raises:
+        ValueError: If the payload turns out to be corrupt.
+    """
+    with file:
+        try:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        except (OSError, EOFError) as e:
+            raise ValueError(f"Cached response could not be read: {e}") from e
+
+
+def _cache_conditional_headers(entry):
+    """
+    (Internal) Build the headers of a conditional request revalidating a
+    cache entry from _cache_stale.
+    """
+    validators = entry["validators"]
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def _cache_validators(response_headers, entry=None):
+    """
+    (Internal) Extract the validators to store with a response from its
+    headers, falling back to those of the revalidated entry for validators
+    that a 304 Not Modified response does not repeat.
+
+    Args:
+        response_headers (Mapping): The response headers.
+        entry (dict, optional): The entry revalidated by the response.
+
+    Returns:
+        dict: The 'etag' and 'last_modified' validators that were found.
+    """
+    previous = entry["validators"] if entry is not None else {}
+    validators = {
+        "etag": response_headers.get("ETag") or previous.get("etag"),
+        "last_modified": (
+            response_headers.get("Last-Modified") or previous.get("last_modified")
+        ),
+    }
+    return {key: value for key, value in validators.items() if value}
+
+
+def _cache_save(URL, status, content, validators=None, cache_dir=None):
+    """
+    (Internal) Atomically write a response to the on-disk cache.
+
+    The entry is written to temporary files in the cache directory and then
+    moved into place, so concurrent readers never see a partial file. The
+    cache is then trimmed to its maximum size.
+
+    Args:
+        URL (str): The API request URL.
+        status (int): The HTTP status code of the response.
+        content (Union[bytes, str]): The response body.
+        validators (dict, optional): The response's validators, from
+        _cache_validators.
+        cache_dir (str, optional): Directory to write the entry to instead of
+        the configured cache, without size limit (e.g. for recording test
+        responses).
+
+    Returns:
+        None
+    """
+    writer = _cache_writer(URL, status, validators, cache_dir)
+    if writer is None:
+        return None
+
+    try:
+        writer.write(content)
+        writer.commit()
+    finally:
+        writer.abort()
+    return None
+
+
+def _cache_writer(URL, status, validators=None, cache_dir=None):
+    """
+    (Internal) Start writing a response to the on-disk cache incrementally.
+
+    Args:
+        URL (str): The API request URL.
+        status (int): The HTTP status code of the response.
+        validators (dict, optional): The response's validators, from
+        _cache_validators.
+        cache_dir (str, optional): Directory to write the entry to instead of
+        the configured cache, without size limit.
+
+    Returns:
+        _CacheWriter: A writer to which the response body is written in
+        chunks, or None if the cache is disabled.
+    """
+    max_size = None
+    if cache_dir is None:
+        cache_dir = _cache_dir()
+        if cache_dir is None:
+            return None
+        max_size = _cache_max_size()
+    sidecar = {
+        "url": URL,
+        "timestamp": time(),
+        "status_code": status,
+        "validators": validators or {},
+    }
+    return _CacheWriter(cache_dir, _cache_path(URL, cache_dir), sidecar, max_size)
+
+
+class _CacheWriter:
+    """
+    (Internal) Incremental, atomic writer for one on-disk cache entry.
+
+    Each entry is a small JSON sidecar file, named by the hash of the URL,
+    holding the status, validators and timestamp of the response, and the
+    hash of its body. Bodies are stored gzip-compressed in the objects
+    subdirectory, named by the hash of their content, so identical responses
+    to different URLs are stored once.
+
+    The body is hashed and compressed chunk by chunk into a temporary file.
+    commit moves it into place (unless an identical body is already stored),
+    then writes the sidecar the same way, and deletes the payload of the
+    entry it replaced if no other entry refers to it. abort discards the
+    temporary file if the entry was not committed, and is safe to call after
+    commit.
+
+    Args:
+        cache_dir (str): The cache directory.
+        sidecar_path (str): The path of the entry's sidecar file.
+        sidecar (dict): The fields of the sidecar, other than the hash of the
+        body.
+        max_size (int, optional): Size in bytes to trim the cache directory to
+        once the entry is written. Defaults to no limit.
+    """
+
+    def __init__(self, cache_dir, sidecar_path, sidecar, max_size=None):
+        self._cache_dir = cache_dir
+        self._sidecar_path = sidecar_path
+        self._sidecar = sidecar
+        self._max_size = max_size
+        from hashlib import sha256
+
+        self._hash = sha256()
+        makedirs(cache_dir, exist_ok=True)
+        file_descriptor, self._temp_path = mkstemp(dir=cache_dir, suffix=".tmp")
+        self._file = open(file_descriptor, "wb")
+        self._done = False
+        try:
+            self._gzip = gzip.GzipFile(
+                fileobj=self._file, mode="wb", compresslevel=6, mtime=0
+            )
+        except BaseException:
+            self.abort()
+            raise
+
+    def write(self, data):
+        # Accepts text chunks of streamed responses, or bytes
+        if isinstance(data, str):
+            data = data.encode()
+        self._hash.update(data)
+        self._gzip.write(data)
+
+    def commit(self):
+        self._gzip.close()
+        self._file.close()
+        content_hash = self._hash.hexdigest()
+        object_path = _cache_object_path(self._cache_dir, content_hash)
+        makedirs(path.dirname(object_path), exist_ok=True)
+        if path.exists(object_path):
+            remove(self._temp_path)
+            # Mark the stored payload as in use, so that it is not deleted as
+            # unreferenced before the sidecar below refers to it
+            try:
+                utime(object_path)
+            except OSError:
+                pass
+        else:
+            replace(self._temp_path, object_path)
+        self._done = True
+
+        previous = _cache_read(self._cache_dir, self._sidecar_path, None)
+        self._sidecar["payload"] = content_hash
+        _cache_write_sidecar(self._cache_dir, self._sidecar_path, self._sidecar)
+        if previous is not None and previous.get("payload") not in (
+            None,
+            content_hash,
+        ):
+            _cache_release(self._cache_dir, previous["payload"])
+        if self._max_size is not None:
+            _cache_evict(self._cache_dir, self._max_size)
+
+    def abort(self):
+        if self._done:
+            return None
+        self._done = True
+        self._gzip.close()
+        self._file.close()
+        try:
+            remove(self._temp_path)
+        except OSError:
+            pass
+        return None
+
+
+def _cache_write_sidecar(cache_dir, file_path, sidecar):
+    """
+    (Internal) Atomically write the sidecar file of a cache entry.
+    """
+    file_descriptor, temp_path = mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with open(file_descriptor, "w") as file:
+            dump(sidecar, file)
+        replace(temp_path, file_path)
+    except BaseException:
+        try:
+            remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _cache_migrate(cache_dir):
+    """
+    (Internal) Convert the entries of a cache directory (or of recorded test
+    responses) from the earlier format, which held the response body as an
+    escaped string in each JSON file, to compressed, deduplicated payloads
+    with sidecar files. Entries already converted are left as they are.
+
+    Args:
+        cache_dir (str): The directory to convert.
+
+    Returns:
+        int: The number of entries converted.
+    """
+    converted = 0
+    with scandir(cache_dir) as iterator:
+        file_paths = [
+            entry.path
+            for entry in iterator
+            if entry.is_file() and entry.name.endswith(".json")
+        ]
+    for file_path in sorted(file_paths):
+        data = _cache_read(cache_dir, file_path)
+        if data is None or "payload" in data or "content" not in data:
+            continue
+        content = data.pop("content") or ""
+        writer = _CacheWriter(cache_dir, file_path, data)
+        try:
+            writer.write(content)
+            writer.commit()
+        finally:
+            writer.abort()
+        converted += 1
+    return converted
+
+
+def _cache_sidecars(cache_dir):
+    """
+    (Internal) List the sidecar files of a cache directory.
+
+    Returns:
+        list: A (modification time, size, path) tuple for each sidecar.
+    """
+    entries = []
+    with scandir(cache_dir) as iterator:
+        for entry in iterator:
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _cache_payloads(entries):
+    """
+    (Internal) Read the payload hash each sidecar refers to.
+
+    Returns:
+        dict: The payload hash (or None) of each sidecar path.
+    """
+    payloads = {}
+    for _, _, file_path in entries:
+        try:
+            with open(file_path, "r") as file:
+                payloads[file_path] = load(file).get("payload")
+        except (OSError, JSONDecodeError):
+            payloads[file_path] = None
+    return payloads
+
+
+def _cache_remove_orphan(cache_dir, payload, referenced, grace=_orphan_grace):
+    """
+    (Internal) Delete a payload if no entry refers to it and it was not
+    written or reused within the last grace seconds.
+
+    Returns:
+        bool: Whether the payload was deleted.
+    """
+    if payload in referenced:
+        return False
+    object_path = _cache_object_path(cache_dir, payload)
+    try:
+        if grace > 0 and time() - path.getmtime(object_path) < grace:
+            return False
+        remove(object_path)
+    except OSError:
+        return False
+    return True
+
+
+def _cache_release(cache_dir, payload):
+    """
+    (Internal) Delete the payload of an overwritten cache entry, unless
+    another entry still refers to it.
+
+    If a concurrent writer reuses the payload before its sidecar refers to
+    it, that entry is read as a miss and written again on the next request.
+    """
+    referenced = set(_cache_payloads(_cache_sidecars(cache_dir)).values())
+    _cache_remove_orphan(cache_dir, payload, referenced, grace=0)
+    return None
+
+
+def _cache_evict(cache_dir, max_size):
+    """
+    (Internal) Delete least recently used cache entries until the total size
+    of the cache directory, sidecars and payloads, is at most max_size bytes.
+
+    Payloads that no entry refers to (for instance, left behind by a process
+    that stopped while overwriting an entry) are deleted first. Then a payload
+    is deleted once no remaining entry refers to it.
+    """
+    entries = _cache_sidecars(cache_dir)
+    total_size = sum(size for _, size, _ in entries)
+    object_sizes = {}
+    objects_dir = path.join(cache_dir, _objects_dir)
+    if path.isdir(objects_dir):
+        with scandir(objects_dir) as iterator:
+            for entry in iterator:
+                if entry.is_file() and entry.name.endswith(".gz"):
+                    object_sizes[entry.name[: -len(".gz")]] = entry.stat().st_size
+        total_size += sum(object_sizes.values())
+
+    if total_size <= max_size:
+        return None
+
+    # Count the entries referring to each payload
+    payloads = _cache_payloads(entries)
+    references = {}
+    for payload in payloads.values():
+        references[payload] = references.get(payload, 0) + 1
+
+    for payload, size in list(object_sizes.items()):
+        if _cache_remove_orphan(cache_dir, payload, references):
+            del object_sizes[payload]
+            total_size -= size
+    if total_size <= max_size:
+        return None
+
+    for _, size, file_path in sorted(entries):
+        try:
+            remove(file_path)
+        except OSError:
+            continue
+        total_size -= size
+        payload = payloads[file_path]
+        references[payload] -= 1
+        if payload in object_sizes and references[payload] == 0:
+            try:
+                remove(_cache_object_path(cache_dir, payload))
+                total_size -= object_sizes[payload]
+            except OSError:
+                pass
+        if total_size <= max_size:
+            break
+    return None
+
+
+def _cache_clear():
+    """
+    (Internal) Delete every entry in the on-disk cache, and every payload.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None or not path.isdir(cache_dir):
+        return None
+    _cache_evict(cache_dir, -1)
+    rmtree(path.join(cache_dir, _objects_dir), ignore_errors=True)
+    return None
@@ -1,9 +1,275 @@
-from pandas import DataFrame, Series, concat
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from math import nan
+from time import perf_counter
+from numpy import array, full
+from pandas import (
+    DataFrame,
+    CategoricalDtype,
+    DatetimeIndex,
+    Index,
+    MultiIndex,
+    Series,
+    Categorical,
+    concat,
+    factorize,
+    to_numeric,
+    to_datetime,
+)
+from pandas.api.types import is_datetime64_any_dtype
 from warnings import warn
-from .utils import _download_parse, _imf_dimensions, _imf_metadata
+from .utils import (
+    _download_parse,
+    _download_parse_stream,
+    _imf_dimensions,
+    _imf_metadata,
+    _memoize,
+    _report_event,
+)
 from urllib.parse import urlencode
 
 
+def _series_to_frame(series, compact=False):
+    """
+    (Internal) Build a long-format DataFrame from CompactData series.
+
+    Series attributes and observations are collected into flat column lists
+    in a single pass and the DataFrame is constructed once at the end, with
+    each series' attributes repeated for each of its observations. Columns
+    appear in order of first appearance, with '@' prefixes removed and names
+    lowercased; values missing from a series or observation are NaN.
+
+    Args:
+        series (Union[dict, list, Iterable[dict]]): A single series dict from
+        CompactData.DataSet.Series, or a list or iterable of them.
+        compact (bool, optional): Whether to convert each column list to a
+        compact dtype (see _compact_column) instead of object strings.
+        Defaults to False.
+
+    Returns:
+        pandas.DataFrame: One row per observation. The index restarts at 0
+        for each series.
+
+    Raises:
+        ValueError: If a series attribute is not scalar or a series has no
+        observations.
+    """
+    if isinstance(series, dict):
+        series = [series]
+
+    columns = {}
+    index = []
+    n_rows = 0
+    for item in series:
+        try:
+            obs = item["Obs"]
+        except KeyError:
+            raise ValueError(
+                "No observations found for that combination of parameters. "
+                "start_year and end_year may be outside the dataset's range."
+            )
+        if not isinstance(obs, list):
+            obs = [obs]
+        n_obs = len(obs)
+
+        # Repeat each series attribute once per observation
+        for key, value in item.items():
+            if key == "Obs":
+                continue
+            if isinstance(value, (list, tuple, set, Series)):
+                raise ValueError("Expected item to be scalar, but it's not.")
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [nan] * n_rows
+            column.extend([value] * n_obs)
+
+        # Add one value per observation for each observation field
+        for key in dict.fromkeys(key for o in obs for key in o):
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [nan] * n_rows
+            column.extend([o.get(key, nan) for o in obs])
+
+        n_rows += n_obs
+        index.extend(range(n_obs))
+
+        # Pad columns that this series did not contain
+        for column in columns.values():
+            if len(column) < n_rows:
+                column.extend([nan] * (n_rows - len(column)))
+
+    if compact:
+        return DataFrame(
+            {
+                key.replace("@", "").lower(): _compact_column(
+                    key.replace("@", "").lower(), values
+                )
+                for key, values in columns.items()
+            },
+            index=index,
+        )
+
+    result = DataFrame(columns, index=index)
+    result.columns = result.columns.str.replace("@", "").str.lower()
+    return result
+
+
+def _series_to_wide(series, dimensions, compact=False):
+    """
+    (Internal) Build a wide matrix of observation values from CompactData
+    series.
+
+    Observations are collected into flat arrays of series and period codes in
+    a single pass. The union of time periods is then sorted and the values
+    are written into a preallocated float64 array with one row per period
+    and one column per series. Values that are not numbers become NaN.
+
+    Args:
+        series (Union[dict, list, Iterable[dict]]): A single series dict from
+        CompactData.DataSet.Series, or a list or iterable of them.
+        dimensions (list): Names of the parameters identifying each series,
+        e.g. ['freq', 'ref_area', 'indicator'].
+        compact (bool, optional): Whether to index periods by the datetime at
+        which they start and to give attribute columns compact dtypes, as for
+        _series_to_frame. Defaults to False.
+
+    Returns:
+        tuple: The matrix as a pandas.DataFrame indexed by time_period, with
+        a column MultiIndex of the series' parameter codes, and a
+        pandas.DataFrame of the remaining series attributes with the same
+        index as the matrix's columns.
+
+    Raises:
+        ValueError: If a series attribute is not scalar or a series has no
+        observations.
+    """
+    if isinstance(series, dict):
+        series = [series]
+
+    keys = []
+    attributes = {}
+    periods = []
+    values = []
+    columns = []
+    for item in series:
+        try:
+            obs = item["Obs"]
+        except KeyError:
+            raise ValueError(
+                "No observations found for that combination of parameters. "
+                "start_year and end_year may be outside the dataset's range."
+            )
+        if not isinstance(obs, list):
+            obs = [obs]
+
+        labels = {}
+        for key, value in item.items():
+            if key == "Obs":
+                continue
+            if isinstance(value, (list, tuple, set, Series)):
+                raise ValueError("Expected item to be scalar, but it's not.")
+            labels[key.replace("@", "").lower()] = value
+        keys.append(tuple(labels.pop(key, nan) for key in dimensions))
+        for key, value in labels.items():
+            column = attributes.get(key)
+            if column is None:
+                column = attributes[key] = [nan] * (len(keys) - 1)
+            column.append(value)
+        for column in attributes.values():
+            if len(column) < len(keys):
+                column.append(nan)
+
+        for o in obs:
+            periods.append(o.get("@TIME_PERIOD", nan))
+            values.append(o.get("@OBS_VALUE", nan))
+        columns.extend([len(keys) - 1] * len(obs))
+
+    period_codes, period_uniques = factorize(array(periods, dtype=object))
+    if compact:
+        index = DatetimeIndex(_parse_time_period(Series(period_uniques, dtype=object)))
+    else:
+        index = Index(period_uniques)
+    order = index.argsort()
+
+    # Observations without a time period are dropped
+    found = period_codes >= 0
+    rows = order.argsort()[period_codes[found]]
+    matrix = full((len(index), len(keys)), nan)
+    matrix[rows, array(columns, dtype=int)[found]] = _compact_column(
+        "obs_value", values
+    )[found]
+
+    if keys:
+        columns = MultiIndex.from_tuples(keys, names=dimensions)
+    else:
+        columns = MultiIndex.from_arrays([[]] * len(dimensions), names=dimensions)
+    wide = DataFrame(matrix, index=index[order].rename("time_period"), columns=columns)
+    if compact:
+        attributes = {
+            key: _compact_column(key, value) for key, value in attributes.items()
+        }
+    return wide, DataFrame(attributes, index=columns)
+
+
+def _compact_column(name, values):
+    """
+    (Internal) Convert a column list built by _series_to_frame to a compact
+    array.
+
+    obs_value becomes float64 (values that are not numbers become NaN),
+    unit_mult a nullable Int8, and time_period a datetime64 of the start of
+    each period. All other columns, which repeat a small set of codes,
+    become categoricals. unit_mult and time_period are parsed once per
+    distinct value.
+    """
+    if name == "obs_value":
+        try:
+            return array(values, dtype="float64")
+        except (TypeError, ValueError):
+            return to_numeric(Series(values, dtype=object), errors="coerce").to_numpy(
+                dtype="float64", na_value=nan
+            )
+
+    if name == "unit_mult":
+        codes, uniques = factorize(array(values, dtype=object))
+        uniques = to_numeric(Series(uniques, dtype=object), errors="coerce")
+        return uniques.astype("Int8").array.take(codes, allow_fill=True)
+    if name == "time_period":
+        codes, uniques = factorize(array(values, dtype=object))
+        uniques = _parse_time_period(Series(uniques, dtype=object))
+        return uniques.array.take(codes, allow_fill=True)
+    return Categorical(values)
+
+
+def _frame_to_compact(frame):
+    """
+    (Internal) Convert the columns of a data frame built by _series_to_frame
+    to compact dtypes, as with compact=True.
+    """
+    return DataFrame(
+        {
+            key: _compact_column(key, frame[key].to_numpy(dtype=object))
+            for key in frame.columns
+        },
+        index=frame.index,
+    )
+
+
+def _parse_time_period(values):
+    """
+    (Internal) Parse SDMX time periods ('2020', '2020-Q1', '2020-03' or
+    '2020-03-31') to the datetimes at which they start.
+    """
+    values = values.astype("string")
+    year = values.str[:4]
+    quarter = values.str.extract("^\\d{4}-Q([1-4])$", expand=False)
+    quarter_month = (quarter.astype("Int8") * 3 - 2).astype("string").str.zfill(2)
+    dates = values.mask(values.str.len() == 4, year + "-01-01")
+    dates = dates.mask(values.str.len() == 7, values + "-01")
+    dates = dates.mask(quarter.notna(), year + "-" + quarter_month + "-01")
+    return to_datetime(dates, format="%Y-%m-%d", errors="coerce")
+
+
 def imf_databases(times=3):
     """
     List IMF database IDs and descriptions
@@ -28,7 +294,14 @@ def imf_databases(times=3):
     """
     url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
     raw_dl = _download_parse(url, times)
+    return _parse_databases(raw_dl)
 
+
+def _parse_databases(raw_dl):
+    """
+    (Internal) Build the imf_databases DataFrame from a parsed Dataflow
+    response.
+    """
     database_id = [
         dataflow["KeyFamilyRef"]["KeyFamilyID"]
         for dataflow in raw_dl["Structure"]["Dataflows"]["Dataflow"]
@@ -42,11 +315,25 @@ def imf_databases(times=3):
     return database_list
 
 
+_codelist_max_workers = 8
+
+
+@_memoize(
+    key=lambda database_id=None, times=2: ("parameters", database_id),
+    copy=lambda result: {key: value.copy() for key, value in result.items()},
+)
 def imf_parameters(database_id, times=2):
     """
     List input parameters and available parameter values for use in
     making API requests from a given IMF database.
 
+    The code list of each parameter is requested concurrently, so a cold
+    call takes about one rate-limit interval per parameter rather than one
+    full request per parameter. Results are memoized in process, so repeated
+    calls for the same database (including the validation performed by
+    imf_dataset) only make API requests once. Use clear_imf_memo to force a
+    refresh.
+
     Parameters
     ----------
     database_id : str
@@ -78,49 +365,79 @@ def imf_parameters(database_id, times=2):
     try:
         codelist = _imf_dimensions(database_id, times)
     except ValueError as e:
-        if "There is an issue" in str(e):
-            raise ValueError(
-                f"{e}\n\nDid you supply a valid database_id? "
-                "Use imf_databases to find."
-            )
-        else:
-            raise ValueError(e)
+        raise _database_id_error(e)
 
     def fetch_parameter_data(k, url, times):
         if codelist.loc[k, "parameter"] == "freq":
-            return DataFrame(
-                {
-                    "input_code": ["A", "M", "Q"],
-                    "description": ["Annual", "Monthly", "Quarterly"],
-                }
-            )
+            return _freq_codes()
         else:
-            raw = _download_parse(url + codelist.loc[k, "code"], times)["Structure"][
-                "CodeLists"
-            ]["CodeList"]["Code"]
-            if isinstance(raw, list):
-                return DataFrame(
-                    {
-                        "input_code": [code["@value"] for code in raw],
-                        "description": [code["Description"]["#text"] for code in raw],
-                    }
-                )
-            else:
-                return DataFrame(
-                    {
-                        "input_code": [raw["@value"]],
-                        "description": [raw["Description"]["#text"]],
-                    }
-                )
+            return _parse_codelist(
+                _download_parse(url + codelist.loc[k, "code"], times)
+            )
 
-    parameter_list = {
-        codelist.loc[k, "parameter"]: fetch_parameter_data(k, url, times)
-        for k in range(codelist.shape[0])
-    }
+    # Code lists are independent, so they are requested concurrently (subject
+    # to the shared rate limit) and each is parsed as soon as it arrives
+    max_workers = max(1, min(codelist.shape[0], _codelist_max_workers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(fetch_parameter_data, k, url, times)
+            for k in range(codelist.shape[0])
+        ]
+        parameter_list = {
+            codelist.loc[k, "parameter"]: future.result()
+            for k, future in enumerate(futures)
+        }
 
     return parameter_list
 
 
+def _database_id_error(e):
+    """
+    (Internal) Add a hint about invalid database IDs to an error raised while
+    fetching a database's dimensions.
+    """
+    if "There is an issue" in str(e):
+        return ValueError(
+            f"{e}\n\nDid you supply a valid database_id? " "Use imf_databases to find."
+        )
+    else:
+        return ValueError(e)
+
+
+def _freq_codes():
+    """
+    (Internal) The input codes accepted for the 'freq' parameter.
+    """
+    return DataFrame(
+        {
+            "input_code": ["A", "M", "Q"],
+            "description": ["Annual", "Monthly", "Quarterly"],
+        }
+    )
+
+
+def _parse_codelist(raw_dl):
+    """
+    (Internal) Build an input_code/description DataFrame from a parsed
+    CodeList response.
+    """
+    raw = raw_dl["Structure"]["CodeLists"]["CodeList"]["Code"]
+    if isinstance(raw, list):
+        return DataFrame(
+            {
+                "input_code": [code["@value"] for code in raw],
+                "description": [code["Description"]["#text"] for code in raw],
+            }
+        )
+    else:
+        return DataFrame(
+            {
+                "input_code": [raw["@value"]],
+                "description": [raw["Description"]["#text"]],
+            }
+        )
+
+
 def imf_parameter_defs(database_id, times=3, inputs_only=True):
     """
     Get text descriptions of input parameters used in making API
@@ -159,13 +476,7 @@ def imf_parameter_defs(database_id, times=3, inputs_only=True):
             ["parameter", "description"]
         ]
     except ValueError as e:
-        if "There is an issue" in str(e):
-            raise ValueError(
-                f"{e}\n\nDid you supply a valid database_id? "
-                "Use imf_databases to find."
-            )
-        else:
-            raise ValueError(e)
+        raise _database_id_error(e)
 
     return parameterlist
 
@@ -179,6 +490,11 @@ def imf_dataset(
     print_url: bool = False,
     times: int = 3,
     include_metadata: bool = False,
+    stream: bool = False,
+    auto_split: bool = False,
+    store_dir: str = None,
+    compact: bool = False,
+    shape: str = "long",
     **kwargs,
 ):
     """
@@ -205,7 +521,46 @@ def imf_dataset(
         times (int, optional): Maximum number of requests to attempt.
         include_metadata (bool, optional): Whether to return the database
                                            metadata header along with the data
-                                           series.
+                                           series. The header is requested
+                                           at the same time as the data, and
+                                           only once per database. If the
+                                           data request fails, its error is
+                                           raised without waiting for the
+                                           header, whose request may already
+                                           have been sent.
+        stream (bool, optional): Whether to parse the response incrementally
+                                 as it is downloaded, building the data frame
+                                 one series at a time instead of holding the
+                                 whole response in memory. Recommended for
+                                 very large requests.
+        auto_split (bool, optional): Whether to recover from requests that the
+                                     API rejects as too large by splitting
+                                     them into smaller requests and merging
+                                     the results. The parameter with the most
+                                     requested codes is halved first; once
+                                     every parameter has a single code, the
+                                     range from start_year to end_year is
+                                     halved (only if both are supplied).
+        store_dir (str, optional): Root directory of a local store to save the
+                                   data frame to with imf_store_write, for
+                                   later reading with imf_store_read.
+                                   The strings returned by the API are
+                                   stored, even if compact is True.
+                                   Requires pyarrow.
+        compact (bool, optional): Whether to return columns with compact
+                                  dtypes instead of strings: obs_value as
+                                  float64, unit_mult as a nullable small
+                                  integer, time_period as the datetime at
+                                  which each period starts, and all other
+                                  columns as categoricals. Uses a fraction of
+                                  the memory on large requests.
+        shape (str, optional): Either "long" (the default), for one row per
+                               observation, or "wide", for a matrix of
+                               obs_value with one row per time period and one
+                               column per series. Wide output is built
+                               directly from the response, without a long
+                               data frame, and observation attributes (such
+                               as obs_status) are not included.
         **kwargs: Additional keyword arguments for specifying parameters as
                   separate arguments. Use imf_parameters() to identify which
                   parameters to use for requests from a given database and to
@@ -217,6 +572,10 @@ def imf_dataset(
         include_metadata == True, returns a tuple whose first item is the
         database header, and whose second item is the pandas DataFrame. If
         return_raw == True, returns the raw JSON fetched from the API endpoint.
+        If shape == "wide", the pandas DataFrame is replaced by a tuple of two
+        data frames: the obs_value matrix, indexed by time_period, and a
+        table of series attributes (such as unit_mult) with one row per
+        column of the matrix. Both are indexed by the series' parameter codes.
     """
 
     if database_id is None:
@@ -225,6 +584,303 @@ def imf_dataset(
     if not isinstance(database_id, str):
         raise ValueError("database_id must be a string.")
 
+    if shape not in ("long", "wide"):
+        raise ValueError('shape must be "long" or "wide".')
+
+    if shape == "wide" and store_dir is not None:
+        raise ValueError('store_dir can only be used with shape="long".')
+
+    years = _dataset_years(start_year, end_year)
+    data_dimensions = imf_parameters(database_id, times)
+    data_dimensions = _dataset_filter(database_id, data_dimensions, parameters, kwargs)
+    url = _dataset_url(database_id, data_dimensions, years)
+
+    if print_url:
+        print(url)
+
+    if include_metadata:
+        # Request the metadata alongside the data rather than after it
+        executor = ThreadPoolExecutor(max_workers=1)
+        metadata = executor.submit(_imf_metadata, url, times)
+        executor.shutdown(wait=False)
+
+    try:
+        if stream or auto_split:
+            if stream:
+
+                def fetch(url):
+                    return _download_parse_stream(
+                        url, ["CompactData", "DataSet", "Series"], times
+                    )
+
+            else:
+
+                def fetch(url):
+                    try:
+                        series = _dataset_series(_download_parse(url, times))
+                    except ValueError as e:
+                        if "No data found" in str(e):
+                            return []
+                        raise
+                    return series if isinstance(series, list) else [series]
+
+            if auto_split:
+                raw_dl = _dataset_split_series(
+                    database_id,
+                    data_dimensions,
+                    imf_parameters(database_id, times),
+                    years,
+                    fetch,
+                )
+            else:
+                raw_dl = iter(fetch(url))
+
+            first = next(raw_dl, None)
+            if first is None:
+                raise ValueError(
+                    "No data found for that combination of parameters. "
+                    "Try making your request less restrictive."
+                )
+            raw_dl = chain([first], raw_dl)
+            if return_raw:
+                raw_dl = list(raw_dl)
+        else:
+            raw_dl = _dataset_series(_download_parse(url, times))
+
+        if return_raw:
+            if include_metadata:
+                return metadata.result(), raw_dl
+            else:
+                return raw_dl
+
+        start = perf_counter()
+        if shape == "wide":
+            result = _series_to_wide(raw_dl, list(data_dimensions), compact)
+        else:
+            result = _series_to_frame(raw_dl, compact and store_dir is None)
+        _report_event({"event": "build", "url": url, "build": perf_counter() - start})
+
+        if store_dir is not None:
+            from .store import imf_store_write
+
+            # The store keeps the strings returned by the API, so compact
+            # dtypes are only applied once the data frame has been stored
+            imf_store_write(result, store_dir, database_id, times=times)
+            if compact:
+                result = _frame_to_compact(result)
+    except BaseException:
+        # Don't wait on the metadata of a query that failed
+        if include_metadata:
+            metadata.cancel()
+        raise
+
+    if not include_metadata:
+        return result
+    else:
+        return metadata.result(), result
+
+
+def imf_datasets(queries, max_workers: int = 4, times: int = 3):
+    """
+    Download many data series from the IMF in one batch.
+
+    Metadata for each database is fetched once for the whole batch, and the
+    data requests are then run by a pool of worker threads that share one
+    rate limiter. Because the limiter spaces request start times rather than
+    waiting for each request to finish, the batch runs at the configured rate
+    ceiling (one request per IMF_WAIT_TIME seconds).
+
+    Args:
+        queries (Union[dict, list]): Either a dictionary mapping a key of your
+                                     choice to a query, or a list of queries,
+                                     in which case results are keyed by list
+                                     index. Each query is a dictionary of
+                                     keyword arguments for imf_dataset, and
+                                     must include database_id.
+        max_workers (int, optional): Maximum number of requests in flight at
+                                     once. Defaults to 4.
+        times (int, optional): Maximum number of requests to attempt for each
+                               query, unless the query sets its own times.
+
+    Returns:
+        dict: A dictionary with the same keys as queries. Each value is
+        whatever imf_dataset returns for that query, or the exception it
+        raised.
+
+    Examples:
+        results = imf_datasets(
+            {
+                indicator: {"database_id": "IFS", "indicator": indicator}
+                for indicator in ["PMP_IX", "PXP_IX"]
+            }
+        )
+        failed = {k: v for k, v in results.items() if isinstance(v, Exception)}
+    """
+    if isinstance(queries, dict):
+        queries = dict(queries)
+    elif isinstance(queries, (list, tuple)):
+        queries = dict(enumerate(queries))
+    else:
+        raise ValueError("queries must be a dictionary or a list of dictionaries.")
+
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("max_workers must be a positive integer.")
+
+    for key, query in queries.items():
+        if not isinstance(query, dict) or "database_id" not in query:
+            raise ValueError(f"Query {key!r} must be a dictionary with a database_id.")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Fetch the metadata of each database once; imf_dataset then finds it
+        # memoized
+        database_ids = {query["database_id"] for query in queries.values()}
+        metadata = {
+            database_id: executor.submit(imf_parameters, database_id, times)
+            for database_id in database_ids
+            if isinstance(database_id, str)
+        }
+        metadata_errors = {
+            database_id: future.exception() for database_id, future in metadata.items()
+        }
+
+        futures = {}
+        for key, query in queries.items():
+            error = metadata_errors.get(query["database_id"])
+            if error is not None:
+                results[key] = error
+            else:
+                futures[key] = executor.submit(imf_dataset, **{"times": times, **query})
+
+        for key, future in futures.items():
+            error = future.exception()
+            results[key] = error if error is not None else future.result()
+
+    return {key: results[key] for key in queries}
+
+
+def imf_dataset_refresh(
+    database_id: str,
+    previous: DataFrame,
+    times: int = 3,
+    auto_split: bool = False,
+    print_url: bool = False,
+):
+    """
+    Update a data frame returned by imf_dataset with the latest observations.
+
+    Instead of downloading full histories again, the latest time_period of
+    each series in previous is found and only observations from the start of
+    that year onwards are requested. Series whose latest observations fall
+    in the same year are requested together. New observations are added and
+    revised ones replace the previous values.
+
+    Only the series already in previous are updated; series that have been
+    added to the database since are not downloaded. Data frames returned with
+    compact=True (detected from their datetime time_period) are updated with
+    compact observations and keep their dtypes.
+
+    Args:
+        database_id (str): Database ID of the database previous was downloaded
+                           from.
+        previous (pandas.DataFrame): A data frame returned by imf_dataset for
+                                     database_id.
+        times (int, optional): Maximum number of requests to attempt.
+        auto_split (bool, optional): Whether to split requests that are too
+                                     large, as for imf_dataset.
+        print_url (bool, optional): Whether to print the URLs used in the API
+                                    calls.
+
+    Returns:
+        pandas.DataFrame: A new data frame with the same columns as previous,
+        containing its series with their observations updated, ordered by
+        series and time period.
+
+    Raises:
+        ValueError: If previous has no time_period column or no parameter
+        columns of the database.
+
+    Examples:
+        df = imf_dataset("PCPS", freq="M", ref_area="W00", start_year=2000)
+        df = imf_dataset_refresh("PCPS", df)
+    """
+    if not isinstance(previous, DataFrame) or "time_period" not in previous:
+        raise ValueError("previous must be a data frame returned by imf_dataset.")
+
+    if previous.empty:
+        return previous.copy()
+
+    key_columns = [
+        key for key in imf_parameters(database_id, times) if key in previous.columns
+    ]
+    if not key_columns:
+        raise ValueError(
+            f"previous has no parameter columns of the {database_id} database."
+        )
+    compact = is_datetime64_any_dtype(previous["time_period"])
+    latest = previous.groupby(key_columns, sort=False, dropna=False, observed=True)[
+        "time_period"
+    ].max()
+    start_years = latest.astype(str).str[:4]
+
+    updates = []
+    for start_year, keys in start_years.groupby(start_years, sort=False):
+        keys = keys.index.to_frame(index=False)
+        query = {key: keys[key].unique().tolist() for key in key_columns}
+        try:
+            update = imf_dataset(
+                database_id,
+                start_year=start_year,
+                times=times,
+                auto_split=auto_split,
+                print_url=print_url,
+                compact=compact,
+                **query,
+            )
+        except ValueError as e:
+            if "No data found" in str(e):
+                continue
+            raise
+        # Only keep the requested series, not every combination of their codes
+        held = update.merge(keys, on=key_columns, how="left", indicator=True)
+        updates.append(update[(held["_merge"] == "both").to_numpy()])
+
+    if not updates:
+        return previous.copy()
+
+    result = concat([previous, *updates], ignore_index=True)
+    if compact:
+        # Categoricals with different categories are concatenated as objects
+        result = result.astype(
+            {
+                column: "category" if isinstance(dtype, CategoricalDtype) else dtype
+                for column, dtype in previous.dtypes.items()
+                if column in result.columns
+            }
+        )
+    result = result.drop_duplicates(key_columns + ["time_period"], keep="last")
+    series = result.groupby(
+        key_columns, sort=False, dropna=False, observed=True
+    ).ngroup()
+    result = (
+        result.assign(_series=series)
+        .sort_values(["_series", "time_period"], kind="stable")
+        .drop(columns="_series")
+        .reindex(columns=previous.columns)
+    )
+    result.index = (
+        result.groupby(key_columns, sort=False, dropna=False, observed=True)
+        .cumcount()
+        .to_numpy()
+    )
+    return result
+
+
+def _dataset_years(start_year, end_year):
+    """
+    (Internal) Validate imf_dataset's start_year and end_year and convert them
+    to API query parameters.
+    """
     years = {}
     if start_year is not None:
         try:
@@ -254,8 +910,15 @@ def imf_dataset(
                 "end_year must be a four-digit number, " "either integer or string"
             )
 
-    data_dimensions = imf_parameters(database_id, times)
+    return years
+
 
+def _dataset_filter(database_id, data_dimensions, parameters, kwargs):
+    """
+    (Internal) Validate the parameters supplied to imf_dataset against the
+    database's valid input codes, and reduce each parameter's DataFrame to the
+    requested codes. An empty DataFrame means all codes are requested.
+    """
     if parameters is not None:
         if kwargs:
             warn(
@@ -343,6 +1006,13 @@ def imf_dataset(
         for key in data_dimensions:
             data_dimensions[key] = data_dimensions[key].iloc[0:0]
 
+    return data_dimensions
+
+
+def _dataset_url(database_id, data_dimensions, years):
+    """
+    (Internal) Build the CompactData request URL for filtered parameters.
+    """
     parameter_string = ".".join(
         ["+".join(data_dimensions[key]["input_code"]) for key in data_dimensions]
     )
@@ -354,10 +1024,100 @@ def imf_dataset(
     if years:
         url += f"?{urlencode(years)}"
 
-    if print_url:
-        print(url)
+    return url
+
+
+def _dataset_split_series(database_id, data_dimensions, full_dimensions, years, fetch):
+    """
+    (Internal) Yield the series for a query, recursively bisecting it
+    whenever the API rejects it as too large.
+
+    Args:
+        database_id (str): The database ID.
+        data_dimensions (dict): Filtered parameters, as returned by
+        _dataset_filter. An empty DataFrame requests all codes.
+        full_dimensions (dict): All valid codes for each parameter, as
+        returned by imf_parameters.
+        years (dict): startPeriod and endPeriod query parameters.
+        fetch (callable): Function taking a request URL and returning an
+        iterable of series. Must raise ValueError if the request fails.
+
+    Yields:
+        dict: The series of each successful chunk, in order.
 
-    raw_dl = _download_parse(url, times)["CompactData"]["DataSet"]
+    Raises:
+        ValueError: If a chunk fails for another reason, or is too large and
+        cannot be split further.
+    """
+    url = _dataset_url(database_id, data_dimensions, years)
+    try:
+        series = fetch(url)
+    except ValueError as e:
+        if not _is_too_large(e):
+            raise
+        chunks = _dataset_split_query(data_dimensions, full_dimensions, years)
+        if chunks is None:
+            raise
+        for chunk_dimensions, chunk_years in chunks:
+            yield from _dataset_split_series(
+                database_id, chunk_dimensions, full_dimensions, chunk_years, fetch
+            )
+        return
+    yield from series
+
+
+def _is_too_large(error):
+    """
+    (Internal) Whether an error from _download_parse indicates that the
+    request was too large or too long.
+    """
+    message = str(error)
+    return "may be too large" in message or "Too many parameters" in message
+
+
+def _dataset_split_query(data_dimensions, full_dimensions, years):
+    """
+    (Internal) Split a query into two halves.
+
+    The parameter with the most requested codes (counting all valid codes for
+    unfiltered parameters) is halved. If every parameter has a single code,
+    the year range is halved instead.
+
+    Returns:
+        list: Two (data_dimensions, years) tuples, or None if the query cannot
+        be split.
+    """
+    requested = {
+        key: (value if len(value) > 0 else full_dimensions[key])
+        for key, value in data_dimensions.items()
+    }
+    if requested:
+        key = max(requested, key=lambda k: len(requested[k]))
+        codes = requested[key]
+        if len(codes) > 1:
+            middle = len(codes) // 2
+            return [
+                ({**data_dimensions, key: codes.iloc[:middle]}, years),
+                ({**data_dimensions, key: codes.iloc[middle:]}, years),
+            ]
+
+    if "startPeriod" in years and "endPeriod" in years:
+        start, end = int(years["startPeriod"]), int(years["endPeriod"])
+        if end > start:
+            middle = (start + end) // 2
+            return [
+                (data_dimensions, {**years, "endPeriod": str(middle)}),
+                (data_dimensions, {**years, "startPeriod": str(middle + 1)}),
+            ]
+
+    return None
+
+
+def _dataset_series(raw_dl):
+    """
+    (Internal) Extract the list of series from a parsed CompactData response.
+    """
+    raw_dl = raw_dl["CompactData"]["DataSet"]
     try:
         raw_dl = raw_dl["Series"]
     except Exception:
@@ -370,57 +1130,4 @@ def imf_dataset(
             "No data found for that combination of parameters. "
             "Try making your request less restrictive."
         )
-
-    if return_raw:
-        if include_metadata:
-            metadata = _imf_metadata(url)
-            return metadata, raw_dl
-        else:
-            return raw_dl
-
-    # Function to check if a value is a scalar
-    def is_scalar(value):
-        return not isinstance(value, (list, tuple, set, Series))
-
-    # Function to return dictionary without 'Obs'
-    def without_obs(d, keys={"Obs"}):
-        return {x: d[x] for x in d if x not in keys}
-
-    # Check if raw_dl is a list, and if not, convert it to one
-    if not isinstance(raw_dl, list):
-        raw_dl = [raw_dl]
-
-    def process_data(item):
-        # Make a data frame of dict items excluding 'Obs'
-        if all(is_scalar(value) for value in without_obs(item).values()):
-            param_vals = DataFrame.from_dict([without_obs(item)])
-        else:
-            raise ValueError("Expected item to be scalar, but it's not.")
-
-        # Make a data frame from the dicts in 'Obs'
-        try:
-            if not isinstance(item["Obs"], list):
-                item["Obs"] = [item["Obs"]]
-        except:
-            raise ValueError(
-                "No observations found for that combination of parameters. "
-                "start_year and end_year may be outside the dataset's range."
-            )
-        series = DataFrame.from_dict(item["Obs"])
-
-        # Create a copy of param_vals for every row in series
-        param_vals = concat([param_vals] * len(series)).reset_index(drop=True)
-
-        # Column bind param_vals to series
-        output = concat([param_vals, series], axis=1)
-        return output
-
-    result = concat(list(map(process_data, raw_dl)))
-    result.columns = result.columns.str.replace("@", "")
-    result.columns = result.columns.str.lower()
-
-    if not include_metadata:
-        return result
-    else:
-        metadata = _imf_metadata(url)
-        return metadata, result
+    return raw_dl
@@ -0,0 +1,101 @@
+from os import environ
+from codecs import BOM_UTF8, lookup
+from json import loads, JSONDecodeError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# Available JSON decoders, fastest first. Each accepts UTF-8 bytes or str.
+_json_decoders = {}
+if orjson is not None:
+    _json_decoders["orjson"] = orjson.loads
+if simdjson is not None:
+    _json_decoders["simdjson"] = simdjson.loads
+if ujson is not None:
+    _json_decoders["ujson"] = ujson.loads
+_json_decoders["json"] = loads
+
+_json_backend_names = ("auto", "orjson", "simdjson", "ujson", "json")
+
+
+def _json_backend():
+    """
+    (Internal) Get the JSON decoder selected with set_imf_json_backend.
+
+    'auto' (the default) selects the fastest installed decoder. A backend
+    that is not installed in this process (e.g. when IMF_JSON_BACKEND was
+    inherited from another environment) also falls back to 'auto'.
+
+    Returns:
+        tuple: The name of the decoder and its loads function.
+    """
+    name = environ.get("IMF_JSON_BACKEND", "auto")
+    if name not in _json_decoders:
+        name = next(iter(_json_decoders))
+    return name, _json_decoders[name]
+
+
+def _json_loads(content, decoder=None):
+    """
+    (Internal) Decode a JSON document with the selected decoder.
+
+    Args:
+        content (Union[bytes, str]): The document, as UTF-8 bytes or a string.
+        decoder (callable, optional): The loads function to use. Defaults to
+        that of _json_backend().
+
+    Returns:
+        The decoded document.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON, whichever
+        decoder is used.
+    """
+    if decoder is None:
+        decoder = _json_backend()[1]
+    try:
+        return decoder(content)
+    except JSONDecodeError:
+        raise
+    except ValueError as e:
+        raise JSONDecodeError(str(e), "", 0) from e
+
+
+def _response_body(content, encoding=None):
+    """
+    (Internal) Prepare a response body for JSON decoding as UTF-8 bytes,
+    without decoding it to a string.
+
+    Bodies declared in another encoding are transcoded, and a UTF-8 byte
+    order mark is stripped.
+
+    Args:
+        content (bytes): The raw response body.
+        encoding (str, optional): The encoding declared by the response.
+
+    Returns:
+        bytes: The body, encoded as UTF-8.
+    """
+    if encoding:
+        try:
+            utf_8 = lookup(encoding).name == "utf-8"
+        except LookupError:
+            utf_8 = True
+        if not utf_8:
+            content = content.decode(encoding, errors="replace").encode()
+    if content.startswith(BOM_UTF8):
+        content = content[len(BOM_UTF8) :]
+    return content
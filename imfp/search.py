@@ -0,0 +1,418 @@
+from os import path, makedirs, stat, fspath, PathLike
+from json import dumps
+from math import log
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+import re
+from pandas import DataFrame
+from .cache import _cache_dir
+from .decode import _json_loads
+from .utils import _download_parse, _imf_dimensions
+from .data import imf_databases, _database_id_error, _freq_codes, _parse_codelist
+from .bulk import _bulk_write_file
+
+
+_search_index_version = 1
+_search_token_pattern = re.compile(r"[^\W_]+")
+
+# BM25 parameters for ranking matches
+_search_k1 = 1.2
+_search_b = 0.75
+
+# Indexes loaded from disk, keyed by file path, with the modification time
+# and size of the file they were loaded from
+_search_indexes = {}
+_search_indexes_lock = Lock()
+
+
+def imf_search_index_update(
+    index_file: Union[str, PathLike, None] = None,
+    database_ids: Union[str, list, None] = None,
+    max_workers: int = 4,
+    times: int = 2,
+    refresh: bool = False,
+):
+    """
+    Build or update the local search index used by imf_search_indicators.
+
+    The index covers the description of every IMF database, the names of its
+    parameters, and the codes and descriptions of their code lists. Building
+    it for every database takes one request per database and one per
+    distinct code list; code lists shared between databases (such as
+    geographical areas) are only requested once. Progress is saved to
+    index_file after each database, so calling imf_search_index_update again
+    after an interruption, or with further database_ids, only requests the
+    databases that are not yet indexed.
+
+    Args:
+        index_file (Union[str, PathLike, None], optional): File in which to
+        store the index. Defaults to 'search/index.json' in the cache
+        directory set with set_imf_cache.
+        database_ids (Union[str, list, None], optional): Database IDs to index.
+        Defaults to every database listed by imf_databases().
+        max_workers (int, optional): Maximum number of code list requests in
+        flight at once. They share the rate limit set with set_imf_wait_time.
+        Defaults to 4.
+        times (int, optional): Maximum number of requests to attempt for each
+        database and code list. Defaults to 2.
+        refresh (bool, optional): If True, discard the existing index and
+        request every database again. Defaults to False.
+
+    Returns:
+        pandas.DataFrame: One row per database indexed, with its
+        'database_id', 'status' ('done' or 'failed'), the number of
+        'parameters' and 'codes' indexed, and any 'error' message.
+
+    Raises:
+        ValueError: If an argument is invalid, or no index_file is given and
+        the on-disk cache is disabled.
+
+    Examples:
+        imf_search_index_update(database_ids=["BOP", "IFS"])
+    """
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("max_workers must be a positive integer.")
+    index_file = _search_index_file(index_file)
+
+    index = None if refresh else _search_read(index_file)
+    if index is None:
+        index = {"version": _search_index_version, "databases": {}, "codelists": {}}
+
+    databases = imf_databases(times)
+    descriptions = dict(zip(databases["database_id"], databases["description"]))
+    if database_ids is None:
+        database_ids = list(descriptions)
+    elif isinstance(database_ids, str):
+        database_ids = [database_ids]
+    unknown = [
+        database_id for database_id in database_ids if database_id not in descriptions
+    ]
+    if unknown:
+        raise ValueError(
+            f"Unknown database_id: {', '.join(unknown)}. Use imf_databases to find."
+        )
+
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/CodeList/"
+
+    def fetch_codelist(parameter, code):
+        if parameter == "freq":
+            codelist = _freq_codes()
+        else:
+            codelist = _parse_codelist(_download_parse(url + code, times))
+        return [
+            [input_code, description]
+            for input_code, description in zip(
+                codelist["input_code"], codelist["description"]
+            )
+        ]
+
+    for database_id in database_ids:
+        entry = index["databases"].get(database_id)
+        if entry is not None and entry["status"] == "done":
+            continue
+        entry = {"description": descriptions[database_id]}
+        try:
+            try:
+                dimensions = _imf_dimensions(database_id, times)
+            except ValueError as e:
+                raise _database_id_error(e)
+            parameters = list(
+                zip(
+                    dimensions["parameter"],
+                    dimensions["code"],
+                    dimensions["description"],
+                )
+            )
+            missing = {
+                code: parameter
+                for parameter, code, _ in parameters
+                if code not in index["codelists"]
+            }
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    code: executor.submit(fetch_codelist, parameter, code)
+                    for code, parameter in missing.items()
+                }
+                codelists = {code: future.result() for code, future in futures.items()}
+        except ValueError as e:
+            entry.update(status="failed", error=str(e))
+        else:
+            index["codelists"].update(codelists)
+            entry.update(status="done", parameters=[list(row) for row in parameters])
+        index["databases"][database_id] = entry
+        index.pop("entries", None)
+        index.pop("postings", None)
+        _search_write(index_file, index)
+
+    if "postings" not in index:
+        index.update(_search_build(index))
+        _search_write(index_file, index)
+
+    rows = []
+    for database_id in database_ids:
+        entry = index["databases"][database_id]
+        parameters = entry.get("parameters", [])
+        rows.append(
+            {
+                "database_id": database_id,
+                "status": entry["status"],
+                "parameters": len(parameters),
+                "codes": sum(
+                    len(index["codelists"][code]) for _, code, _ in parameters
+                ),
+                "error": entry.get("error"),
+            }
+        )
+    return DataFrame(
+        rows, columns=["database_id", "status", "parameters", "codes", "error"]
+    )
+
+
+def imf_search_indicators(
+    query: str,
+    index_file: Union[str, PathLike, None] = None,
+    database_id: Union[str, list, None] = None,
+    parameter: Union[str, None] = None,
+    max_results: int = 20,
+):
+    """
+    Search the local index for databases, parameters and codes whose
+    descriptions match a query, such as "current account".
+
+    Matches are ranked by relevance (BM25), favoring descriptions that
+    contain every word of the query, in order, and few other words.
+    Descriptions containing every word are returned if there are any, and
+    otherwise those containing some of them. The index must first be built
+    with imf_search_index_update. It is loaded from disk on the first search
+    and kept in memory, so further searches make no API requests and take
+    milliseconds.
+
+    Args:
+        query (str): Words to search for. Case and punctuation are ignored,
+        and codes such as "NGDP_RPCH" may be searched for too.
+        index_file (Union[str, PathLike, None], optional): File holding the
+        index. Defaults to 'search/index.json' in the cache directory set with
+        set_imf_cache.
+        database_id (Union[str, list, None], optional): Only return matches in
+        these databases. Defaults to None.
+        parameter (str, optional): Only return codes of this parameter, e.g.
+        'indicator'. Defaults to None.
+        max_results (int, optional): Maximum number of matches to return.
+        Defaults to 20.
+
+    Returns:
+        pandas.DataFrame: One row per match, best first, with the
+        'database_id', the 'parameter' and 'input_code' matched (both missing
+        for a match on a database's description, and 'input_code' missing for
+        a match on a parameter's name), the matching 'description' and its
+        'score'.
+
+    Raises:
+        ValueError: If the query contains no words, the index has not been
+        built, or no index_file is given and the on-disk cache is disabled.
+
+    Examples:
+        imf_search_indicators("current account", parameter="indicator")
+    """
+    if not isinstance(query, str):
+        raise ValueError("query must be a string.")
+    if not isinstance(max_results, int) or max_results < 1:
+        raise ValueError("max_results must be a positive integer.")
+    tokens = list(dict.fromkeys(_search_tokens(query)))
+    if not tokens:
+        raise ValueError("query must contain at least one word.")
+    if isinstance(database_id, str):
+        database_id = [database_id]
+    database_ids = None if database_id is None else set(database_id)
+
+    index = _search_load(_search_index_file(index_file))
+    entries = index["entries"]
+    postings = [index["postings"].get(token, []) for token in tokens]
+
+    # Prefer entries containing every word, starting from the rarest
+    candidates = set(min(postings, key=len))
+    for posting in sorted(postings, key=len)[1:]:
+        candidates.intersection_update(posting)
+    if not candidates:
+        candidates = set().union(*postings)
+
+    n_entries = len(entries)
+    idf = {
+        token: log(1 + (n_entries - len(posting) + 0.5) / (len(posting) + 0.5))
+        for token, posting in zip(tokens, postings)
+    }
+    phrase = " ".join(tokens)
+    scored = []
+    for entry_id in candidates:
+        database, entry_parameter, code, description, codelist = entries[entry_id]
+        if parameter is not None and entry_parameter != parameter and codelist is None:
+            continue
+        entry_tokens = _search_tokens(
+            description if code is None else f"{code} {description}"
+        )
+        length = 1 - _search_b + _search_b * len(entry_tokens) / index["length"]
+        score = sum(
+            idf[token] * (_search_k1 + 1) / (1 + _search_k1 * length)
+            for token in set(tokens).intersection(entry_tokens)
+        )
+        if len(tokens) > 1 and phrase in " ".join(entry_tokens):
+            score *= 1.5
+        scored.append((score, entry_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    # Code list matches are reported for every database parameter using them
+    rows = []
+    for score, entry_id in scored:
+        database, entry_parameter, code, description, codelist = entries[entry_id]
+        if codelist is None:
+            matches = [(database, entry_parameter)]
+        else:
+            matches = index["codelist_parameters"].get(codelist, [])
+        for database, entry_parameter in matches:
+            if database_ids is not None and database not in database_ids:
+                continue
+            if parameter is not None and entry_parameter != parameter:
+                continue
+            rows.append((database, entry_parameter, code, description, score))
+            if len(rows) == max_results:
+                break
+        if len(rows) == max_results:
+            break
+
+    return DataFrame(
+        rows,
+        columns=["database_id", "parameter", "input_code", "description", "score"],
+    )
+
+
+def _search_index_file(index_file):
+    """
+    (Internal) Resolve the path of the search index file.
+    """
+    if index_file is not None:
+        if not isinstance(index_file, (str, PathLike)):
+            raise ValueError("index_file must be a string or path-like object.")
+        return path.abspath(path.expanduser(fspath(index_file)))
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        raise ValueError(
+            "No search index file given. Pass index_file, or enable the on-disk "
+            "cache with set_imf_cache to keep the index there."
+        )
+    return path.join(cache_dir, "search", "index.json")
+
+
+def _search_tokens(text):
+    """
+    (Internal) Split text into lowercase words for indexing and searching.
+    """
+    return _search_token_pattern.findall(text.lower())
+
+
+def _search_build(index):
+    """
+    (Internal) Build the entries and inverted index of a search index from
+    its database and code list data.
+
+    Each entry is a [database_id, parameter, input_code, description,
+    codelist] list. Codes are indexed once per code list, with database_id
+    and parameter None, however many databases use the code list.
+
+    Returns:
+        dict: The 'entries', the 'postings' mapping each word to the entries
+        containing it, and the average 'length' of an entry in words.
+    """
+    entries = []
+    for database_id, database in sorted(index["databases"].items()):
+        entries.append([database_id, None, None, database["description"], None])
+        for parameter, _, description in database.get("parameters", []):
+            entries.append([database_id, parameter, None, description, None])
+    for codelist, codes in sorted(index["codelists"].items()):
+        for code, description in codes:
+            entries.append([None, None, code, description, codelist])
+
+    postings = {}
+    total_length = 0
+    for entry_id, (_, _, code, description, _) in enumerate(entries):
+        tokens = _search_tokens(
+            description if code is None else f"{code} {description}"
+        )
+        total_length += len(tokens)
+        for token in set(tokens):
+            postings.setdefault(token, []).append(entry_id)
+
+    return {
+        "entries": entries,
+        "postings": postings,
+        "length": total_length / max(len(entries), 1),
+    }
+
+
+def _search_read(index_file):
+    """
+    (Internal) Read a search index file, or return None if it is missing or
+    was written by an incompatible version of imfp.
+    """
+    try:
+        with open(index_file, "rb") as file:
+            index = _json_loads(file.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != _search_index_version:
+        return None
+    return index
+
+
+def _search_write(index_file, index):
+    """
+    (Internal) Atomically write a search index file.
+    """
+    directory, file_name = path.split(index_file)
+    makedirs(directory, exist_ok=True)
+    content = dumps(index, separators=(",", ":")).encode()
+    _bulk_write_file(directory, file_name, lambda file: file.write(content))
+    return None
+
+
+def _search_load(index_file):
+    """
+    (Internal) Get a search index ready for searching, loading it from disk
+    only if the file has changed since it was last loaded.
+
+    Raises:
+        ValueError: If the index has not been built.
+    """
+    try:
+        file_stat = stat(index_file)
+    except OSError:
+        file_stat = None
+    key = None if file_stat is None else (file_stat.st_mtime_ns, file_stat.st_size)
+
+    with _search_indexes_lock:
+        if key is not None and index_file in _search_indexes:
+            loaded_key, index = _search_indexes[index_file]
+            if loaded_key == key:
+                return index
+
+    index = _search_read(index_file)
+    if index is None or not index["databases"]:
+        raise ValueError(
+            f"No search index found at {index_file}. "
+            "Build one with imf_search_index_update."
+        )
+    if "postings" not in index:
+        index.update(_search_build(index))
+
+    # Map each code list to the database parameters using it
+    codelist_parameters = {}
+    for database_id, database in sorted(index["databases"].items()):
+        for parameter, codelist, _ in database.get("parameters", []):
+            codelist_parameters.setdefault(codelist, []).append(
+                (database_id, parameter)
+            )
+    index["codelist_parameters"] = codelist_parameters
+
+    with _search_indexes_lock:
+        _search_indexes[index_file] = (key, index)
+    return index
@@ -0,0 +1,287 @@
+from os import path, makedirs, replace, remove, fspath, PathLike
+from json import load, dumps
+from tempfile import mkstemp
+from typing import Union
+from urllib.parse import quote
+from pandas import DataFrame, concat, isna
+from pandas.api.types import is_datetime64_any_dtype
+from .data import imf_parameters
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+_store_metadata_file = "_imfp_store.json"
+# Directory name of partitions whose value is missing, read back as null
+_store_null_partition = "__HIVE_DEFAULT_PARTITION__"
+
+
+def imf_store_write(
+    data: DataFrame,
+    store_dir: Union[str, PathLike],
+    database_id: str,
+    partition_cols: list = None,
+    times: int = 2,
+):
+    """
+    Save a data frame returned by imf_dataset to a local Parquet store.
+
+    The store holds one directory per database, partitioned into
+    subdirectories by frequency and by one further parameter (by default,
+    the first parameter of the database other than freq), e.g.
+    'store_dir/database_id=IFS/freq=M/ref_area=US/data.parquet'. Writing
+    upserts: observations are added to the partitions they belong to, and
+    replace stored observations of the same series and time period. Values
+    are stored as the strings returned by the API, so data frames returned
+    with compact=True cannot be written; pass store_dir to imf_dataset
+    instead, which stores the data before converting it.
+
+    Requires the pyarrow package.
+
+    Args:
+        data (pandas.DataFrame): A data frame returned by imf_dataset.
+        store_dir (Union[str, PathLike]): Root directory of the store.
+        database_id (str): Database ID of the database data was downloaded
+                           from.
+        partition_cols (list, optional): Columns to partition by. Only used
+                                         when the database is first written
+                                         to the store; later writes reuse the
+                                         stored partitioning. Defaults to
+                                         freq and the next parameter of the
+                                         database.
+        times (int, optional): Maximum number of requests to attempt when
+                               looking up the database's parameters.
+
+    Returns:
+        None
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+        ValueError: If data has no time_period column, was returned with
+        compact=True, or lacks a partition column.
+
+    Examples:
+        df = imf_dataset("IFS", freq="M", ref_area="US", indicator="PMP_IX")
+        imf_store_write(df, "~/imf_store", "IFS")
+    """
+    _require_pyarrow()
+    if not isinstance(data, DataFrame) or "time_period" not in data:
+        raise ValueError("data must be a data frame returned by imf_dataset.")
+    if is_datetime64_any_dtype(data["time_period"]):
+        raise ValueError(
+            "Data frames returned with compact=True cannot be written to the "
+            "store. Use imf_dataset with compact=True and store_dir instead."
+        )
+
+    database_dir = _store_database_dir(store_dir, database_id)
+    metadata = _store_metadata(database_dir)
+    new_database = metadata is None
+    if new_database:
+        parameters = [key for key in imf_parameters(database_id, times)]
+        if partition_cols is None:
+            others = [key for key in parameters if key != "freq"]
+            partition_cols = [
+                key for key in ["freq"] + others[:1] if key in data.columns
+            ]
+        metadata = {
+            "columns": list(data.columns),
+            "partition_cols": list(partition_cols),
+            "key_cols": [key for key in parameters if key in data.columns]
+            + ["time_period"],
+        }
+    partition_cols = metadata["partition_cols"]
+    key_cols = metadata["key_cols"]
+
+    missing = [key for key in partition_cols + key_cols if key not in data.columns]
+    if missing:
+        raise ValueError(f"data is missing the column(s) {missing}.")
+
+    if new_database:
+        content = dumps(metadata).encode()
+        _store_write_file(
+            database_dir,
+            path.join(database_dir, _store_metadata_file),
+            lambda file: file.write(content),
+        )
+
+    data = data.astype(str).where(data.notna(), None)
+    for values, partition in data.groupby(partition_cols, sort=False, dropna=False):
+        if not isinstance(values, tuple):
+            values = (values,)
+        values = [
+            _store_null_partition if isna(value) else quote(value, safe="")
+            for value in values
+        ]
+        partition_dir = path.join(
+            database_dir,
+            *[f"{key}={value}" for key, value in zip(partition_cols, values)],
+        )
+        file_path = path.join(partition_dir, "data.parquet")
+        partition = partition.drop(columns=partition_cols)
+        if path.exists(file_path):
+            stored = pyarrow.parquet.read_table(file_path).to_pandas()
+            partition = concat([stored, partition], ignore_index=True)
+            partition = partition.drop_duplicates(
+                [key for key in key_cols if key not in partition_cols], keep="last"
+            )
+        partition = partition.reset_index(drop=True)
+        _store_write_file(
+            partition_dir,
+            file_path,
+            lambda file: pyarrow.parquet.write_table(
+                pyarrow.Table.from_pandas(partition, preserve_index=False), file
+            ),
+        )
+
+    return None
+
+
+def imf_store_read(
+    store_dir: Union[str, PathLike],
+    database_id: str,
+    columns: list = None,
+    start_year: int = None,
+    end_year: int = None,
+    **kwargs,
+):
+    """
+    Read data saved with imf_store_write, without making any API requests.
+
+    Only the partitions matching the filters on partition columns are opened,
+    only the requested columns are read, and filters on other columns are
+    applied while scanning, using the statistics stored in the Parquet files
+    to skip data that cannot match.
+
+    Requires the pyarrow package.
+
+    Args:
+        store_dir (Union[str, PathLike]): Root directory of the store.
+        database_id (str): Database ID of the database to read.
+        columns (list, optional): Columns to return. Defaults to all columns.
+        start_year (int, optional): Four-digit year. Earliest year for which
+                                    to return observations.
+        end_year (int, optional): Four-digit year. Latest year for which to
+                                  return observations.
+        **kwargs: Column names and the value, or list of values, to keep, e.g.
+                  freq="A" or indicator=["NGDPD", "PPPSH"].
+
+    Returns:
+        pandas.DataFrame: The matching observations, with all values as
+        strings, like the data frames returned by imf_dataset.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+        ValueError: If the store holds no data for database_id, or a filter
+        refers to an unknown column.
+
+    Examples:
+        df = imf_store_read(
+            "~/imf_store", "IFS", freq="M", ref_area="US", start_year=2010
+        )
+    """
+    _require_pyarrow()
+    database_dir = _store_database_dir(store_dir, database_id)
+    metadata = _store_metadata(database_dir)
+    if metadata is None:
+        raise ValueError(f"The store has no data for the {database_id} database.")
+
+    partitioning = pyarrow.dataset.partitioning(
+        pyarrow.schema([(key, pyarrow.string()) for key in metadata["partition_cols"]]),
+        flavor="hive",
+    )
+    dataset = pyarrow.dataset.dataset(
+        database_dir, format="parquet", partitioning=partitioning
+    )
+
+    expression = None
+    for key, value in kwargs.items():
+        if key not in dataset.schema.names:
+            raise ValueError(f"{key} is not a column of the stored {database_id} data.")
+        values = [str(x) for x in value] if isinstance(value, list) else [str(value)]
+        expression = _store_and(expression, pyarrow.dataset.field(key).isin(values))
+    # Time periods start with the year, so years compare as string prefixes
+    if start_year is not None:
+        expression = _store_and(
+            expression, pyarrow.dataset.field("time_period") >= str(start_year)
+        )
+    if end_year is not None:
+        expression = _store_and(
+            expression,
+            pyarrow.dataset.field("time_period") < str(int(end_year) + 1),
+        )
+
+    if columns is None:
+        # Restore the column order of the first data written
+        columns = list(
+            dict.fromkeys(
+                [name for name in metadata["columns"] if name in dataset.schema.names]
+                + dataset.schema.names
+            )
+        )
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def _require_pyarrow():
+    """
+    (Internal) Raise an informative error if pyarrow is not installed.
+    """
+    if pyarrow is None:
+        raise ImportError(
+            "The local store requires the pyarrow package. "
+            "Install it with 'pip install pyarrow'."
+        )
+
+
+def _store_database_dir(store_dir, database_id):
+    """
+    (Internal) Get the directory of a database in the store.
+    """
+    if not isinstance(database_id, str) or not database_id:
+        raise ValueError("database_id must be a non-empty string.")
+    store_dir = path.expanduser(fspath(store_dir))
+    return path.join(store_dir, f"database_id={quote(database_id, safe='')}")
+
+
+def _store_metadata(database_dir):
+    """
+    (Internal) Load the partition and key columns of a stored database.
+
+    Returns:
+        dict: The 'columns' first written, 'partition_cols' and 'key_cols',
+        or None if the database has not been stored.
+    """
+    try:
+        with open(path.join(database_dir, _store_metadata_file), "r") as file:
+            return load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _store_write_file(directory, file_path, write):
+    """
+    (Internal) Atomically write a file of the store, through a temporary file
+    that is moved into place once complete.
+    """
+    makedirs(directory, exist_ok=True)
+    # Files starting with '.' are skipped by readers of the store
+    file_descriptor, temp_path = mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with open(file_descriptor, "wb") as file:
+            write(file)
+        replace(temp_path, file_path)
+    except BaseException:
+        try:
+            remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _store_and(expression, condition):
+    return condition if expression is None else expression & condition
@@ -0,0 +1,202 @@
+from codecs import getincrementaldecoder, lookup
+from json import JSONDecoder, JSONDecodeError
+
+_decoder = JSONDecoder()
+_whitespace = " \t\n\r"
+
+
+class _JSONStreamReader:
+    """
+    (Internal) Minimal pull parser over a stream of JSON text chunks.
+
+    Only the text needed to decode the current value is held in memory.
+    Individual values are decoded with the standard library decoder.
+
+    Args:
+        chunks (Iterable[str]): Successive pieces of a JSON document.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_size=1):
+        """
+        Append at least min_size characters from the stream to the buffer,
+        discarding text that has already been consumed. Returns False if the
+        stream is exhausted.
+        """
+        if self._eof:
+            return False
+        pieces = [self._buffer[self._pos :]]
+        added = 0
+        while added < min_size:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                break
+            pieces.append(chunk)
+            added += len(chunk)
+        self._buffer = "".join(pieces)
+        self._pos = 0
+        return added > 0
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character, or '' at the end of
+        the stream.
+        """
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in _whitespace:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        """
+        Consume the next non-whitespace character, which must be char.
+        """
+        found = self.peek()
+        if found != char:
+            raise JSONDecodeError(
+                f"Expecting '{char}'", self._buffer, min(self._pos, len(self._buffer))
+            )
+        self._pos += 1
+
+    def value(self):
+        """
+        Decode and consume the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError:
+                # The value may continue in the next chunk(s). Grow the buffer
+                # geometrically so that long values are not re-parsed too often.
+                if self._fill(max(len(self._buffer) - self._pos, 1)):
+                    continue
+                raise
+            # A number at the end of the buffer may have more digits to come
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def remainder(self):
+        """
+        Consume and yield all text that has not yet been read.
+        """
+        yield self._buffer[self._pos :]
+        self._buffer = ""
+        self._pos = 0
+        if not self._eof:
+            yield from self._chunks
+            self._eof = True
+
+
+def _iter_json_path(reader, keys):
+    """
+    (Internal) Incrementally yield the value found at a path of object keys in
+    a streamed JSON document.
+
+    If the value is an array, its items are decoded and yielded one at a time;
+    otherwise the value itself is yielded, unless it is null. Nothing is
+    yielded if the path does not exist. Values outside the path are decoded
+    and discarded as they are passed over, and parsing stops at the end of the
+    target value.
+
+    Args:
+        reader (_JSONStreamReader): A reader positioned at the start of the
+        document.
+        keys (list): Object keys leading to the target value, e.g.
+        ['CompactData', 'DataSet', 'Series'].
+
+    Yields:
+        The decoded array items, or the single decoded value.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON.
+    """
+    for key in keys:
+        if reader.peek() != "{":
+            return
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                return
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ",":
+                reader.expect(",")
+
+    if reader.peek() != "[":
+        value = reader.value()
+        if value is not None:
+            yield value
+        return
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+        else:
+            reader.expect("]")
+            return
+
+
+def _text_chunks(text, chunk_size=65536):
+    """
+    (Internal) Split a string into chunks for a _JSONStreamReader.
+    """
+    for start in range(0, len(text), chunk_size):
+        yield text[start : start + chunk_size]
+
+
+def _response_chunks(response, chunk_size=65536):
+    """
+    (Internal) Decode the body of a streamed requests.Response into text
+    chunks, stripping any UTF-8 byte order mark.
+    """
+    return _decode_chunks(
+        response.iter_content(chunk_size=chunk_size), response.encoding
+    )
+
+
+def _decode_chunks(chunks, encoding=None):
+    """
+    (Internal) Incrementally decode chunks of bytes into text chunks,
+    stripping any UTF-8 byte order mark.
+    """
+    encoding = lookup(encoding or "utf-8").name
+    if encoding == "utf-8":
+        encoding = "utf-8-sig"
+    decoder = getincrementaldecoder(encoding)(errors="replace")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _tee_chunks(chunks, write):
+    """
+    (Internal) Pass chunks through unchanged, calling write on each one.
+    """
+    for chunk in chunks:
+        write(chunk)
+        yield chunk
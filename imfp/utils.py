@@ -1,42 +1,511 @@
-from os import environ, path
-import hashlib
-from time import sleep, perf_counter
-from requests import get
-from json import loads, load, dump, JSONDecodeError
-from pandas import DataFrame
+from os import environ, path, getpid, makedirs
+from random import uniform
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from time import sleep, perf_counter, time
+from json import JSONDecodeError
+from warnings import warn
 import re
+from .cache import (
+    _cache_load,
+    _cache_save,
+    _cache_writer,
+    _cache_dir,
+    _cache_stale,
+    _cache_conditional_headers,
+    _cache_validators,
+    _cache_path,
+    _cache_read,
+    _cache_content,
+)
+from .decode import _json_backend, _json_loads, _response_body
+from .stream import (
+    _JSONStreamReader,
+    _iter_json_path,
+    _decode_chunks,
+    _response_chunks,
+    _tee_chunks,
+)
+
+try:
+    import fcntl
+
+    msvcrt = None
+except ImportError:
+    import msvcrt
+
+
+class _RateLimiter:
+    """
+    (Internal) Process-wide token-bucket limiter for the start times of API
+    requests.
+
+    The bucket holds up to IMF_BURST tokens and refills at one token every
+    IMF_WAIT_TIME seconds. Each request takes one token when it starts, so
+    up to IMF_BURST requests may start at once after an idle period and the
+    long-run rate never exceeds one request per IMF_WAIT_TIME seconds.
+    Callers reserve a start time under a lock that is only held for the
+    bookkeeping; because tokens are counted at request start, concurrent
+    callers keep the request rate at the configured ceiling while earlier
+    requests are still downloading.
+
+    The bucket is tracked as the time at which it would next be full
+    (generic cell rate algorithm), which makes each reservation O(1).
+
+    If IMF_RATE_LIMIT_FILE is set (with set_imf_shared_rate_limit), the
+    bucket is kept in that file instead, under an exclusive file lock, so
+    that all processes on the machine pointing at the same file share one
+    request budget.
+
+    Args:
+        default_wait_time (float, optional): The wait time in seconds used if
+        IMF_WAIT_TIME is not set. Defaults to 1.5.
+    """
+
+    def __init__(self, default_wait_time=1.5):
+        self._default_wait_time = default_wait_time
+        self._next_start = 0.0
+        self._lock = Lock()
+        self.reset_stats()
+
+    def reserve(self):
+        """
+        Take a token, reserving the earliest allowed request start time.
+
+        Returns:
+            float: The number of seconds the caller must wait before starting
+            its request.
+        """
+        min_wait_time = float(environ.get("IMF_WAIT_TIME", self._default_wait_time))
+        burst = int(environ.get("IMF_BURST", 1))
+        shared_file = environ.get("IMF_RATE_LIMIT_FILE")
+        with self._lock:
+            if shared_file:
+                wait = max(
+                    _reserve_shared(shared_file, min_wait_time, burst) - time(), 0
+                )
+            else:
+                now = perf_counter()
+                start = max(now, self._next_start - (burst - 1) * min_wait_time)
+                self._next_start = max(self._next_start, start) + min_wait_time
+                wait = start - now
+            self._requests += 1
+            if wait > 0:
+                self._delayed += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+        return wait
+
+    def stats(self):
+        """
+        Summarize the waits imposed since the statistics were last reset.
+
+        Returns:
+            dict: The number of 'requests', the number that were 'delayed',
+            and the 'total_wait' and 'max_wait' in seconds.
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "delayed": self._delayed,
+                "total_wait": self._total_wait,
+                "max_wait": self._max_wait,
+            }
+
+    def reset_stats(self):
+        """
+        Reset the wait statistics.
+        """
+        with self._lock:
+            self._requests = 0
+            self._delayed = 0
+            self._total_wait = 0.0
+            self._max_wait = 0.0
+
+
+def _reserve_shared(file_path, min_wait_time, burst):
+    """
+    (Internal) Take a token from a token bucket shared between processes.
+
+    The time at which the bucket would next be full is stored as a wall-clock
+    timestamp in file_path, which is read and updated while holding an
+    exclusive lock on the file.
+
+    Args:
+        file_path (str): The state file shared by all processes.
+        min_wait_time (float): Seconds per token.
+        burst (int): The size of the bucket.
+
+    Returns:
+        float: The wall-clock time at which the caller may start its request.
+    """
+    makedirs(path.dirname(path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "a+b") as file:
+        _lock_file(file)
+        try:
+            file.seek(0)
+            try:
+                next_start = float(file.read().decode() or 0)
+            except ValueError:
+                next_start = 0.0
+            now = time()
+            start = max(now, next_start - (burst - 1) * min_wait_time)
+            file.seek(0)
+            file.truncate()
+            file.write(repr(max(next_start, start) + min_wait_time).encode())
+            file.flush()
+        finally:
+            _unlock_file(file)
+    return start
+
+
+if msvcrt is not None:
+
+    def _lock_file(file):
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+
+    def _lock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+_imf_rate_limiter = _RateLimiter()
 
 
 def _min_wait_time_limited(default_wait_time=1.5):
-    def decorator(func):
-        last_called = [0.0]
+    """
+    (Internal) Decorator that rate limits a function with the shared
+    _RateLimiter, sleeping until the reserved start time. Safe to call from
+    multiple threads.
+    """
+    if default_wait_time != _imf_rate_limiter._default_wait_time:
+        limiter = _RateLimiter(default_wait_time)
+    else:
+        limiter = _imf_rate_limiter
 
+    def decorator(func):
+        @wraps(func)
         def wrapper(*args, **kwargs):
-            min_wait_time = float(environ.get("IMF_WAIT_TIME", default_wait_time))
-            elapsed = perf_counter() - last_called[0]
-            left_to_wait = min_wait_time - elapsed
+            left_to_wait = limiter.reserve()
+            _imf_request_wait.set(max(left_to_wait, 0.0))
             if left_to_wait > 0:
                 sleep(left_to_wait)
-            ret = func(*args, **kwargs)
-            last_called[0] = perf_counter()
-            return ret
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+_imf_request_hook = None
+_imf_request_wait = ContextVar("_imf_request_wait", default=0.0)
+
+
+class _RequestTrace:
+    """
+    (Internal) Timings and outcome of one API request, reported to the hook
+    set with set_imf_request_hook.
+
+    Timings are accumulated across attempts at the cost of a few clock reads
+    per request. Work done only for the hook, such as timing the chunks of a
+    streamed response, is skipped when no hook is set, and no event is built.
+
+    Args:
+        URL (str): The API request URL.
+    """
+
+    def __init__(self, URL):
+        self.URL = URL
+        self.status = None
+        self.bytes = 0
+        self.wait = 0.0
+        self.network = 0.0
+        self.parse = 0.0
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.cache_hit = False
+        self.revalidated = False
+        self.decoder = None
+        self.enabled = _imf_request_hook is not None
+        self._start = perf_counter()
+
+    def fetch(self, get, *args, **kwargs):
+        """
+        Call a rate-limited request function, splitting the time it takes
+        into the rate-limit wait and network time.
+        """
+        _imf_request_wait.set(0.0)
+        start = perf_counter()
+        try:
+            return get(*args, **kwargs)
+        finally:
+            self.fetched(start)
+
+    def fetched(self, start):
+        """
+        Record a request started at perf_counter() time start that has just
+        returned.
+        """
+        wait = _imf_request_wait.get()
+        self.wait += wait
+        self.network += perf_counter() - start - wait
+
+    def retry(self, delay):
+        """
+        Record a failed attempt, returning the delay before the next one.
+        """
+        self.retries += 1
+        self.retry_wait += delay
+        return delay
+
+    def timed_chunks(self, chunks):
+        """
+        Count the size of, and time spent reading, the chunks of a streamed
+        response body. Reading time is moved from parse to network time,
+        since chunks are read while parsing.
+        """
+        chunks = iter(chunks)
+        while True:
+            start = perf_counter()
+            chunk = next(chunks, None)
+            elapsed = perf_counter() - start
+            self.network += elapsed
+            self.parse -= elapsed
+            if chunk is None:
+                return
+            self.bytes += len(chunk)
+            yield chunk
+
+    def report(self, error=None):
+        """
+        Send the event for this request to the hook, if one is set.
+        """
+        if not self.enabled:
+            return
+        if self.cache_hit:
+            cache = "hit"
+        elif self.revalidated:
+            cache = "revalidated"
+        else:
+            cache = "off" if _cache_dir() is None else "miss"
+        _report_event(
+            {
+                "event": "request",
+                "url": self.URL,
+                "status": self.status,
+                "bytes": self.bytes,
+                "cache": cache,
+                "wait": self.wait,
+                "network": self.network,
+                "parse": self.parse,
+                "retries": self.retries,
+                "retry_wait": self.retry_wait,
+                "decoder": self.decoder,
+                "total": perf_counter() - self._start,
+                "error": error,
+            }
+        )
+
+
+def _report_event(event):
+    """
+    (Internal) Send an instrumentation event to the hook set with
+    set_imf_request_hook, if any. Errors raised by the hook are turned into
+    warnings so that they cannot break the request being reported.
+    """
+    hook = _imf_request_hook
+    if hook is None:
+        return
+    try:
+        hook(event)
+    except Exception as e:
+        warn(f"The IMF request hook raised an exception: {e!r}")
+
+
+_imf_memo = OrderedDict()
+_imf_memo_lock = Lock()
+_imf_memo_key_locks = {}
+
+
+def _memoize(key, copy):
+    """
+    (Internal) Decorator that memoizes a function's results in process.
+
+    Results are shared by all threads in a least-recently-used store bounded
+    by the IMF_MEMO_MAX_ENTRIES environment variable (set with
+    set_imf_memo_size). Concurrent calls with the same key wait for a single
+    evaluation instead of each calling the function. Exceptions are not
+    memoized.
+
+    Args:
+        key (callable): Function with the same signature as the decorated
+        function, returning a hashable memo key whose second item is the
+        database ID.
+        copy (callable): Function returning a copy of a memoized result, so
+        that callers cannot modify the stored value.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            max_entries = _memo_max_entries()
+            if max_entries <= 0:
+                return func(*args, **kwargs)
+
+            memo_key = key(*args, **kwargs)
+            with _imf_memo_lock:
+                found, result = _memo_get(memo_key)
+                if found:
+                    return copy(result)
+                key_lock = _imf_memo_key_locks.setdefault(memo_key, Lock())
+
+            with key_lock:
+                with _imf_memo_lock:
+                    found, result = _memo_get(memo_key)
+                    if found:
+                        return copy(result)
+                try:
+                    result = func(*args, **kwargs)
+                    with _imf_memo_lock:
+                        _memo_put(memo_key, result, max_entries)
+                finally:
+                    with _imf_memo_lock:
+                        _imf_memo_key_locks.pop(memo_key, None)
+
+            return copy(result)
 
         return wrapper
 
     return decorator
 
 
+def _memo_max_entries():
+    return int(environ.get("IMF_MEMO_MAX_ENTRIES", 128))
+
+
+def _memo_get(memo_key):
+    """
+    (Internal) Look up a memoized result, marking it as recently used. Must be
+    called while holding _imf_memo_lock.
+
+    Returns:
+        tuple: (True, result) if found, otherwise (False, None).
+    """
+    if memo_key in _imf_memo:
+        _imf_memo.move_to_end(memo_key)
+        return True, _imf_memo[memo_key]
+    return False, None
+
+
+def _memo_put(memo_key, result, max_entries):
+    """
+    (Internal) Store a memoized result, evicting the least recently used
+    results beyond max_entries. Must be called while holding _imf_memo_lock.
+    """
+    _imf_memo[memo_key] = result
+    _imf_memo.move_to_end(memo_key)
+    while len(_imf_memo) > max_entries:
+        _imf_memo.popitem(last=False)
+
+
+def _memo_clear(database_id=None):
+    """
+    (Internal) Remove memoized results, either all of them or only those for
+    one database.
+    """
+    with _imf_memo_lock:
+        if database_id is None:
+            _imf_memo.clear()
+        else:
+            for memo_key in [k for k in _imf_memo if k[1] == database_id]:
+                del _imf_memo[memo_key]
+
+
+_default_pool_size = 10
+_default_connect_timeout = 10.0
+_default_read_timeout = 300.0
+
+_imf_session_lock = Lock()
+_imf_session_key = None
+_imf_session_object = None
+
+
+def _imf_session():
+    """
+    (Internal) Get the process-wide requests.Session used for API requests.
+
+    The session keeps connections to the API alive between requests and
+    shares them between threads, with up to IMF_POOL_SIZE connections per
+    host (set with set_imf_connection_pool). It is recreated when the pool
+    size changes and in child processes, which must not share sockets with
+    their parent.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _imf_session_key, _imf_session_object
+    # requests is imported on first use to keep "import imfp" fast
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+
+    pool_size = int(environ.get("IMF_POOL_SIZE", _default_pool_size))
+    session_key = (getpid(), pool_size)
+
+    with _imf_session_lock:
+        if _imf_session_key != session_key:
+            if _imf_session_object is not None and _imf_session_key[0] == getpid():
+                _imf_session_object.close()
+            session = Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            _imf_session_key, _imf_session_object = session_key, session
+        return _imf_session_object
+
+
+def _imf_timeout():
+    """
+    (Internal) Get the (connect, read) timeouts in seconds for API requests.
+    """
+    return (
+        float(environ.get("IMF_CONNECT_TIMEOUT", _default_connect_timeout)),
+        float(environ.get("IMF_READ_TIMEOUT", _default_read_timeout)),
+    )
+
+
 @_min_wait_time_limited()
-def _imf_get(url, headers):
+def _imf_get(url, headers, stream=False):
     """
-    A rate-limited wrapper around the requests.get method.
+    A rate-limited GET request through the shared, pooled session.
 
     Args:
         url (str): The URL to send a GET request to.
         headers (dict): The headers to use in the API request.
+        stream (bool, optional): Whether to defer downloading the response
+        body until it is iterated over. Defaults to False.
 
     Returns:
-        requests.Response: The response object returned by requests.get.
+        requests.Response: The response object returned by Session.get.
 
     Usage:
         response = _imf_get(
@@ -44,11 +513,184 @@ def _imf_get(url, headers):
             )
         print(response.text)
     """
-    return get(url, headers)
+    return _imf_session().get(
+        url, headers=headers, stream=stream, timeout=_imf_timeout()
+    )
+
+
+class _RetryPolicy:
+    """
+    (Internal) Backoff policy for retrying failed API requests.
+
+    The delay before retry n (counting from 0) is drawn uniformly between 0
+    and min(IMF_RETRY_MAX_DELAY, IMF_RETRY_BASE_DELAY * 2 ** n) ("full
+    jitter"), so that callers that failed together do not retry together. If
+    IMF_RETRY_JITTER is "0", the upper bound is used instead. A Retry-After
+    time sent by the API is always waited at least.
+    """
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Get the number of seconds to wait before retrying.
+
+        Args:
+            attempt (int): The number of the attempt that failed, from 0.
+            retry_after (float, optional): Seconds to wait requested by the
+            API's Retry-After header. Defaults to None.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        base_delay = float(environ.get("IMF_RETRY_BASE_DELAY", 5))
+        max_delay = float(environ.get("IMF_RETRY_MAX_DELAY", 60))
+        delay = min(max_delay, base_delay * 2**attempt)
+        if environ.get("IMF_RETRY_JITTER", "1") != "0":
+            delay = uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class _CircuitBreaker:
+    """
+    (Internal) Process-wide circuit breaker for API requests.
+
+    After IMF_BREAKER_THRESHOLD consecutive responses indicating that the API
+    is overwhelmed, the breaker opens for IMF_BREAKER_COOLDOWN seconds, during
+    which requests fail immediately instead of adding to the load or sleeping
+    through retries. Once the cooldown has passed, requests are sent again; a
+    further rejection reopens the breaker and a success closes it. A
+    threshold of 0 disables the breaker.
+    """
+
+    def __init__(self):
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = Lock()
+
+    def check(self, URL):
+        """
+        Raise an error if the breaker is open.
+
+        Raises:
+            ValueError: If requests to the API are currently suspended.
+        """
+        with self._lock:
+            remaining = self._open_until - perf_counter()
+            failures = self._failures
+        if remaining > 0:
+            raise ValueError(
+                f"API request not sent. URL: '{URL}'\n\n"
+                f"API may be overwhelmed: it rejected the last {failures} "
+                f"requests. Requests are suspended for another "
+                f"{remaining:.0f} seconds; take a break and try again."
+            )
+
+    def record(self, overwhelmed):
+        """
+        Record the outcome of a request.
+
+        Args:
+            overwhelmed (bool): Whether the response indicated that the API is
+            overwhelmed.
+        """
+        threshold = int(environ.get("IMF_BREAKER_THRESHOLD", 5))
+        with self._lock:
+            if not overwhelmed:
+                self._failures = 0
+                return None
+            self._failures += 1
+            if threshold > 0 and self._failures >= threshold:
+                cooldown = float(environ.get("IMF_BREAKER_COOLDOWN", 60))
+                self._open_until = perf_counter() + cooldown
+        return None
+
+    def reset(self):
+        """
+        Close the breaker and forget past failures.
+        """
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+
+_imf_retry_policy = _RetryPolicy()
+_imf_circuit_breaker = _CircuitBreaker()
+
+
+def _retry_delay(attempt, times, retryable, err_message, retry_after=None):
+    """
+    (Internal) Decide whether to retry a failed request.
+
+    Args:
+        attempt (int): The number of the attempt that failed, from 0.
+        times (int): The maximum number of attempts.
+        retryable (bool): Whether the failure may succeed on retry.
+        err_message (str): The error message to raise if not retrying.
+        retry_after (float, optional): Seconds to wait requested by the API.
+
+    Returns:
+        float: The number of seconds to wait before retrying.
+
+    Raises:
+        ValueError: With err_message, if the request should not be retried.
+    """
+    if not retryable or attempt >= times - 1:
+        raise ValueError(err_message)
+    return _imf_retry_policy.delay(attempt, retry_after)
+
+
+def _response_retryable(status, content):
+    """
+    (Internal) Whether a failed API response may succeed on retry.
+
+    Rate limit rejections and server errors are retried. Requests that are
+    too large, have too many parameters or are malformed fail the same way
+    every time, so are not.
+    """
+    if "Rejected" in content or "Bandwidth" in content:
+        return True
+    if "Service" in content:
+        return False
+    if status == 500 and "please check your query" in content.lower():
+        return False
+    return status is None or status in (408, 429) or not 400 <= status < 500
+
+
+def _response_overwhelmed(status, content):
+    """
+    (Internal) Whether a failed API response indicates that the API is
+    overwhelmed by requests.
+    """
+    return "Rejected" in content or "Bandwidth" in content or status == 429
+
+
+def _retry_after(headers):
+    """
+    (Internal) Parse the Retry-After header of a response.
+
+    Returns:
+        float: The number of seconds to wait, or None if the header is absent
+        or invalid.
+    """
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
 
 _imf_use_cache = False
 _imf_save_response = False
+_imf_responses_dir = "tests/responses"
 
 
 def _download_parse(URL, times=3):
@@ -57,128 +699,519 @@ def _download_parse(URL, times=3):
     and retries.
 
     This function is rate-limited and will perform a specified number of
-    retries in case of failure.
+    attempts in case of failure. Failures that may be transient (rate limit
+    rejections, server and network errors, invalid JSON) are retried after a
+    jittered, exponentially growing delay, or the delay requested by the
+    API's Retry-After header (see set_imf_retry_policy). Failures that would
+    recur, such as requests that are too large, are raised immediately, as
+    are failures of cached responses. While the API is persistently rejecting
+    requests, the shared circuit breaker fails requests without sending
+    them.
+
+    If an on-disk cache has been configured with set_imf_cache, fresh cached
+    responses are returned without making a request, and successful
+    responses are added to the cache.
 
     Args:
         URL (str): The URL to download and parse the JSON content from.
-        times (int, optional): The number of times to retry the request in case
-        of failure. Defaults to 3.
+        times (int, optional): The maximum number of attempts. Defaults to 3.
 
     Returns:
         dict: The parsed JSON content as a Python dictionary.
 
     Raises:
-        ValueError: If the content cannot be parsed as JSON after the specified
-        number of retries.
+        ValueError: If the request fails and is not retried, or the content
+        cannot be parsed as JSON after the specified number of attempts.
     """
 
     global _imf_use_cache, _imf_save_response
     use_cache = _imf_use_cache
     save_response = _imf_save_response
 
+    trace = _RequestTrace(URL)
+    try:
+        json_parsed = _download_parse_attempts(
+            URL, times, use_cache, save_response, trace
+        )
+    except ValueError as e:
+        trace.report(str(e))
+        raise
+    trace.report()
+    return json_parsed
+
+
+def _download_parse_attempts(URL, times, use_cache, save_response, trace):
+    """
+    (Internal) Make the attempts of _download_parse, recording their timings
+    in trace.
+    """
+    from requests import RequestException
+
+    headers = _imf_headers()
+    for attempt in range(times):
+        status, content, from_cache = _attempt_cached(URL, use_cache)
+        retry_after = validators = None
+        if not from_cache:
+            _imf_circuit_breaker.check(URL)
+            try:
+                response, entry = _imf_get_revalidated(URL, headers, trace)
+            except RequestException as e:
+                sleep(_attempt_network_error(URL, attempt, times, e, trace))
+                continue
+            body = None
+            if entry is None:
+                body = _response_body(response.content, response.encoding)
+            status, content, retry_after, validators = _attempt_response(
+                response.status_code, body, response.headers, entry, trace
+            )
+
+        json_parsed, delay = _attempt_parse(
+            URL,
+            attempt,
+            times,
+            status,
+            content,
+            from_cache,
+            validators,
+            retry_after,
+            save_response,
+            trace,
+        )
+        if delay is None:
+            return json_parsed
+        sleep(delay)
+
+
+def _attempt_cached(URL, use_cache, stream=False):
+    """
+    (Internal) Look up the response to a request attempt in the recorded test
+    responses (if use_cache) or the on-disk cache.
+
+    Args:
+        URL (str): The API request URL.
+        use_cache (bool): Whether to use the recorded test responses.
+        stream (bool, optional): Whether to return the body as an iterator
+        over chunks decompressed as they are consumed. Defaults to False.
+
+    Returns:
+        tuple: The status code and body (UTF-8 bytes) of the response, and
+        whether it was found. If not, a request must be sent.
+    """
+    if use_cache:
+        status, content = _load_cached_response(URL, stream)
+        if content is None:
+            content = iter([]) if stream else b""
+        return status, content, True
+    status, content = _cache_load(URL, stream)
+    return status, content, content is not None
+
+
+def _attempt_response(status, content, response_headers, entry, trace, stream=False):
+    """
+    (Internal) Resolve the response to a request sent after _attempt_cached
+    missed. A 304 Not Modified answer to a conditional request is replaced by
+    the revalidated cache entry.
+
+    Args:
+        status (int): The status code of the response.
+        content (bytes): The body of the response, as UTF-8 bytes.
+        response_headers (dict): The headers of the response.
+        entry (dict): The expired cache entry the request was made
+        conditional on, or None.
+        trace (_RequestTrace): The trace recording the request's timings.
+        stream (bool, optional): Whether to read the body of a revalidated
+        entry as an iterator over chunks (see _cache_content). Defaults to
+        False.
+
+    Returns:
+        tuple: The status code and body of the response, the delay requested
+        by its Retry-After header, and its cache validators.
+    """
+    if entry is not None and status == 304:
+        status = entry["status_code"]
+        content = _cache_content(_cache_dir(), entry, stream)
+        if content is None:
+            content = iter([]) if stream else b""
+        trace.revalidated = True
+    else:
+        entry = None
+    return (
+        status,
+        content,
+        _retry_after(response_headers),
+        _cache_validators(response_headers, entry),
+    )
+
+
+def _attempt_parse(
+    URL,
+    attempt,
+    times,
+    status,
+    content,
+    from_cache,
+    validators,
+    retry_after,
+    save_response,
+    trace,
+):
+    """
+    (Internal) Check and parse the response to one attempt of
+    _download_parse or _download_parse_async, caching successful responses.
+
+    Returns:
+        tuple: The parsed JSON content and None if the attempt succeeded, or
+        None and the seconds to wait before the next attempt.
+
+    Raises:
+        ValueError: If the attempt failed and is not retried.
+    """
+    trace.status = status
+    trace.bytes = len(content)
+    trace.cache_hit = from_cache
+
+    if save_response:
+        file_path = _cache_path(URL, _imf_responses_dir)
+        print(f"Saving response to: {file_path}")
+        _cache_save(URL, status, content, cache_dir=_imf_responses_dir)
+
+    if status != 200 or (b"<" in content and b">" in content):
+        text = content.decode(errors="replace")
+        return None, _attempt_error(
+            URL, attempt, times, status, text, from_cache, retry_after, trace
+        )
+
+    start = perf_counter()
+    trace.decoder, decoder = _json_backend()
+    try:
+        json_parsed = _json_loads(content, decoder)
+    except JSONDecodeError:
+        err_message = (
+            f"Content from API could not be parsed as JSON. URL: '{URL}' "
+            f"Status: '{status}', Content: '{content.decode(errors='replace')}'"
+        )
+        return None, trace.retry(
+            _retry_delay(attempt, times, not from_cache, err_message)
+        )
+    finally:
+        trace.parse += perf_counter() - start
+
+    if not from_cache:
+        _imf_circuit_breaker.record(False)
+        _cache_save(URL, status, content, validators)
+    return json_parsed, None
+
+
+def _attempt_error(URL, attempt, times, status, text, from_cache, retry_after, trace):
+    """
+    (Internal) Classify an error response to an attempt, recording it with
+    the circuit breaker.
+
+    Returns:
+        float: The seconds to wait before the next attempt.
+
+    Raises:
+        ValueError: If the error is not retried.
+    """
+    err_message = _response_error(URL, status, text)
+    if not from_cache:
+        _imf_circuit_breaker.record(_response_overwhelmed(status, text))
+    retryable = not from_cache and _response_retryable(status, text)
+    return trace.retry(
+        _retry_delay(attempt, times, retryable, err_message, retry_after)
+    )
+
+
+def _attempt_network_error(URL, attempt, times, error, trace):
+    """
+    (Internal) Get the seconds to wait after an attempt failed to reach the
+    API.
+
+    Raises:
+        ValueError: If no attempts are left.
+    """
+    err_message = f"API request failed. URL: '{URL}' Error: '{error}'"
+    return trace.retry(_retry_delay(attempt, times, True, err_message))
+
+
+def _download_parse_stream(URL, keys, times=3):
+    """
+    (Internal) Download a JSON document from a URL and incrementally parse the
+    value at a path of object keys, with rate limiting and retries.
+
+    The response body is read from the network in chunks and decoded one item
+    at a time, so the full document is never held in memory as a string or
+    as a parsed dictionary. Cached responses are parsed the same way, as they
+    are decompressed chunk by chunk. Responses are added to the on-disk cache
+    as they are streamed.
+
+    Errors reported by the API are detected (and retried, as by
+    _download_parse) before this function returns. Errors in the JSON content
+    itself are only detected during iteration and are not retried.
+
+    Args:
+        URL (str): The URL to download and parse the JSON content from.
+        keys (list): Object keys leading to the value to parse, e.g.
+        ['CompactData', 'DataSet', 'Series'].
+        times (int, optional): The number of times to retry the request in case
+        of failure. Defaults to 3.
+
+    Returns:
+        Iterator: The items of the array found at the path, decoded one at a
+        time (or the single value, if it is not an array). Empty if the path
+        does not exist or is null.
+
+    Raises:
+        ValueError: If the API returns an error after the specified number of
+        retries, or, during iteration, if the content cannot be parsed as
+        JSON.
+    """
+
+    global _imf_use_cache
+    use_cache = _imf_use_cache
+
+    trace = _RequestTrace(URL)
+    try:
+        return _download_parse_stream_attempts(URL, keys, times, use_cache, trace)
+    except ValueError as e:
+        trace.report(str(e))
+        raise
+
+
+def _download_parse_stream_attempts(URL, keys, times, use_cache, trace):
+    """
+    (Internal) Make the attempts of _download_parse_stream, recording their
+    timings in trace.
+    """
+    from requests import RequestException
+
+    headers = _imf_headers()
+    for attempt in range(times):
+        writer = None
+        retry_after = None
+        status, content, from_cache = _attempt_cached(URL, use_cache, True)
+        if from_cache:
+            chunks = _decode_chunks(content)
+        else:
+            _imf_circuit_breaker.check(URL)
+            try:
+                response, entry = _imf_get_revalidated(URL, headers, trace, stream=True)
+            except RequestException as e:
+                sleep(_attempt_network_error(URL, attempt, times, e, trace))
+                continue
+            status, content, retry_after, validators = _attempt_response(
+                response.status_code, None, response.headers, entry, trace, True
+            )
+            if entry is None:
+                chunks = _response_chunks(response)
+            else:
+                chunks = _decode_chunks(content)
+            if status == 200:
+                writer = _cache_writer(URL, status, validators)
+                if writer is not None:
+                    chunks = _tee_chunks(chunks, writer.write)
+        trace.status = status
+        trace.cache_hit = from_cache
+        if trace.enabled:
+            trace.bytes = 0
+            chunks = trace.timed_chunks(chunks)
+
+        reader = _JSONStreamReader(chunks)
+        start = perf_counter()
+        if status != 200 or reader.peek() != "{":
+            if writer is not None:
+                writer.abort()
+            text = "".join(reader.remainder())
+            sleep(
+                _attempt_error(
+                    URL, attempt, times, status, text, from_cache, retry_after, trace
+                )
+            )
+            continue
+        trace.parse += perf_counter() - start
+
+        if not from_cache:
+            _imf_circuit_breaker.record(False)
+        return _stream_items(
+            URL, status, reader, keys, writer, trace if trace.enabled else None
+        )
+
+
+def _imf_get_revalidated(URL, headers, trace, stream=False):
+    """
+    (Internal) Send an API request with _imf_get. If the on-disk cache holds
+    an expired response for the URL that was served with an ETag or
+    Last-Modified header, the request is made conditional on the response
+    having changed, so that an unchanged response costs no download.
+
+    Args:
+        URL (str): The API request URL.
+        headers (dict): The headers to use in the API request.
+        trace (_RequestTrace): The trace recording the request's timings.
+        stream (bool, optional): Whether to defer downloading the response
+        body. Defaults to False.
+
+    Returns:
+        tuple: The response, and the revalidated cache entry (from
+        _cache_stale) if the API answered 304 Not Modified, or None.
+    """
+    headers, entry = _revalidation_headers(URL, headers)
+    response = trace.fetch(_imf_get, URL, headers=headers, stream=stream)
+    if entry is not None and response.status_code == 304:
+        response.close()
+        return response, entry
+    return response, None
+
+
+def _revalidation_headers(URL, headers):
+    """
+    (Internal) Add the conditional request headers revalidating the expired
+    cache entry of a URL, if it has one with validators.
+
+    Returns:
+        tuple: The request headers, and the expired entry (from _cache_stale)
+        or None.
+    """
+    entry = _cache_stale(URL)
+    if entry is not None:
+        headers = {**headers, **_cache_conditional_headers(entry)}
+    return headers, entry
+
+
+def _stream_items(URL, status, reader, keys, writer, trace=None):
+    """
+    (Internal) Yield the items parsed from a response by
+    _download_parse_stream, committing the response to the on-disk cache once
+    it has been read in full. If a _RequestTrace is given, it is reported
+    once iteration ends, with parse time excluding time spent by the caller
+    between items.
+    """
+    error = None
+    start = perf_counter()
+    try:
+        for item in _iter_json_path(reader, keys):
+            if trace is not None:
+                trace.parse += perf_counter() - start
+            yield item
+            start = perf_counter()
+        if writer is not None:
+            for _ in reader.remainder():
+                pass
+            writer.commit()
+        if trace is not None:
+            trace.parse += perf_counter() - start
+    except JSONDecodeError as e:
+        error = (
+            f"Content from API could not be parsed as JSON. URL: '{URL}' "
+            f"Status: '{status}', Error: '{e}'"
+        )
+        raise ValueError(error)
+    finally:
+        if writer is not None:
+            writer.abort()
+        if trace is not None:
+            trace.report(error)
+
+
+def _imf_headers():
+    """
+    (Internal) Build the headers sent with every API request.
+    """
     app_name = environ.get("IMF_APP_NAME")
     if app_name:
         app_name = app_name[:255]
     else:
         app_name = "imfp"
 
-    headers = {"Accept": "application/json", "User-Agent": app_name}
-    for _ in range(times):
-        if use_cache:
-            cached_status, cached_content = _load_cached_response(URL)
-            if cached_content is not None:
-                content = cached_content
-                status = cached_status
-        else:
-            response = _imf_get(URL, headers=headers)
-            content = response.text
-            status = response.status_code
-
-        if save_response:
-            file_name = hashlib.sha256(URL.encode()).hexdigest()
-            file_path = f"tests/responses/{file_name}.json"
-            print(f"Saving response to: {file_path}")
-            with open(file_path, "w") as file:
-                dump({"status_code": status, "content": content}, file)
-
-        if status != 200 or ("<" in content and ">" in content):
-            matches = re.search("<[^>]+>(.*?)<\\/[^>]+>", content)
-            inner_text = matches.group(1)
-            output_string = re.sub(" GKey\\s*=\\s*[a-f0-9-]+", "", inner_text)
-
-            if "Rejected" in content or "Bandwidth" in content:
-                err_message = (
-                    f"API request failed. URL: '{URL}' "
-                    f"Status: '{status}', "
-                    f"Content: '{output_string}'\n\n"
-                    "API may be overwhelmed by too many "
-                    "requests. Take a break and try again."
-                )
-            elif "Service" in content:
-                err_message = (
-                    f"API request failed. URL: '{URL}' "
-                    f"Status: '{status}', "
-                    f"Content: '{output_string}'\n\n"
-                    "Your requested dataset may be too large. "
-                    "Try narrowing your request and try again."
-                )
-            elif status == 400:
-                err_message = (
-                    f"API request failed. URL: '{URL}' "
-                    f"Status: '{status}', "
-                    f"Content: '{output_string}'\n\n"
-                    "Too many parameters supplied. "
-                    "Please narrow the request and try again."
-                )
-            elif status == 500 and "please check your query" in content.lower():
-                err_message = (
-                    f"API request failed. URL: '{URL}' "
-                    f"Status: '{status}', "
-                    f"Content: '{output_string}'\n\n"
-                    "Your request may be missing one or more required "
-                    "parameters. Please adjust your query and try again."
-                )
-            else:
-                err_message = (
-                    f"API request failed. URL: '{URL}' "
-                    f"Status: '{status}', "
-                    f"Content: '{output_string}'"
-                )
+    return {"Accept": "application/json", "User-Agent": app_name}
 
-            if _ < times - 1:
-                sleep(5 ** (_ + 1))
-            else:
-                raise ValueError(err_message)
-        else:
-            try:
-                json_parsed = loads(content)
-                return json_parsed
-            except JSONDecodeError:
-                if _ < times - 1:
-                    sleep(5 ** (_ + 1))
-                else:
-                    raise ValueError(
-                        f"Content from API could not be parsed as JSON. URL: '{URL}' "
-                        f"Status: '{status}', Content: '{content}'"
-                    )
-
-
-def _load_cached_response(URL):
-    file_name = hashlib.sha256(URL.encode()).hexdigest()
-    file_path = f"tests/responses/{file_name}.json"
-
-    if path.exists(file_path):
-        with open(file_path, "r") as file:
-            data = load(file)
-            return data.get("status_code"), data.get("content")
+
+def _response_error(URL, status, content):
+    """
+    (Internal) Build the error message for a failed API response.
+
+    Args:
+        URL (str): The requested URL.
+        status (int): The HTTP status code of the response.
+        content (str): The response body.
+
+    Returns:
+        str: A message describing the failure and, where the cause can be
+        recognized, how to fix it.
+    """
+    matches = re.search("<[^>]+>(.*?)<\\/[^>]+>", content)
+    inner_text = matches.group(1) if matches else content
+    output_string = re.sub(" GKey\\s*=\\s*[a-f0-9-]+", "", inner_text)
+
+    if "Rejected" in content or "Bandwidth" in content:
+        err_message = (
+            f"API request failed. URL: '{URL}' "
+            f"Status: '{status}', "
+            f"Content: '{output_string}'\n\n"
+            "API may be overwhelmed by too many "
+            "requests. Take a break and try again."
+        )
+    elif "Service" in content:
+        err_message = (
+            f"API request failed. URL: '{URL}' "
+            f"Status: '{status}', "
+            f"Content: '{output_string}'\n\n"
+            "Your requested dataset may be too large. "
+            "Try narrowing your request and try again."
+        )
+    elif status == 400:
+        err_message = (
+            f"API request failed. URL: '{URL}' "
+            f"Status: '{status}', "
+            f"Content: '{output_string}'\n\n"
+            "Too many parameters supplied. "
+            "Please narrow the request and try again."
+        )
+    elif status == 500 and "please check your query" in content.lower():
+        err_message = (
+            f"API request failed. URL: '{URL}' "
+            f"Status: '{status}', "
+            f"Content: '{output_string}'\n\n"
+            "Your request may be missing one or more required "
+            "parameters. Please adjust your query and try again."
+        )
+    else:
+        err_message = (
+            f"API request failed. URL: '{URL}' "
+            f"Status: '{status}', "
+            f"Content: '{output_string}'"
+        )
+
+    return err_message
+
+
+def _load_cached_response(URL, stream=False):
+    data = _cache_read(
+        _imf_responses_dir,
+        _cache_path(URL, _imf_responses_dir),
+        "chunks" if stream else "bytes",
+    )
+    if data is not None:
+        return data.get("status_code"), data.get("content")
     return None, None
 
 
+@_memoize(
+    key=lambda database_id, times=3, inputs_only=True: (
+        "dimensions",
+        database_id,
+        inputs_only,
+    ),
+    copy=lambda result: result.copy(),
+)
 def _imf_dimensions(database_id, times=3, inputs_only=True):
     """
     (Internal) Retrieve the list of codes for dimensions of an individual IMF
     database.
 
+    Results are memoized in process, so repeated calls for the same database
+    do not make further API requests.
+
     Args:
         database_id (str): The ID of the IMF database.
         times (int, optional): The number of times to retry the request in case
@@ -195,6 +1228,15 @@ def _imf_dimensions(database_id, times=3, inputs_only=True):
         f"{database_id}"
     )
     raw_dl = _download_parse(URL, times)
+    return _parse_dimensions(raw_dl, inputs_only)
+
+
+def _parse_dimensions(raw_dl, inputs_only=True):
+    """
+    (Internal) Build the _imf_dimensions DataFrame from a parsed DataStructure
+    response.
+    """
+    from pandas import DataFrame
 
     code = []
     for item in raw_dl["Structure"]["CodeLists"]["CodeList"]:
@@ -226,10 +1268,28 @@ def _imf_dimensions(database_id, times=3, inputs_only=True):
     return result_df
 
 
+def _metadata_database_id(URL):
+    """
+    (Internal) Get the database ID from a CompactData or GenericMetadata URL,
+    or the URL itself if it has none.
+    """
+    match = re.search(r"/(?:CompactData|GenericMetadata)/([^/?]+)", URL or "")
+    return match.group(1) if match else URL
+
+
+@_memoize(
+    key=lambda URL, times=3: ("metadata", _metadata_database_id(URL)),
+    copy=lambda result: dict(result),
+)
 def _imf_metadata(URL, times=3):
     """
     (Internal) Access metadata for a dataset.
 
+    The metadata header is the same for every query against a database, so
+    results are memoized in process per database: later calls for any URL of
+    the same database, including its timestamp, return the first result
+    without making an API request.
+
     Args:
         URL (str): The URL used to request metadata.
         times (int, optional): Maximum number of requests to attempt. Defaults
@@ -254,7 +1314,14 @@ def _imf_metadata(URL, times=3):
 
     URL = URL.replace("CompactData", "GenericMetadata")
     raw_dl = _download_parse(URL, times=times)
+    return _parse_metadata(raw_dl)
+
 
+def _parse_metadata(raw_dl):
+    """
+    (Internal) Extract the header fields returned by _imf_metadata from a
+    parsed GenericMetadata response.
+    """
     output = {
         "XMLschema": raw_dl["GenericMetadata"]["@xmlns:xsd"],
         "message": raw_dl["GenericMetadata"]["@xsi:schemaLocation"],
@@ -1,5 +1,10 @@
 import pytest
-from imfp import set_imf_app_name, set_imf_wait_time
+from imfp import (
+    set_imf_app_name,
+    set_imf_wait_time,
+    set_imf_memo_size,
+    set_imf_connection_pool,
+)
 import os
 
 
@@ -54,6 +59,52 @@ def test_set_imf_wait_time(env_setup_teardown):
     with pytest.raises(ValueError):
         set_imf_wait_time(-1)
 
+    # Test burst size
+    set_imf_wait_time(2.5, burst=3)
+    assert os.environ["IMF_BURST"] == "3"
+    with pytest.raises(TypeError):
+        set_imf_wait_time(2.5, burst=1.5)
+    with pytest.raises(ValueError):
+        set_imf_wait_time(2.5, burst=0)
+    set_imf_wait_time(2.5)
+    assert os.environ["IMF_BURST"] == "1"
+
+
+def test_set_imf_memo_size():
+    original_value = os.environ.get("IMF_MEMO_MAX_ENTRIES", None)
+
+    set_imf_memo_size(10)
+    assert os.environ["IMF_MEMO_MAX_ENTRIES"] == "10"
+
+    with pytest.raises(TypeError):
+        set_imf_memo_size(1.5)
+    with pytest.raises(ValueError):
+        set_imf_memo_size(-1)
+
+    if original_value is not None:
+        os.environ["IMF_MEMO_MAX_ENTRIES"] = original_value
+    else:
+        os.environ.pop("IMF_MEMO_MAX_ENTRIES", None)
+
+
+def test_set_imf_connection_pool(monkeypatch):
+    for key in ["IMF_POOL_SIZE", "IMF_CONNECT_TIMEOUT", "IMF_READ_TIMEOUT"]:
+        monkeypatch.delenv(key, raising=False)
+
+    set_imf_connection_pool(pool_size=4, connect_timeout=5, read_timeout=60.5)
+    assert os.environ["IMF_POOL_SIZE"] == "4"
+    assert os.environ["IMF_CONNECT_TIMEOUT"] == "5"
+    assert os.environ["IMF_READ_TIMEOUT"] == "60.5"
+
+    with pytest.raises(TypeError):
+        set_imf_connection_pool(pool_size=2.5)
+    with pytest.raises(ValueError):
+        set_imf_connection_pool(pool_size=0)
+    with pytest.raises(TypeError):
+        set_imf_connection_pool(read_timeout="60")
+    with pytest.raises(ValueError):
+        set_imf_connection_pool(connect_timeout=0)
+
 
 if __name__ == "__main__":
     pytest.main()
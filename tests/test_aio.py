@@ -0,0 +1,233 @@
+import pytest
+import asyncio
+import os
+import time
+import threading
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from imfp import (
+    imf_databases,
+    imf_parameters,
+    imf_dataset,
+    imf_databases_async,
+    imf_parameters_async,
+    imf_dataset_async,
+    set_imf_wait_time,
+    clear_imf_memo,
+)
+from imfp.aio import _download_parse_async, _aiohttp_session
+from imfp.utils import _RateLimiter
+from imfp.utils import _imf_save_response, _imf_use_cache
+
+
+# Set test configuration options
+create_cache = False
+use_cache = True
+wait_time = 0
+
+
+@pytest.fixture
+def set_options(monkeypatch):
+    # Create the responses directory if it doesn't exist
+    os.makedirs("tests/responses", exist_ok=True)
+
+    # Store the original values of the options
+    original_save_response = _imf_save_response
+    original_use_cache = _imf_use_cache
+    original_wait_time = os.environ.get("IMF_WAIT_TIME", None)
+
+    # Set caching options for response mocking
+    monkeypatch.setattr("imfp.utils._imf_save_response", create_cache)
+    monkeypatch.setattr("imfp.utils._imf_use_cache", use_cache)
+    set_imf_wait_time(wait_time)
+
+    # Perform the test
+    yield float(os.environ.get("IMF_WAIT_TIME"))
+
+    # Restore the original values of the options during teardown
+    monkeypatch.setattr("imfp.utils._imf_save_response", original_save_response)
+    monkeypatch.setattr("imfp.utils._imf_use_cache", original_use_cache)
+    if original_wait_time is not None:
+        os.environ["IMF_WAIT_TIME"] = original_wait_time
+    else:
+        os.environ.pop("IMF_WAIT_TIME", None)
+
+
+def test_imf_databases_async(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    pd.testing.assert_frame_equal(asyncio.run(imf_databases_async()), imf_databases())
+
+
+def test_imf_parameters_async(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    clear_imf_memo()
+    params = asyncio.run(imf_parameters_async("BOP"))
+    expected = imf_parameters("BOP")
+    assert params.keys() == expected.keys()
+    for key in params:
+        pd.testing.assert_frame_equal(params[key], expected[key])
+
+    with pytest.raises(Exception):
+        asyncio.run(imf_parameters_async(database_id="not_a_real_database", times=1))
+
+
+def test_imf_dataset_async(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+
+    async def gather():
+        return await asyncio.gather(
+            imf_dataset_async(**query),
+            imf_dataset_async(**{**query, "end_year": 2011}),
+            imf_dataset_async(**query, include_metadata=True),
+        )
+
+    case_1, case_2, (metadata, case_3) = asyncio.run(gather())
+    pd.testing.assert_frame_equal(case_1, imf_dataset(**query))
+    assert len(case_2) == 2
+    pd.testing.assert_frame_equal(case_3, case_1)
+    assert len(metadata) == 7
+
+    with pytest.raises(ValueError):
+        asyncio.run(imf_dataset_async(database_id="PCPS", start_year=1, times=1))
+
+    # Compact and wide results match imf_dataset's
+    pd.testing.assert_frame_equal(
+        asyncio.run(imf_dataset_async(**query, compact=True)),
+        imf_dataset(**query, compact=True),
+    )
+    wide, attributes = asyncio.run(imf_dataset_async(**query, shape="wide"))
+    expected_wide, expected_attributes = imf_dataset(**query, shape="wide")
+    pd.testing.assert_frame_equal(wide, expected_wide)
+    pd.testing.assert_frame_equal(attributes, expected_attributes)
+
+    with pytest.raises(ValueError, match="does not support stream"):
+        asyncio.run(imf_dataset_async(**query, stream=True))
+
+
+def test_imf_dataset_async_include_metadata_failed(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    cancelled = []
+
+    async def failing_download_parse(URL, times=3):
+        await asyncio.sleep(0.1)
+        raise ValueError("API request failed. Status: '500'")
+
+    async def slow_metadata(URL, times=3):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(URL)
+            raise
+        return {}
+
+    asyncio.run(imf_parameters_async("WHDREO201910"))
+    monkeypatch.setattr("imfp.aio._download_parse_async", failing_download_parse)
+    monkeypatch.setattr("imfp.aio._imf_metadata_async", slow_metadata)
+
+    # The metadata request is cancelled when the data request fails
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="500"):
+        asyncio.run(
+            imf_dataset_async(
+                database_id="WHDREO201910",
+                freq="A",
+                ref_area="US",
+                indicator="NGDPD",
+                include_metadata=True,
+            )
+        )
+    assert time.perf_counter() - start < 0.5
+    assert len(cancelled) == 1
+
+
+def test_async_rate_limiter(monkeypatch):
+    monkeypatch.setenv("IMF_WAIT_TIME", "0.1")
+    limiter = _RateLimiter()
+    ticks = []
+
+    async def ticker():
+        # Runs while the requests are waiting, so the loop must not be blocked
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.02)
+
+    async def request():
+        await asyncio.sleep(limiter.reserve())
+        return time.perf_counter()
+
+    async def run():
+        return await asyncio.gather(ticker(), *[request() for _ in range(4)])
+
+    start = time.perf_counter()
+    _, *starts = asyncio.run(run())
+    starts.sort()
+
+    assert len(ticks) == 5 and ticks[-1] - start < 0.2
+    assert all(later - earlier >= 0.09 for earlier, later in zip(starts, starts[1:]))
+    assert starts[-1] - start < 0.45
+
+
+class DataflowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports = set()
+
+    def do_GET(self):
+        self.client_ports.add(self.client_address[1])
+        body = b'{"Structure": {"Dataflows": {"Dataflow": []}}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize("use_aiohttp", [True, False])
+def test_download_parse_async_transport(monkeypatch, use_aiohttp):
+    if not use_aiohttp:
+        monkeypatch.setattr("imfp.aio.aiohttp", None)
+    else:
+        pytest.importorskip("aiohttp")
+    monkeypatch.setenv("IMF_WAIT_TIME", "0")
+    monkeypatch.delenv("IMF_CACHE_DIR", raising=False)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DataflowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/Dataflow"
+        DataflowHandler.client_ports.clear()
+
+        async def requests():
+            results = [await _download_parse_async(url) for _ in range(3)]
+            session = _aiohttp_session() if use_aiohttp else None
+            return results, session
+
+        results, session = asyncio.run(requests())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert results == [{"Structure": {"Dataflows": {"Dataflow": []}}}] * 3
+    # Consecutive requests reuse one kept-alive connection
+    assert len(DataflowHandler.client_ports) == 1
+    if use_aiohttp:
+        assert session.closed
+
+
+if __name__ == "__main__":
+    pytest.main()
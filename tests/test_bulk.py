@@ -0,0 +1,98 @@
+import pytest
+import os
+import json
+import pandas as pd
+from imfp import imf_bulk_download, set_imf_wait_time
+
+
+# Set test configuration options
+create_cache = False
+use_cache = True
+wait_time = 0
+
+
+@pytest.fixture
+def set_options(monkeypatch):
+    # Store the original values of the options
+    original_wait_time = os.environ.get("IMF_WAIT_TIME", None)
+
+    # Set caching options for response mocking
+    monkeypatch.setattr("imfp.utils._imf_save_response", create_cache)
+    monkeypatch.setattr("imfp.utils._imf_use_cache", use_cache)
+    set_imf_wait_time(wait_time)
+
+    # Perform the test
+    yield float(os.environ.get("IMF_WAIT_TIME"))
+
+    # Restore the original values of the options during teardown
+    if original_wait_time is not None:
+        os.environ["IMF_WAIT_TIME"] = original_wait_time
+    else:
+        os.environ.pop("IMF_WAIT_TIME", None)
+
+
+def test_imf_bulk_download(set_options, monkeypatch, tmp_path):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    requested = []
+    failing = {"NGDPD"}
+
+    def fake_download_parse_stream(URL, keys, times=3):
+        freq, ref_area, indicator = URL.split("?")[0].split("/")[-1].split(".")
+        requested.append(indicator)
+        if indicator in failing:
+            raise ValueError(f"API request failed. URL: '{URL}' Status: '502'")
+        if indicator == "GGR_GDP":
+            return iter([])
+        series = {
+            "@FREQ": freq,
+            "@REF_AREA": ref_area,
+            "@INDICATOR": indicator,
+            "Obs": [{"@TIME_PERIOD": "2020", "@OBS_VALUE": "1"}],
+        }
+        return iter([series])
+
+    monkeypatch.setattr("imfp.data._download_parse_stream", fake_download_parse_stream)
+
+    query = dict(freq="A", ref_area="US", indicator=["PPPSH", "NGDPD", "GGR_GDP"])
+    status = imf_bulk_download("WHDREO201910", tmp_path, max_workers=2, **query)
+
+    assert list(status["chunk"]) == ["PPPSH", "NGDPD", "GGR_GDP"]
+    assert list(status["status"]) == ["done", "failed", "empty"]
+    assert "502" in status["error"][1]
+    download_dir = tmp_path / "WHDREO201910"
+    data = pd.read_csv(download_dir / "indicator=PPPSH.csv", dtype=str)
+    assert list(data["indicator"]) == ["PPPSH"]
+    with open(download_dir / "manifest.json") as file:
+        manifest = json.load(file)
+    assert manifest["chunks"]["NGDPD"]["status"] == "failed"
+
+    # Resuming only requests the chunk that failed
+    requested.clear()
+    failing.clear()
+    status = imf_bulk_download("WHDREO201910", tmp_path, **query)
+    assert requested == ["NGDPD"]
+    assert list(status["status"]) == ["done", "done", "empty"]
+    assert (download_dir / "indicator=NGDPD.csv").exists()
+    assert [name for name in os.listdir(download_dir) if name.startswith(".")] == []
+
+    # A different plan in the same directory is refused
+    with pytest.raises(ValueError, match="different arguments"):
+        imf_bulk_download("WHDREO201910", tmp_path, freq="Q", indicator="PPPSH")
+    with pytest.raises(ValueError):
+        imf_bulk_download("WHDREO201910", tmp_path, split_by="not_a_parameter")
+    with pytest.raises(ValueError):
+        imf_bulk_download("WHDREO201910", tmp_path, file_format="xlsx")
+
+    # Without pyarrow, Parquet downloads fail before any chunk is requested
+    monkeypatch.setattr("imfp.store.pyarrow", None)
+    requested.clear()
+    with pytest.raises(ImportError, match="pyarrow"):
+        imf_bulk_download(
+            "WHDREO201910", tmp_path / "parquet", file_format="parquet", **query
+        )
+    assert requested == []
+
+
+if __name__ == "__main__":
+    pytest.main()
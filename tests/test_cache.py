@@ -0,0 +1,268 @@
+import pytest
+import responses
+import os
+import time
+import gzip
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from imfp import _download_parse, set_imf_cache, clear_imf_cache, set_imf_wait_time
+from imfp.cache import (
+    _cache_ttl,
+    _cache_path,
+    _cache_migrate,
+    _cache_save,
+    _cache_evict,
+)
+from imfp.utils import _download_parse_stream
+
+
+URL = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+BODY = '{"Structure": {"Dataflows": {"Dataflow": []}}}'
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    # Store the original values of the options
+    original_env = {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith("IMF_CACHE_") or key == "IMF_WAIT_TIME"
+    }
+
+    # Point the cache at a temporary directory and disable rate limiting
+    set_imf_cache(tmp_path)
+    set_imf_wait_time(0)
+
+    # Perform the test
+    yield tmp_path
+
+    # Restore the original values of the options during teardown
+    for key in list(os.environ):
+        if key.startswith("IMF_CACHE_") or key == "IMF_WAIT_TIME":
+            os.environ.pop(key)
+    os.environ.update(original_env)
+
+
+@responses.activate
+def test_cache_hit_skips_request(cache_dir):
+    responses.add(responses.GET, URL, body=BODY, status=200)
+
+    first = _download_parse(URL)
+    second = _download_parse(URL)
+
+    assert first == second
+    assert len(responses.calls) == 1
+    assert os.path.exists(_cache_path(URL, str(cache_dir)))
+
+
+@responses.activate
+def test_cache_skips_failed_responses(cache_dir):
+    responses.add(
+        responses.GET,
+        URL,
+        body="<string>There is an issue</string>",
+        status=500,
+    )
+
+    with pytest.raises(ValueError):
+        _download_parse(URL, times=1)
+
+    assert os.listdir(cache_dir) == []
+
+
+@responses.activate
+def test_cache_ttl_expiry(cache_dir):
+    responses.add(responses.GET, URL, body=BODY, status=200)
+
+    set_imf_cache(cache_dir, ttl={"Dataflow": 0})
+    _download_parse(URL)
+    time.sleep(0.01)
+    _download_parse(URL)
+    assert len(responses.calls) == 2
+
+    set_imf_cache(cache_dir, ttl=60)
+    _download_parse(URL)
+    assert len(responses.calls) == 2
+
+
+def test_cache_ttl_defaults(cache_dir):
+    set_imf_cache(cache_dir, ttl={"CompactData": 10})
+    assert _cache_ttl(URL) == 86400
+    assert _cache_ttl(URL.replace("Dataflow", "CompactData/BOP/A.US")) == 10
+
+
+@responses.activate
+def test_cache_size_eviction(cache_dir):
+    urls = [URL.replace("Dataflow", f"CodeList/CL_{i}") for i in range(3)]
+    for i, url in enumerate(urls):
+        responses.add(responses.GET, url, body=BODY.replace("[]", f"[{i}]"))
+
+    # Each entry (sidecar and payload) is just under 300 bytes, so only one fits
+    set_imf_cache(cache_dir, max_size=350)
+    for url in urls:
+        _download_parse(url)
+        time.sleep(0.01)
+
+    assert sorted(os.listdir(cache_dir)) == [
+        os.path.basename(_cache_path(urls[2], "")),
+        "objects",
+    ]
+    assert len(os.listdir(cache_dir / "objects")) == 1
+
+    clear_imf_cache()
+    assert os.listdir(cache_dir) == []
+
+
+def test_cache_overwrite_releases_payload(cache_dir):
+    def cache_size():
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(cache_dir)
+            for name in names
+        )
+
+    # Overwriting an entry with a new body deletes the previous body
+    for i in range(8):
+        _cache_save(URL, 200, BODY.replace("[]", f"[{i}]"))
+    assert len(os.listdir(cache_dir / "objects")) == 1
+    payload = os.listdir(cache_dir / "objects")[0]
+    entry_size = cache_size()
+    assert entry_size == os.path.getsize(
+        _cache_path(URL, str(cache_dir))
+    ) + os.path.getsize(cache_dir / "objects" / payload)
+
+    # Payloads no entry refers to are deleted before any entry is evicted,
+    # unless they were just written
+    for name in ["0" * 64, "1" * 64]:
+        with gzip.open(cache_dir / "objects" / f"{name}.gz", "wb") as file:
+            file.write(BODY.encode() * 10)
+    old = time.time() - 3600
+    os.utime(cache_dir / "objects" / f"{'0' * 64}.gz", (old, old))
+    _cache_evict(str(cache_dir), cache_size() - 1)
+    assert sorted(os.listdir(cache_dir / "objects")) == sorted(
+        [payload, f"{'1' * 64}.gz"]
+    )
+    assert os.path.exists(_cache_path(URL, str(cache_dir)))
+
+
+@responses.activate
+def test_cache_storage(cache_dir):
+    urls = [URL, URL.replace("Dataflow", "CodeList/CL_1")]
+    for url in urls:
+        responses.add(responses.GET, url, body=BODY)
+
+    # Bodies are stored compressed, once for identical responses
+    for url in urls:
+        _download_parse(url)
+    objects = os.listdir(cache_dir / "objects")
+    assert len(objects) == 1
+    with gzip.open(cache_dir / "objects" / objects[0], "rb") as file:
+        assert file.read().decode() == BODY
+    with open(_cache_path(URL, str(cache_dir)), "r") as file:
+        sidecar = json.load(file)
+    assert sidecar["payload"] == objects[0][: -len(".gz")]
+    assert "content" not in sidecar
+
+    # Entries in the earlier format are read, and converted by _cache_migrate
+    with open(_cache_path(URL, str(cache_dir)), "w") as file:
+        json.dump(
+            {
+                "url": URL,
+                "timestamp": time.time(),
+                "status_code": 200,
+                "content": BODY,
+            },
+            file,
+        )
+    assert _download_parse(URL) == json.loads(BODY)
+    assert _cache_migrate(str(cache_dir)) == 1
+    assert _cache_migrate(str(cache_dir)) == 0
+    assert _download_parse(URL) == json.loads(BODY)
+    assert len(responses.calls) == 2
+
+
+class RevalidatingHandler(BaseHTTPRequestHandler):
+    # Serves BODY with validators, answering conditional requests with 304
+    protocol_version = "HTTP/1.1"
+    body = BODY
+    etag = '"v1"'
+    last_modified = "Wed, 01 Jan 2025 00:00:00 GMT"
+    requests = []
+    bytes_sent = 0
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        body = self.body.encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        type(self).bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cache_revalidation(cache_dir):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RevalidatingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/REST/SDMX_JSON.svc/Dataflow"
+        RevalidatingHandler.requests = []
+        RevalidatingHandler.bytes_sent = 0
+
+        # Entries expire immediately, so every call revalidates
+        set_imf_cache(cache_dir, ttl=0)
+        first = _download_parse(url)
+        assert "If-None-Match" not in RevalidatingHandler.requests[0]
+        assert RevalidatingHandler.bytes_sent == len(BODY)
+
+        # Unchanged responses are served from the cache without a body
+        time.sleep(0.01)
+        assert _download_parse(url) == first
+        time.sleep(0.01)
+        assert list(_download_parse_stream(url, ["Structure"])) == [first["Structure"]]
+        assert len(RevalidatingHandler.requests) == 3
+        assert RevalidatingHandler.bytes_sent == len(BODY)
+        for headers in RevalidatingHandler.requests[1:]:
+            assert headers["If-None-Match"] == '"v1"'
+            assert headers["If-Modified-Since"] == RevalidatingHandler.last_modified
+
+        # Changed responses are downloaded again
+        RevalidatingHandler.etag = '"v2"'
+        RevalidatingHandler.body = BODY.replace("[]", '["changed"]')
+        time.sleep(0.01)
+        assert _download_parse(url) != first
+        assert RevalidatingHandler.bytes_sent == 2 * len(BODY) + len('"changed"')
+    finally:
+        RevalidatingHandler.etag = '"v1"'
+        RevalidatingHandler.body = BODY
+        server.shutdown()
+        server.server_close()
+
+
+def test_set_imf_cache_validation(cache_dir):
+    with pytest.raises(TypeError):
+        set_imf_cache(1)
+    with pytest.raises(TypeError):
+        set_imf_cache(cache_dir, ttl="1")
+    with pytest.raises(ValueError):
+        set_imf_cache(cache_dir, ttl={"CompactData": -1})
+    with pytest.raises(ValueError):
+        set_imf_cache(cache_dir, max_size=-1)
+
+    set_imf_cache(None)
+    assert "IMF_CACHE_DIR" not in os.environ
+
+
+if __name__ == "__main__":
+    pytest.main()
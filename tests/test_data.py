@@ -1,14 +1,20 @@
 import pytest
 import os
+import time
 import pandas as pd
 from imfp import (
     imf_databases,
     imf_parameters,
     imf_parameter_defs,
     imf_dataset,
+    imf_datasets,
+    imf_dataset_refresh,
     set_imf_wait_time,
+    clear_imf_memo,
 )
-from imfp.utils import _imf_save_response, _imf_use_cache
+from imfp.utils import _imf_save_response, _imf_use_cache, _download_parse
+from imfp.data import _series_to_frame, _series_to_wide
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Set test configuration options
@@ -267,5 +273,555 @@ def test_imf_dataset_include_metadata(set_options):
     assert all([not pd.isna(value) for value in output[0].values()])
 
 
+def test_imf_dataset_include_metadata_concurrent(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    urls = []
+
+    def slow_download_parse(URL, times=3):
+        urls.append(URL)
+        time.sleep(0.3)
+        return _download_parse(URL, times)
+
+    monkeypatch.setattr("imfp.data._download_parse", slow_download_parse)
+    monkeypatch.setattr("imfp.utils._download_parse", slow_download_parse)
+    clear_imf_memo()
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+        include_metadata=True,
+    )
+    imf_parameters("WHDREO201910")
+    urls.clear()
+
+    # Data and metadata are requested at the same time
+    start = time.perf_counter()
+    metadata, data = imf_dataset(**query)
+    assert time.perf_counter() - start < 0.55
+    assert sorted(url.split("/")[5] for url in urls) == [
+        "CompactData",
+        "GenericMetadata",
+    ]
+
+    # The metadata of a database is only requested once
+    urls.clear()
+    other_metadata, other_data = imf_dataset(**{**query, "end_year": 2011})
+    assert other_metadata == metadata
+    assert [url.split("/")[5] for url in urls] == ["CompactData"]
+    clear_imf_memo()
+
+
+def test_imf_dataset_include_metadata_failed(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    def failing_download_parse(URL, times=3):
+        raise ValueError("API request failed. Status: '500'")
+
+    def slow_metadata(URL, times=3):
+        time.sleep(1)
+        return {}
+
+    monkeypatch.setattr("imfp.data._download_parse", failing_download_parse)
+    monkeypatch.setattr("imfp.data._imf_metadata", slow_metadata)
+
+    # The error is raised without waiting for the metadata
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="500"):
+        imf_dataset(
+            database_id="WHDREO201910",
+            freq="A",
+            ref_area="US",
+            indicator="NGDPD",
+            include_metadata=True,
+        )
+    assert time.perf_counter() - start < 0.5
+
+
+def test_imf_dataset_stream(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    pd.testing.assert_frame_equal(
+        imf_dataset(**query, stream=True), imf_dataset(**query)
+    )
+    assert imf_dataset(**query, stream=True, return_raw=True) == imf_dataset(
+        **query, return_raw=True
+    )
+    with pytest.raises(Exception, match=".*outside the dataset's range.*"):
+        imf_dataset(
+            database_id="BOP_2017M06",
+            freq="A",
+            ref_area="AF",
+            start_year=2016,
+            end_year=2018,
+            stream=True,
+        )
+
+
+def test_imf_dataset_auto_split(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    requested = []
+
+    def fake_download_parse(URL, times=3):
+        if "CompactData" not in URL:
+            return _download_parse(URL, times)
+        requested.append(URL)
+        if "?" not in URL:
+            raise ValueError(f"Your requested dataset may be too large. URL: '{URL}'")
+        path, query = URL.split("?")
+        freq, ref_area, indicators = path.split("/")[-1].split(".")
+        years = dict(item.split("=") for item in query.split("&"))
+        start, end = int(years["startPeriod"]), int(years["endPeriod"])
+        # Reject anything wider than one indicator and two years
+        if "+" in indicators or end - start > 1:
+            raise ValueError(f"Your requested dataset may be too large. URL: '{URL}'")
+        series = {
+            "@FREQ": freq,
+            "@REF_AREA": ref_area,
+            "@INDICATOR": indicators,
+            "Obs": [
+                {"@TIME_PERIOD": str(year), "@OBS_VALUE": str(year)}
+                for year in range(start, end + 1)
+            ],
+        }
+        return {"CompactData": {"DataSet": {"Series": series}}}
+
+    monkeypatch.setattr("imfp.data._download_parse", fake_download_parse)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2013,
+    )
+    with pytest.raises(ValueError, match="too large"):
+        imf_dataset(**query)
+
+    requested.clear()
+    result = imf_dataset(**query, auto_split=True)
+    # One rejected request per split, then one per indicator and half-range
+    assert len(requested) == 7
+    assert len(result) == 8
+    assert sorted(set(result["indicator"])) == ["NGDPD", "PPPSH"]
+    assert sorted(result["time_period"]) == sorted(
+        [str(year) for year in range(2010, 2014)] * 2
+    )
+
+    raw = imf_dataset(**query, auto_split=True, return_raw=True)
+    assert len(raw) == 4
+
+    # A query that cannot be split further still raises
+    with pytest.raises(ValueError, match="too large"):
+        imf_dataset(
+            database_id="WHDREO201910",
+            freq="A",
+            ref_area="US",
+            indicator="PPPSH",
+            auto_split=True,
+        )
+
+
+def test_imf_dataset_refresh(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    requested = []
+    latest_year = 2012
+
+    def fake_download_parse(URL, times=3):
+        if "CompactData" not in URL:
+            return _download_parse(URL, times)
+        requested.append(URL)
+        path, query = URL.split("?")
+        freq, ref_area, indicators = path.split("/")[-1].split(".")
+        years = dict(item.split("=") for item in query.split("&"))
+        end = int(years.get("endPeriod", latest_year))
+        series = [
+            {
+                "@FREQ": freq,
+                "@REF_AREA": ref_area,
+                "@INDICATOR": indicator,
+                "Obs": [
+                    {"@TIME_PERIOD": str(year), "@OBS_VALUE": f"{year}.{latest_year}"}
+                    for year in range(int(years["startPeriod"]), end + 1)
+                ],
+            }
+            for indicator in indicators.split("+")
+        ]
+        return {"CompactData": {"DataSet": {"Series": series}}}
+
+    monkeypatch.setattr("imfp.data._download_parse", fake_download_parse)
+
+    previous = imf_dataset(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+    )
+    # One series is a year behind the other
+    previous = previous[
+        (previous["indicator"] == "PPPSH") | (previous["time_period"] < "2012")
+    ]
+
+    requested.clear()
+    latest_year = 2014
+    result = imf_dataset_refresh("WHDREO201910", previous)
+
+    assert len(requested) == 2
+    assert sorted(url.split("?")[1] for url in requested) == [
+        "startPeriod=2011",
+        "startPeriod=2012",
+    ]
+    assert list(result.columns) == list(previous.columns)
+    assert len(result) == 10
+    for indicator in ["PPPSH", "NGDPD"]:
+        rows = result[result["indicator"] == indicator]
+        assert list(rows["time_period"]) == [str(y) for y in range(2010, 2015)]
+        assert list(rows.index) == list(range(5))
+    # Observations from the refreshed years are revised
+    assert set(result[result["time_period"] == "2010"]["obs_value"]) == {"2010.2012"}
+    assert result[result["indicator"] == "PPPSH"]["obs_value"].iloc[2] == "2012.2014"
+
+
+def test_imf_dataset_refresh_compact(set_options, monkeypatch):
+    latest_year = 2012
+
+    def fake_download_parse(URL, times=3):
+        if "CompactData" not in URL:
+            return _download_parse(URL, times)
+        path, query = URL.split("?")
+        freq, ref_area, indicators = path.split("/")[-1].split(".")
+        years = dict(item.split("=") for item in query.split("&"))
+        series = [
+            {
+                "@FREQ": freq,
+                "@REF_AREA": ref_area,
+                "@INDICATOR": indicator,
+                "@UNIT_MULT": "6",
+                "Obs": [
+                    {"@TIME_PERIOD": str(year), "@OBS_VALUE": f"{year}.{latest_year}"}
+                    for year in range(int(years["startPeriod"]), latest_year + 1)
+                ],
+            }
+            for indicator in indicators.split("+")
+        ]
+        return {"CompactData": {"DataSet": {"Series": series}}}
+
+    monkeypatch.setattr("imfp.data._download_parse", fake_download_parse)
+
+    previous = imf_dataset(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        compact=True,
+    )
+    assert len(previous) == 6
+
+    latest_year = 2014
+    result = imf_dataset_refresh("WHDREO201910", previous)
+
+    # The overlapping year is replaced, not duplicated, and dtypes are kept
+    assert len(result) == 10
+    assert dict(result.dtypes) == dict(previous.dtypes)
+    for indicator in ["PPPSH", "NGDPD"]:
+        rows = result[result["indicator"] == indicator]
+        assert list(rows["time_period"].dt.year) == list(range(2010, 2015))
+    assert result["obs_value"].iloc[2] == 2012.2014
+
+    # Nothing new leaves the data unchanged
+    monkeypatch.setattr(
+        "imfp.data._download_parse",
+        lambda URL, times=3: (
+            {"CompactData": {"DataSet": {}}}
+            if "CompactData" in URL
+            else _download_parse(URL, times)
+        ),
+    )
+    pd.testing.assert_frame_equal(imf_dataset_refresh("WHDREO201910", result), result)
+
+    with pytest.raises(ValueError):
+        imf_dataset_refresh("WHDREO201910", pd.DataFrame({"a": [1]}))
+
+
+def test_imf_parameters_memoized(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    urls = []
+
+    def counting_download_parse(URL, times=3):
+        urls.append(URL)
+        return _download_parse(URL, times)
+
+    monkeypatch.setattr("imfp.utils._download_parse", counting_download_parse)
+    monkeypatch.setattr("imfp.data._download_parse", counting_download_parse)
+    clear_imf_memo()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: imf_parameters("WHDREO201910"), range(4)))
+    request_count = len(urls)
+    assert request_count > 0
+    assert all(result.keys() == results[0].keys() for result in results)
+
+    # Later calls, including imf_dataset's validation, make no metadata requests
+    results[0]["freq"] = results[0]["freq"].iloc[0:0]
+    assert len(imf_parameters("WHDREO201910")["freq"]) == 3
+    imf_dataset(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    assert len(urls) == request_count + 1
+
+    clear_imf_memo("WHDREO201910")
+    imf_parameters("WHDREO201910")
+    assert len(urls) == 2 * request_count + 1
+
+
+def test_imf_parameters_concurrent(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    active = []
+    overlaps = []
+
+    def slow_download_parse(URL, times=3):
+        active.append(URL)
+        time.sleep(0.2)
+        overlaps.append(len(active))
+        active.remove(URL)
+        return _download_parse(URL, times)
+
+    monkeypatch.setattr("imfp.data._download_parse", slow_download_parse)
+    clear_imf_memo()
+
+    start = time.perf_counter()
+    params = imf_parameters("BOP")
+    elapsed = time.perf_counter() - start
+
+    # Code lists (all parameters but freq) are requested at the same time
+    assert len(overlaps) == len(params) - 1 > 1
+    assert max(overlaps) > 1
+    assert elapsed < 0.2 * len(overlaps)
+    assert list(params["freq"]["input_code"]) == ["A", "M", "Q"]
+    clear_imf_memo()
+
+
+def test_imf_datasets(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    results = imf_datasets(
+        {
+            "full": query,
+            "short": {**query, "end_year": 2011},
+            "bad_database": {"database_id": "not_a_real_database"},
+            "bad_year": {**query, "start_year": 1},
+        },
+        times=1,
+    )
+
+    assert list(results) == ["full", "short", "bad_database", "bad_year"]
+    pd.testing.assert_frame_equal(results["full"], imf_dataset(**query))
+    assert len(results["short"]) == 2
+    assert isinstance(results["bad_database"], ValueError)
+    assert isinstance(results["bad_year"], ValueError)
+
+    results = imf_datasets([query, query])
+    assert list(results) == [0, 1]
+
+    with pytest.raises(ValueError):
+        imf_datasets("WHDREO201910")
+    with pytest.raises(ValueError):
+        imf_datasets([{"freq": "A"}])
+
+
+def test_series_to_frame():
+    series = [
+        {
+            "@FREQ": "A",
+            "@REF_AREA": "US",
+            "Obs": [
+                {"@TIME_PERIOD": "2020", "@OBS_VALUE": "1"},
+                {"@TIME_PERIOD": "2021", "@OBS_VALUE": "2", "@OBS_STATUS": "e"},
+            ],
+        },
+        {
+            "@FREQ": "A",
+            "@REF_AREA": "GB",
+            "@UNIT_MULT": "6",
+            "Obs": {"@TIME_PERIOD": "2020", "@OBS_VALUE": "3"},
+        },
+    ]
+
+    df = _series_to_frame(series)
+    assert list(df.columns) == [
+        "freq",
+        "ref_area",
+        "time_period",
+        "obs_value",
+        "obs_status",
+        "unit_mult",
+    ]
+    assert list(df.index) == [0, 1, 0]
+    assert list(df["ref_area"]) == ["US", "US", "GB"]
+    assert list(df["obs_value"]) == ["1", "2", "3"]
+    assert df["obs_status"].isna().tolist() == [True, False, True]
+    assert df["unit_mult"].isna().tolist() == [True, True, False]
+
+    with pytest.raises(ValueError, match=".*outside the dataset's range.*"):
+        _series_to_frame({"@FREQ": "A"})
+    with pytest.raises(ValueError):
+        _series_to_frame({"@FREQ": ["A", "Q"], "Obs": []})
+
+
+def test_series_to_frame_compact(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    series = [
+        {
+            "@FREQ": "Q",
+            "@REF_AREA": "US",
+            "@UNIT_MULT": "6",
+            "Obs": [
+                {"@TIME_PERIOD": "2020-Q1", "@OBS_VALUE": "1.5"},
+                {"@TIME_PERIOD": "2020-Q4", "@OBS_VALUE": "NA"},
+            ],
+        },
+        {
+            "@FREQ": "M",
+            "@REF_AREA": "GB",
+            "Obs": {"@TIME_PERIOD": "2020-03", "@OBS_VALUE": "3"},
+        },
+        {
+            "@FREQ": "A",
+            "@REF_AREA": "GB",
+            "Obs": {"@TIME_PERIOD": "2021", "@OBS_VALUE": "4", "@OBS_STATUS": "e"},
+        },
+    ]
+
+    df = _series_to_frame(series, compact=True)
+    expected = _series_to_frame(series)
+    assert list(df.columns) == list(expected.columns)
+    assert list(df.index) == list(expected.index)
+    assert df["freq"].dtype == "category" and df["obs_status"].dtype == "category"
+    assert list(df["ref_area"]) == ["US", "US", "GB", "GB"]
+    assert df["obs_value"].dtype == "float64"
+    assert df["obs_value"].isna().tolist() == [False, True, False, False]
+    assert list(df["unit_mult"].astype("Float64").fillna(-1)) == [6, 6, -1, -1]
+    assert list(df["time_period"]) == list(
+        pd.to_datetime(["2020-01-01", "2020-10-01", "2020-03-01", "2021-01-01"])
+    )
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    compact = imf_dataset(**query, compact=True)
+    full = imf_dataset(**query)
+    assert list(compact["obs_value"]) == [float(x) for x in full["obs_value"]]
+    assert list(compact["indicator"].astype(str)) == list(full["indicator"])
+
+
+def test_imf_dataset_wide(set_options):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    values, attributes = imf_dataset(**query, shape="wide")
+    long = imf_dataset(**query)
+
+    # Same values as pivoting the long data frame
+    long["obs_value"] = long["obs_value"].astype(float)
+    expected = long.pivot(
+        index="time_period",
+        columns=["freq", "ref_area", "indicator"],
+        values="obs_value",
+    )
+    pd.testing.assert_frame_equal(
+        values, expected.reindex(columns=values.columns), check_names=False
+    )
+    assert values.index.name == "time_period"
+    assert list(values.columns.names) == ["freq", "ref_area", "indicator"]
+    assert list(attributes.index) == list(values.columns)
+    assert "unit_mult" in attributes.columns
+
+    with pytest.raises(ValueError):
+        imf_dataset(**query, shape="tall")
+
+
+def test_series_to_wide():
+    series = [
+        {
+            "@FREQ": "A",
+            "@REF_AREA": "US",
+            "@UNIT_MULT": "6",
+            "Obs": [
+                {"@TIME_PERIOD": "2021", "@OBS_VALUE": "1.5"},
+                {"@TIME_PERIOD": "2020", "@OBS_VALUE": "NA"},
+            ],
+        },
+        {
+            "@FREQ": "A",
+            "@REF_AREA": "GB",
+            "@OBS_STATUS": "e",
+            "Obs": {"@TIME_PERIOD": "2019", "@OBS_VALUE": "2"},
+        },
+    ]
+
+    values, attributes = _series_to_wide(series, ["freq", "ref_area"])
+    assert list(values.index) == ["2019", "2020", "2021"]
+    assert list(values.columns) == [("A", "US"), ("A", "GB")]
+    assert values.isna().to_numpy().tolist() == [
+        [True, False],
+        [True, True],
+        [False, True],
+    ]
+    assert values.loc["2021", ("A", "US")] == 1.5
+    assert attributes.loc[("A", "US"), "unit_mult"] == "6"
+    assert attributes.loc[("A", "GB"), "obs_status"] == "e"
+
+    values, attributes = _series_to_wide(series, ["freq", "ref_area"], compact=True)
+    assert list(values.index) == list(pd.to_datetime(["2019", "2020", "2021"]))
+    assert attributes["unit_mult"].dtype == "Int8"
+
+    with pytest.raises(ValueError, match=".*outside the dataset's range.*"):
+        _series_to_wide({"@FREQ": "A"}, ["freq"])
+
+
 if __name__ == "__main__":
     pytest.main()
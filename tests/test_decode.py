@@ -0,0 +1,83 @@
+import pytest
+import responses
+import os
+from glob import glob
+from json import loads, JSONDecodeError
+from imfp import _download_parse, set_imf_json_backend
+from imfp.cache import _cache_read
+from imfp.decode import _json_decoders, _json_backend, _json_loads, _response_body
+
+
+@pytest.fixture
+def json_backend():
+    # Restore the selected backend after the test
+    original = os.environ.get("IMF_JSON_BACKEND")
+    yield
+    if original is None:
+        os.environ.pop("IMF_JSON_BACKEND", None)
+    else:
+        os.environ["IMF_JSON_BACKEND"] = original
+
+
+@pytest.mark.parametrize("name", list(_json_decoders))
+def test_json_decoders_recorded_responses(name):
+    # Every installed decoder agrees with the json module on recorded responses
+    paths = glob(os.path.join("tests", "responses", "*.json"))
+    assert paths
+    for path in paths:
+        entry = _cache_read("tests/responses", path)
+        content = entry["content"]
+        if entry["status_code"] == 200 and not (b"<" in content and b">" in content):
+            assert _json_loads(content, _json_decoders[name]) == loads(content)
+
+
+@pytest.mark.parametrize("name", list(_json_decoders))
+def test_json_decoders_invalid(name):
+    with pytest.raises(JSONDecodeError):
+        _json_loads(b'{"Structure": ', _json_decoders[name])
+
+
+def test_set_imf_json_backend(json_backend):
+    set_imf_json_backend("json")
+    assert os.environ["IMF_JSON_BACKEND"] == "json"
+    assert _json_backend()[0] == "json"
+
+    set_imf_json_backend()
+    assert _json_backend()[0] == next(iter(_json_decoders))
+
+    with pytest.raises(TypeError):
+        set_imf_json_backend(None)
+    with pytest.raises(ValueError):
+        set_imf_json_backend("yaml")
+    for name in ["orjson", "simdjson", "ujson"]:
+        if name not in _json_decoders:
+            with pytest.raises(ImportError):
+                set_imf_json_backend(name)
+
+    # A backend missing from this process falls back to the fastest one
+    os.environ["IMF_JSON_BACKEND"] = "missing"
+    assert _json_backend()[0] == next(iter(_json_decoders))
+
+
+def test_response_body():
+    assert _response_body(b'\xef\xbb\xbf{"a": 1}') == b'{"a": 1}'
+    assert _response_body('{"a": "é"}'.encode("latin-1"), "ISO-8859-1") == (
+        '{"a": "é"}'.encode()
+    )
+    assert _response_body(b'{"a": 1}', "unknown-charset") == b'{"a": 1}'
+
+
+@responses.activate
+def test_download_parse_encoding(monkeypatch, json_backend):
+    monkeypatch.delenv("IMF_CACHE_DIR", raising=False)
+    monkeypatch.setenv("IMF_WAIT_TIME", "0")
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+    responses.add(
+        responses.GET,
+        url,
+        body='{"Name": "Côte d\'Ivoire"}'.encode("latin-1"),
+        content_type="application/json; charset=ISO-8859-1",
+    )
+    for name in _json_decoders:
+        set_imf_json_backend(name)
+        assert _download_parse(url) == {"Name": "Côte d'Ivoire"}
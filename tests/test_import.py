@@ -0,0 +1,66 @@
+import pytest
+import os
+import sys
+import json
+import subprocess
+import imfp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds that "import imfp" may take in a fresh interpreter. Submodules are
+# imported lazily, so the package itself should import almost instantly.
+IMPORT_BUDGET = 0.1
+
+# Modules that must not be imported until a function needs them
+HEAVY_MODULES = ["pandas", "numpy", "requests", "aiohttp", "pyarrow"]
+
+SCRIPT = """
+import json, sys
+from time import perf_counter
+
+start = perf_counter()
+import imfp
+seconds = perf_counter() - start
+after_import = [name for name in HEAVY if name in sys.modules]
+imfp.set_imf_wait_time(0)
+imfp.set_imf_cache(None)
+after_setters = [name for name in HEAVY if name in sys.modules]
+imfp.imf_databases
+after_data = [name for name in HEAVY if name in sys.modules]
+print(json.dumps([seconds, after_import, after_setters, after_data]))
+"""
+
+
+def run_script():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", f"HEAVY = {HEAVY_MODULES!r}\n{SCRIPT}"],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def test_import_time():
+    # Take the fastest of a few runs to be robust to a busy machine
+    runs = [run_script() for _ in range(3)]
+    seconds = min(run[0] for run in runs)
+    assert seconds < IMPORT_BUDGET, f"import imfp took {seconds:.3f}s"
+
+    _, after_import, after_setters, after_data = runs[0]
+    assert after_import == []
+    assert after_setters == []
+    assert "pandas" in after_data
+
+
+def test_lazy_attributes():
+    for name in imfp._lazy_attributes:
+        assert callable(getattr(imfp, name))
+        assert name in dir(imfp)
+    assert set(imfp._lazy_attributes) <= set(imfp.__all__)
+    assert imfp.imf_dataset is imfp.data.imf_dataset
+    with pytest.raises(AttributeError):
+        imfp.imf_missing
@@ -0,0 +1,138 @@
+import pytest
+import os
+from imfp import (
+    imf_search_index_update,
+    imf_search_indicators,
+    set_imf_wait_time,
+    set_imf_cache,
+)
+
+
+# Set test configuration options
+create_cache = False
+use_cache = True
+wait_time = 0
+
+
+@pytest.fixture
+def set_options(monkeypatch):
+    # Store the original values of the options
+    original_wait_time = os.environ.get("IMF_WAIT_TIME", None)
+
+    # Set caching options for response mocking
+    monkeypatch.setattr("imfp.utils._imf_save_response", create_cache)
+    monkeypatch.setattr("imfp.utils._imf_use_cache", use_cache)
+    set_imf_wait_time(wait_time)
+
+    # Perform the test
+    yield float(os.environ.get("IMF_WAIT_TIME"))
+
+    # Restore the original values of the options during teardown
+    if original_wait_time is not None:
+        os.environ["IMF_WAIT_TIME"] = original_wait_time
+    else:
+        os.environ.pop("IMF_WAIT_TIME", None)
+
+
+def test_imf_search_indicators(set_options, tmp_path):
+    index_file = tmp_path / "index.json"
+    status = imf_search_index_update(index_file, ["BOP", "APDREO201904", "AFRREO"])
+    assert list(status["status"]) == ["done"] * 3
+    assert list(status["parameters"]) == [3, 3, 3]
+    assert status["codes"].min() > 0
+    assert index_file.exists()
+
+    # Codes are matched on their descriptions, with every word present
+    results = imf_search_indicators("current account", index_file)
+    assert len(results) == 20
+    assert set(results["database_id"]) <= {"BOP", "APDREO201904"}
+    assert all("current account" in text.lower() for text in results["description"])
+    assert list(results["score"]) == sorted(results["score"], reverse=True)
+
+    # Database descriptions and codes are matched too
+    results = imf_search_indicators("Balance of Payments", index_file, max_results=3)
+    assert results.loc[0, "database_id"] == "BOP"
+    assert results.loc[0, "description"] == "Balance of Payments (BOP)"
+    assert results["parameter"].isna()[0]
+    results = imf_search_indicators("ngdpd_usd", index_file)
+    assert list(results["input_code"]) == ["NGDPD_USD"]
+
+    # Shared code lists are reported for every database using them
+    results = imf_search_indicators("Kenya", index_file, parameter="ref_area")
+    assert set(results["database_id"]) == {"AFRREO", "BOP"}
+    assert set(results["input_code"]) == {"KE"}
+
+    results = imf_search_indicators(
+        "current account", index_file, database_id="APDREO201904"
+    )
+    assert set(results["database_id"]) == {"APDREO201904"}
+    assert set(results["parameter"]) == {"indicator"}
+
+    # Without a match on every word, partial matches are returned
+    results = imf_search_indicators("kenya atlantis", index_file)
+    assert "KE" in list(results["input_code"])
+
+    with pytest.raises(ValueError, match="at least one word"):
+        imf_search_indicators("  ", index_file)
+    with pytest.raises(ValueError, match="No search index"):
+        imf_search_indicators("kenya", tmp_path / "missing.json")
+
+
+def test_imf_search_index_update_incremental(set_options, monkeypatch, tmp_path):
+    from imfp import search
+
+    requested = []
+    failing = {"APDREO201904"}
+    imf_dimensions = search._imf_dimensions
+    download_parse = search._download_parse
+
+    def fake_imf_dimensions(database_id, times=3):
+        requested.append(database_id)
+        if database_id in failing:
+            failing.remove(database_id)
+            raise ValueError("API request failed. Status: '502'")
+        return imf_dimensions(database_id, times)
+
+    def fake_download_parse(URL, times=3):
+        requested.append(URL.split("/")[-1])
+        return download_parse(URL, times)
+
+    monkeypatch.setattr("imfp.search._imf_dimensions", fake_imf_dimensions)
+    monkeypatch.setattr("imfp.search._download_parse", fake_download_parse)
+
+    index_file = tmp_path / "index.json"
+
+    # Failed databases are recorded, and their description still indexed
+    status = imf_search_index_update(index_file, ["AFRREO", "APDREO201904"])
+    assert list(status["status"]) == ["done", "failed"]
+    assert "502" in status.loc[1, "error"]
+    assert sorted(requested) == sorted(
+        ["AFRREO", "CL_AREA_AFRREO", "CL_INDICATOR_AFRREO", "APDREO201904"]
+    )
+    results = imf_search_indicators("Asia Pacific", index_file)
+    assert results.loc[0, "database_id"] == "APDREO201904"
+
+    # Only databases not yet indexed are requested again
+    requested.clear()
+    status = imf_search_index_update(index_file, ["AFRREO", "APDREO201904"])
+    assert list(status["status"]) == ["done", "done"]
+    assert sorted(requested) == sorted(
+        ["APDREO201904", "CL_AREA_APDREO201904", "CL_INDICATOR_APDREO201904"]
+    )
+    assert "NGDPD_USD" in list(
+        imf_search_indicators("NGDPD_USD", index_file)["input_code"]
+    )
+
+    # The index defaults to a file in the cache directory
+    set_imf_cache(tmp_path / "cache")
+    try:
+        with pytest.raises(ValueError, match="No search index"):
+            imf_search_indicators("kenya")
+        requested.clear()
+        imf_search_index_update(database_ids="AFRREO")
+        assert (tmp_path / "cache" / "search" / "index.json").exists()
+        assert imf_search_indicators("kenya").loc[0, "input_code"] == "KE"
+    finally:
+        set_imf_cache(None)
+    with pytest.raises(ValueError, match="set_imf_cache"):
+        imf_search_indicators("kenya")
@@ -0,0 +1,137 @@
+import pytest
+import os
+import pandas as pd
+from imfp import imf_dataset, imf_store_write, imf_store_read, set_imf_wait_time
+
+pytest.importorskip("pyarrow")
+
+
+# Set test configuration options
+create_cache = False
+use_cache = True
+wait_time = 0
+
+
+@pytest.fixture
+def set_options(monkeypatch):
+    # Store the original values of the options
+    original_wait_time = os.environ.get("IMF_WAIT_TIME", None)
+
+    # Set caching options for response mocking
+    monkeypatch.setattr("imfp.utils._imf_save_response", create_cache)
+    monkeypatch.setattr("imfp.utils._imf_use_cache", use_cache)
+    set_imf_wait_time(wait_time)
+
+    # Perform the test
+    yield float(os.environ.get("IMF_WAIT_TIME"))
+
+    # Restore the original values of the options during teardown
+    if original_wait_time is not None:
+        os.environ["IMF_WAIT_TIME"] = original_wait_time
+    else:
+        os.environ.pop("IMF_WAIT_TIME", None)
+
+
+def make_frame(ref_areas, indicators, years, value=""):
+    return pd.DataFrame(
+        [
+            {
+                "freq": "A",
+                "ref_area": ref_area,
+                "indicator": indicator,
+                "unit_mult": "0",
+                "time_period": str(year),
+                "obs_value": f"{year}{value}",
+            }
+            for ref_area in ref_areas
+            for indicator in indicators
+            for year in years
+        ]
+    )
+
+
+def test_imf_store_write_read(set_options, tmp_path):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    data = make_frame(["US", "GB"], ["PPPSH", "NGDPD"], range(2010, 2013))
+    imf_store_write(data, tmp_path, "WHDREO201910")
+
+    # Partitioned by freq and the next parameter of the database
+    database_dir = tmp_path / "database_id=WHDREO201910"
+    assert (database_dir / "freq=A" / "ref_area=US" / "data.parquet").exists()
+    assert (database_dir / "freq=A" / "ref_area=GB" / "data.parquet").exists()
+
+    result = imf_store_read(tmp_path, "WHDREO201910")
+    assert list(result.columns) == list(data.columns)
+    assert len(result) == len(data)
+
+    # Filters on partition and data columns, with column selection
+    result = imf_store_read(
+        tmp_path,
+        "WHDREO201910",
+        columns=["indicator", "time_period", "obs_value"],
+        start_year=2011,
+        end_year=2011,
+        ref_area="US",
+        indicator=["NGDPD"],
+    )
+    assert result.to_dict("records") == [
+        {"indicator": "NGDPD", "time_period": "2011", "obs_value": "2011"}
+    ]
+
+    # Writing again upserts observations by series and time period
+    update = make_frame(["US"], ["PPPSH"], range(2012, 2014), value=".5")
+    imf_store_write(update, tmp_path, "WHDREO201910")
+    result = imf_store_read(tmp_path, "WHDREO201910", ref_area="US", indicator="PPPSH")
+    assert list(result["time_period"]) == ["2010", "2011", "2012", "2013"]
+    assert list(result["obs_value"]) == ["2010", "2011", "2012.5", "2013.5"]
+    assert len(imf_store_read(tmp_path, "WHDREO201910")) == len(data) + 1
+
+    with pytest.raises(ValueError):
+        imf_store_read(tmp_path, "not_a_database")
+    with pytest.raises(ValueError):
+        imf_store_read(tmp_path, "WHDREO201910", not_a_column="x")
+    with pytest.raises(ValueError):
+        imf_store_write(data.drop(columns="ref_area"), tmp_path, "WHDREO201910")
+
+
+def test_imf_dataset_store_dir(set_options, tmp_path):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    data = imf_dataset(**query, store_dir=tmp_path)
+    result = imf_store_read(tmp_path, "WHDREO201910")
+    pd.testing.assert_frame_equal(
+        result, data.reset_index(drop=True), check_dtype=False
+    )
+
+    # Compact requests store the strings returned by the API
+    compact_dir = tmp_path / "compact"
+    compact = imf_dataset(**query, compact=True, store_dir=compact_dir)
+    pd.testing.assert_frame_equal(compact, imf_dataset(**query, compact=True))
+    pd.testing.assert_frame_equal(imf_store_read(compact_dir, "WHDREO201910"), result)
+    with pytest.raises(ValueError, match="compact=True"):
+        imf_store_write(compact, compact_dir, "WHDREO201910")
+
+
+def test_imf_store_write_missing_partition(set_options, tmp_path):
+    data = make_frame(["US", "GB", "FR"], ["PPPSH"], [2010])
+    data.loc[2, "ref_area"] = None
+    imf_store_write(data, tmp_path, "WHDREO201910")
+
+    database_dir = tmp_path / "database_id=WHDREO201910"
+    assert sorted(os.listdir(database_dir)) == ["_imfp_store.json", "freq=A"]
+    result = imf_store_read(tmp_path, "WHDREO201910")
+    assert len(result) == 3
+    assert result["ref_area"].isna().sum() == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
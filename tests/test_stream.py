@@ -0,0 +1,132 @@
+import pytest
+import responses
+import os
+from json import loads, dumps, JSONDecodeError
+from imfp import set_imf_cache, set_imf_wait_time
+from imfp.cache import _cache_load, _cache_entry, _cache_content
+from imfp.utils import _download_parse_stream
+from imfp.stream import _JSONStreamReader, _iter_json_path, _text_chunks
+
+SERIES_PATH = ["CompactData", "DataSet", "Series"]
+URL = "http://dataservices.imf.org/REST/SDMX_JSON.svc/" "CompactData/PCPS/A.W00.PALLFNF"
+DOCUMENT = dumps(
+    {
+        "CompactData": {
+            "@xmlns": "http://dataservices.imf.org/compact/PCPS",
+            "Header": {"ID": "18b9ba2d", "Test": "false", "Numbers": [1.5, -20]},
+            "DataSet": {
+                "@xmlns": "http://dataservices.imf.org/compact/PCPS",
+                "Series": [
+                    {
+                        "@FREQ": "A",
+                        "@REF_AREA": "W00",
+                        "Obs": [{"@TIME_PERIOD": str(2020 + i), "@OBS_VALUE": i}] * 3,
+                    }
+                    for i in range(5)
+                ],
+            },
+        }
+    },
+    indent=1,
+)
+
+
+def stream_path(document, keys, chunk_size):
+    reader = _JSONStreamReader(_text_chunks(document, chunk_size))
+    return list(_iter_json_path(reader, keys))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 100000])
+def test_iter_json_path_matches_loads(chunk_size):
+    expected = loads(DOCUMENT)["CompactData"]["DataSet"]["Series"]
+    assert stream_path(DOCUMENT, SERIES_PATH, chunk_size) == expected
+
+
+def test_iter_json_path_shapes():
+    single = '{"CompactData": {"DataSet": {"Series": {"@FREQ": "A"}}}}'
+    assert stream_path(single, SERIES_PATH, 3) == [{"@FREQ": "A"}]
+
+    null = '{"CompactData": {"DataSet": {"Series": null}}}'
+    assert stream_path(null, SERIES_PATH, 3) == []
+
+    empty = '{"CompactData": {"DataSet": {"Series": []}}}'
+    assert stream_path(empty, SERIES_PATH, 3) == []
+
+    missing = '{"CompactData": {"DataSet": {"@xmlns": "x"}}}'
+    assert stream_path(missing, SERIES_PATH, 3) == []
+
+    numbers = '{"CompactData": {"DataSet": {"Series": [12345, 6.789e3]}}}'
+    assert stream_path(numbers, SERIES_PATH, 2) == [12345, 6789.0]
+
+    with pytest.raises(JSONDecodeError):
+        stream_path(
+            '{"CompactData": {"DataSet": {"Series": [{"a": }]}}}', SERIES_PATH, 4
+        )
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    # Store the original values of the options
+    original_env = {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith("IMF_CACHE_") or key == "IMF_WAIT_TIME"
+    }
+
+    # Point the cache at a temporary directory and disable rate limiting
+    set_imf_cache(tmp_path)
+    set_imf_wait_time(0)
+
+    # Perform the test
+    yield tmp_path
+
+    # Restore the original values of the options during teardown
+    for key in list(os.environ):
+        if key.startswith("IMF_CACHE_") or key == "IMF_WAIT_TIME":
+            os.environ.pop(key)
+    os.environ.update(original_env)
+
+
+@responses.activate
+def test_download_parse_stream_caches_response(cache_dir):
+    responses.add(responses.GET, URL, body="﻿" + DOCUMENT, status=200)
+    expected = loads(DOCUMENT)["CompactData"]["DataSet"]["Series"]
+
+    assert list(_download_parse_stream(URL, SERIES_PATH)) == expected
+    assert _cache_load(URL) == (200, DOCUMENT.encode())
+
+    # The second call streams from the cache without a request
+    assert list(_download_parse_stream(URL, SERIES_PATH)) == expected
+    assert len(responses.calls) == 1
+
+    # Cache hits are decompressed incrementally rather than read in full
+    status, chunks = _cache_load(URL, stream=True)
+    assert status == 200 and not isinstance(chunks, bytes)
+    assert b"".join(chunks) == DOCUMENT.encode()
+    _, entry = _cache_entry(URL, None)
+    chunks = list(_cache_content(str(cache_dir), entry, stream=True, chunk_size=64))
+    assert len(chunks) > 1 and max(len(chunk) for chunk in chunks) <= 64
+
+
+@responses.activate
+def test_download_parse_stream_errors(cache_dir):
+    responses.add(
+        responses.GET,
+        URL,
+        body="<string>Service unavailable</string>",
+        status=500,
+    )
+
+    with pytest.raises(ValueError, match="too large"):
+        _download_parse_stream(URL, SERIES_PATH, times=1)
+
+    # An abandoned stream leaves nothing in the cache
+    responses.replace(responses.GET, URL, body=DOCUMENT, status=200)
+    items = _download_parse_stream(URL, SERIES_PATH, times=1)
+    next(items)
+    items.close()
+    assert os.listdir(cache_dir) == []
+
+
+if __name__ == "__main__":
+    pytest.main()
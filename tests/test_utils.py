@@ -3,14 +3,32 @@ import responses
 import time
 import pandas as pd
 import os
+import gzip
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from imfp import (
     _imf_get,
     _download_parse,
     _imf_metadata,
     _imf_dimensions,
     set_imf_wait_time,
+    set_imf_connection_pool,
+    set_imf_shared_rate_limit,
+    set_imf_retry_policy,
+    set_imf_request_hook,
+    imf_dataset,
+)
+from imfp.utils import (
+    _imf_save_response,
+    _imf_use_cache,
+    _imf_session,
+    _RateLimiter,
+    _RetryPolicy,
+    _imf_circuit_breaker,
+    _download_parse_stream,
 )
-from imfp.utils import _imf_save_response, _imf_use_cache
 
 
 # Set test configuration options
@@ -98,6 +116,307 @@ def test_imf_get(env_setup_teardown):
     assert elapsed_time >= float(os.environ["IMF_WAIT_TIME"])
 
 
+@responses.activate
+def test_imf_get_concurrent(monkeypatch):
+    monkeypatch.setenv("IMF_WAIT_TIME", "0.1")
+    monkeypatch.setattr("imfp.utils._imf_rate_limiter._next_start", 0.0)
+    mock_url = "https://example.com/"
+    mock_header = {"Accept": "application/json", "User-Agent": "imfp"}
+    start_times = []
+
+    def slow_response(request):
+        start_times.append(time.perf_counter())
+        time.sleep(0.2)
+        return (200, {}, "Example Domain")
+
+    responses.add_callback(responses.GET, mock_url, callback=slow_response)
+
+    # Requests from several threads start one wait time apart, without waiting
+    # for earlier requests to finish
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: _imf_get(mock_url, mock_header), range(4)))
+    elapsed_time = time.perf_counter() - start
+
+    start_times.sort()
+    assert all(b - a >= 0.09 for a, b in zip(start_times, start_times[1:]))
+    assert elapsed_time < 0.8
+
+
+def test_rate_limiter_burst(monkeypatch):
+    monkeypatch.setenv("IMF_WAIT_TIME", "0.1")
+    monkeypatch.setenv("IMF_BURST", "3")
+    limiter = _RateLimiter()
+
+    # A full bucket lets three requests start at once, then refills one token
+    # per wait time
+    waits = [limiter.reserve() for _ in range(5)]
+    assert waits[:3] == [0, 0, 0]
+    assert 0.08 < waits[3] <= 0.1 and 0.18 < waits[4] <= 0.2
+
+    stats = limiter.stats()
+    assert stats["requests"] == 5 and stats["delayed"] == 2
+    assert stats["total_wait"] == pytest.approx(waits[3] + waits[4])
+    assert stats["max_wait"] == waits[4]
+
+    limiter.reset_stats()
+    assert limiter.stats()["requests"] == 0
+
+    # After an idle period the bucket is full again, but never holds more
+    # than the burst size
+    time.sleep(0.5)
+    waits = [limiter.reserve() for _ in range(4)]
+    assert waits[:3] == [0, 0, 0] and waits[3] > 0.08
+
+
+def reserve_start_times(count):
+    # Record the start times reserved in the shared file, which do not depend
+    # on how long this process took to get the lock or to return
+    from imfp import utils
+
+    start_times = []
+    reserve_shared = utils._reserve_shared
+
+    def record(*args):
+        start_times.append(reserve_shared(*args))
+        return start_times[-1]
+
+    utils._reserve_shared = record
+    limiter = _RateLimiter()
+    for _ in range(count):
+        limiter.reserve()
+    return start_times
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="requires fork"
+)
+def test_rate_limiter_shared(monkeypatch, tmp_path):
+    monkeypatch.setenv("IMF_WAIT_TIME", "0.05")
+    monkeypatch.setenv("IMF_BURST", "1")
+    monkeypatch.delenv("IMF_RATE_LIMIT_FILE", raising=False)
+    set_imf_shared_rate_limit(tmp_path / "rate_limit")
+
+    # Reservations from separate processes are spaced as if made by one
+    with multiprocessing.get_context("fork").Pool(3) as pool:
+        results = pool.map(reserve_start_times, [4, 4, 4])
+    start_times = sorted(t for times in results for t in times)
+    assert all(b - a >= 0.045 for a, b in zip(start_times, start_times[1:]))
+
+    set_imf_shared_rate_limit(None)
+    assert "IMF_RATE_LIMIT_FILE" not in os.environ
+    with pytest.raises(TypeError):
+        set_imf_shared_rate_limit(1)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = []
+
+    def do_GET(self):
+        self.connections.append(self.client_address)
+        body = self.headers.get("User-Agent", "").encode()
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_imf_get_session(monkeypatch):
+    for key in ["IMF_POOL_SIZE", "IMF_CONNECT_TIMEOUT", "IMF_READ_TIMEOUT"]:
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setenv("IMF_WAIT_TIME", "0")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/"
+        KeepAliveHandler.connections = []
+        texts = [_imf_get(url, {"User-Agent": "imfp_tester"}).text for _ in range(3)]
+
+        # Consecutive requests reuse one compressed keep-alive connection
+        assert texts == ["imfp_tester"] * 3
+        assert len(set(KeepAliveHandler.connections)) == 1
+
+        # Changing the pool size replaces the session
+        session = _imf_session()
+        assert _imf_session() is session
+        set_imf_connection_pool(pool_size=2, read_timeout=30)
+        assert _imf_session() is not session
+        assert _imf_get(url, {"User-Agent": "imfp_tester"}).text == "imfp_tester"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def retry_options(monkeypatch):
+    monkeypatch.setenv("IMF_WAIT_TIME", "0")
+    for key in [
+        "IMF_RETRY_BASE_DELAY",
+        "IMF_RETRY_MAX_DELAY",
+        "IMF_RETRY_JITTER",
+        "IMF_BREAKER_THRESHOLD",
+        "IMF_BREAKER_COOLDOWN",
+    ]:
+        monkeypatch.delenv(key, raising=False)
+    delays = []
+    monkeypatch.setattr("imfp.utils.sleep", delays.append)
+    _imf_circuit_breaker.reset()
+
+    yield delays
+
+    _imf_circuit_breaker.reset()
+
+
+def test_retry_policy(monkeypatch):
+    monkeypatch.setenv("IMF_RETRY_BASE_DELAY", "2")
+    monkeypatch.setenv("IMF_RETRY_MAX_DELAY", "5")
+    policy = _RetryPolicy()
+    for attempt, bound in enumerate([2, 4, 5, 5]):
+        assert all(0 <= policy.delay(attempt) <= bound for _ in range(20))
+    assert policy.delay(0, retry_after=30) == 30
+
+    monkeypatch.setenv("IMF_RETRY_JITTER", "0")
+    assert [policy.delay(attempt) for attempt in range(4)] == [2, 4, 5, 5]
+
+
+@responses.activate
+def test_download_parse_retries(retry_options):
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+    responses.add(
+        responses.GET,
+        url,
+        body="<string>Bandwidth exceeded</string>",
+        status=503,
+        headers={"Retry-After": "7"},
+    )
+    responses.add(responses.GET, url, json={"Structure": {}}, status=200)
+
+    # Rejections are retried after the delay requested by the API
+    assert _download_parse(url) == {"Structure": {}}
+    assert len(responses.calls) == 2
+    assert retry_options == [7]
+
+    # Requests that are too large fail without retrying
+    responses.replace(
+        responses.GET, url, body="<string>Service unavailable</string>", status=500
+    )
+    with pytest.raises(ValueError, match="too large"):
+        _download_parse(url, times=3)
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_request_hook(retry_options, monkeypatch):
+    monkeypatch.delenv("IMF_CACHE_DIR", raising=False)
+    monkeypatch.setattr("imfp.utils._imf_request_hook", None)
+    events = []
+    set_imf_request_hook(events.append)
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+    responses.add(
+        responses.GET,
+        url,
+        body="<string>Bandwidth exceeded</string>",
+        status=503,
+        headers={"Retry-After": "7"},
+    )
+    responses.add(responses.GET, url, json={"Structure": {}}, status=200)
+
+    # One event per request, covering all of its attempts
+    _download_parse(url)
+    assert len(events) == 1
+    event = events.pop()
+    assert event["event"] == "request" and event["url"] == url
+    assert event["status"] == 200 and event["bytes"] == len('{"Structure": {}}')
+    assert event["cache"] == "off" and event["error"] is None
+    assert event["retries"] == 1 and event["retry_wait"] == 7
+    assert event["decoder"] in ["orjson", "simdjson", "ujson", "json"]
+    assert all(event[key] >= 0 for key in ["wait", "network", "parse", "total"])
+
+    # Streamed requests are reported once their items have been read
+    items = _download_parse_stream(url, ["Structure"])
+    assert events == []
+    assert list(items) == [{}]
+    event = events.pop()
+    assert event["bytes"] == len('{"Structure": {}}') and event["decoder"] is None
+
+    # Failed requests are reported with their error
+    responses.replace(
+        responses.GET, url, body="<string>Service unavailable</string>", status=500
+    )
+    with pytest.raises(ValueError, match="too large"):
+        _download_parse(url)
+    assert "too large" in events.pop()["error"]
+
+    # Errors in the hook are turned into warnings
+    set_imf_request_hook(lambda event: 1 / 0)
+    with pytest.warns(UserWarning, match="ZeroDivisionError"):
+        with pytest.raises(ValueError):
+            _download_parse(url, times=1)
+
+    with pytest.raises(TypeError):
+        set_imf_request_hook("not a function")
+
+
+def test_request_hook_build(set_options, monkeypatch):
+    assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
+
+    monkeypatch.setattr("imfp.utils._imf_request_hook", None)
+    events = []
+    query = dict(
+        database_id="WHDREO201910",
+        freq="A",
+        ref_area="US",
+        indicator=["PPPSH", "NGDPD"],
+        start_year=2010,
+        end_year=2012,
+    )
+    # Look up the database's parameters before setting the hook
+    imf_dataset(**query)
+    set_imf_request_hook(events.append)
+    imf_dataset(**query)
+    set_imf_request_hook()
+    assert [event["event"] for event in events] == ["request", "build"]
+    assert events[0]["cache"] == "hit" and events[0]["url"] == events[1]["url"]
+    assert events[1]["build"] > 0
+
+
+@responses.activate
+def test_circuit_breaker(retry_options):
+    set_imf_retry_policy(breaker_threshold=2, breaker_cooldown=60)
+    url = "http://dataservices.imf.org/REST/SDMX_JSON.svc/Dataflow"
+    responses.add(
+        responses.GET, url, body="<string>Request Rejected</string>", status=503
+    )
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="overwhelmed"):
+            _download_parse(url, times=1)
+    assert len(responses.calls) == 2
+
+    # Once open, the breaker fails requests without sending them
+    with pytest.raises(ValueError, match="not sent"):
+        _download_parse(url, times=3)
+    assert len(responses.calls) == 2
+
+    _imf_circuit_breaker.reset()
+    responses.replace(responses.GET, url, json={"Structure": {}}, status=200)
+    assert _download_parse(url, times=1) == {"Structure": {}}
+
+    with pytest.raises(TypeError):
+        set_imf_retry_policy(breaker_threshold=1.5)
+    with pytest.raises(ValueError):
+        set_imf_retry_policy(base_delay=-1)
+
+
 def test_download_parse(set_options):
     assert (wait_time - 0.1) < set_options < (wait_time + 0.1)
 